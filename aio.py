@@ -0,0 +1,505 @@
+"""
+Асинхронный API задач для встраивания в сервисы на asyncio.
+
+Синхронные хранилища (FileTaskStorage и остальные) выполняют чтение,
+разбор и запись файла в пуле потоков, не блокируя цикл событий.
+ExecutorTaskStorage объединяет одновременные обращения: все читатели,
+пришедшие во время загрузки, получают результат одной загрузки,
+а изменения, сделанные во время записи, сохраняются одной следующей
+записью, как в отложенном сохранении TaskCollection.
+
+AsyncFileTaskManager держит задачи в памяти с индексами TaskCollection,
+как демон: выборки и изменения выполняются сразу в цикле событий,
+а в хранилище уходят только измененные задачи - через save_changes
+или append_tasks синхронного хранилища, так что журнал дописывается,
+а не перезаписывается. Изменения хранилища в обход менеджера
+он не увидит.
+
+    storage = ExecutorTaskStorage(FileTaskStorage("tasks.json"))
+    manager = AsyncFileTaskManager(storage)
+    task = await manager.add_task(
+        "Отчет", "Квартальный", "Работа", date(2099, 1, 1), "высокий"
+    )
+    tasks = await manager.view_tasks(sort="due_date", limit=10)
+"""
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date, datetime
+from typing import (Callable, Dict, Iterable, List, Optional, Set, Tuple,
+                    Type, TypeVar, Union)
+
+from classes import (FileTask, Task, TaskCollection, TaskIndex, TaskStorage,
+                     TaskFilter, completion)
+from constants import (DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS, PRIORITY_TYPE,
+                       TASK_STATUS)
+from errors import (EmptySelectionError, InvalidTaskError, TaskNotFoundError,
+                    TaskStatusError)
+from queries import Query, pushdown
+from validators import TEXT_FIELDS, check_date, check_not_blank
+
+R = TypeVar("R")
+
+Record = dict[str, Union[int, str]]
+
+
+class AsyncTaskStorage(ABC):
+    """Асинхронный вариант TaskStorage."""
+
+    @abstractmethod
+    async def load_indexed_tasks(
+        self
+    ) -> Tuple[List[Record], Optional[TaskIndex]]:
+        """Загрузка всех задач вместе с готовыми индексами, если
+        хранилище их сохраняет.
+
+        Returns:
+            Tuple[List[Record], Optional[TaskIndex]]: список всех задач
+                и индексы для него или None
+        """
+        pass
+
+    async def load_tasks(self) -> List[Record]:
+        """Возвращает список всех задач."""
+        return (await self.load_indexed_tasks())[0]
+
+    @abstractmethod
+    async def save_tasks(self, tasks: List[Record]) -> None:
+        """Сохранение актуального списка задач."""
+        pass
+
+    async def save_changes(
+        self,
+        tasks: List[Record],
+        added: Iterable[Record] = (),
+        updated: Iterable[Record] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        """Сохранение изменений после одной операции над задачами,
+        параметры те же, что у TaskStorage.save_changes.
+
+        По умолчанию весь актуальный список перезаписывается через
+        save_tasks.
+        """
+        await self.save_tasks(tasks)
+
+    @abstractmethod
+    async def allocate_ids(self, count: int = 1) -> range:
+        """Выделение ID для новых задач."""
+        pass
+
+
+class ExecutorTaskStorage(AsyncTaskStorage):
+    """Синхронное хранилище, методы которого выполняются в пуле.
+
+    Одновременные загрузки разделяют одну выполняющуюся загрузку,
+    а одновременные записи объединяются: пока идет запись, изменения
+    новых вызовов копятся, для каждого ID - только итоговое состояние,
+    и после окончания записи сохраняются одним вызовом синхронного
+    хранилища. Только добавленные задачи дописываются через
+    append_tasks, остальные изменения уходят в save_changes,
+    а после save_tasks весь список перезаписывается. Каждый вызов
+    завершается, когда записано состояние не старее переданного.
+    Вызовы синхронного хранилища выполняются по одному: запись
+    и выделение ID меняют одни и те же файлы.
+    """
+
+    def __init__(
+        self,
+        storage: TaskStorage,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            storage (TaskStorage): синхронное хранилище задач
+            executor (Optional[Executor]): пул потоков для чтения
+                и записи, по умолчанию пул потоков цикла событий
+
+        Raises:
+            TypeError: передан пул процессов - хранилища держат
+                блокировки, потоки сжатия и соединения с базой, а их
+                состояние в памяти не возвращается из процессов
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            raise TypeError(
+                "ExecutorTaskStorage работает только с пулом потоков."
+            )
+        self.storage = storage
+        self.executor = executor
+        self._loading: Optional[asyncio.Future] = None
+        self._saving: Optional[asyncio.Future] = None
+        # Актуальный список задач последнего вызова записи, ID -> итоговое
+        # состояние задачи (None - удалена), добавленные ID и признак
+        # перезаписи всего списка
+        self._tasks: Optional[List[Record]] = None
+        self._pending: Dict[int, Optional[Record]] = {}
+        self._added: Set[int] = set()
+        self._rewrite = False
+        self._lock = asyncio.Lock()
+
+    async def load_indexed_tasks(
+        self
+    ) -> Tuple[List[Record], Optional[TaskIndex]]:
+        # Читатель видит все записи, начатые до него
+        if self._saving is not None:
+            await asyncio.shield(self._saving)
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._loading)
+
+    async def save_tasks(self, tasks: List[Record]) -> None:
+        self._tasks, self._rewrite = tasks, True
+        self._pending, self._added = {}, set()
+        await self._save()
+
+    async def save_changes(
+        self,
+        tasks: List[Record],
+        added: Iterable[Record] = (),
+        updated: Iterable[Record] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        self._tasks = tasks
+        if not self._rewrite:
+            # Задачи, добавленные и удаленные до записи, не записываются
+            for task in added:
+                if task["id"] not in self._pending:
+                    self._added.add(task["id"])
+                self._pending[task["id"]] = task
+            for task in updated:
+                self._pending[task["id"]] = task
+            for task_id in deleted:
+                if task_id in self._added:
+                    self._added.discard(task_id)
+                    del self._pending[task_id]
+                else:
+                    self._pending[task_id] = None
+        await self._save()
+
+    async def allocate_ids(self, count: int = 1) -> range:
+        return await self._run(self.storage.allocate_ids, count)
+
+    async def _load(self) -> Tuple[List[Record], Optional[TaskIndex]]:
+        try:
+            return await self._run(self.storage.load_indexed_tasks)
+        finally:
+            self._loading = None
+
+    async def _save(self) -> None:
+        if self._saving is None:
+            self._saving = asyncio.ensure_future(self._flush())
+        await asyncio.shield(self._saving)
+
+    async def _flush(self) -> None:
+        try:
+            while self._rewrite or self._pending:
+                # Копии снимаются в цикле событий: пока идет запись,
+                # вызывающий продолжает изменять список и задачи,
+                # а итоговое состояние попадет в следующую запись.
+                # Копируются и сами задачи: поток записи не должен видеть
+                # их изменений, сделанных после снятия копии
+                tasks, pending, added = (
+                    self._tasks, self._pending, self._added
+                )
+                rewrite, self._rewrite = self._rewrite, False
+                self._pending, self._added = {}, set()
+                if rewrite:
+                    await self._run(self.storage.save_tasks, [
+                        dict(task) for task in tasks
+                    ])
+                elif len(added) == len(pending):
+                    await self._run(self.storage.append_tasks, [
+                        dict(task) for task in pending.values()
+                    ])
+                else:
+                    await self._run(
+                        functools.partial(
+                            self.storage.save_changes,
+                            added=[dict(pending[key]) for key in added],
+                            updated=[
+                                dict(task) for key, task in pending.items()
+                                if task is not None and key not in added
+                            ],
+                            deleted=[
+                                key for key, task in pending.items()
+                                if task is None
+                            ],
+                        ),
+                        [dict(task) for task in tasks],
+                    )
+        finally:
+            self._saving = None
+
+    async def _run(self, func: Callable[..., R], *args) -> R:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+
+class LoadedTaskStorage(TaskStorage):
+    """Задачи, уже загруженные асинхронным хранилищем.
+
+    TaskCollection строит по ним индексы, а изменения только
+    накапливаются в changes: записывает их AsyncFileTaskManager
+    через асинхронное хранилище.
+    """
+
+    def __init__(
+        self,
+        tasks: List[Record],
+        index: Optional[TaskIndex] = None
+    ):
+        self.tasks = tasks
+        self.index = index
+        # Именованные аргументы save_changes по одному на операцию
+        self.changes: List[dict] = []
+
+    def load_tasks(self) -> List[Record]:
+        return self.tasks
+
+    def load_indexed_tasks(
+        self
+    ) -> Tuple[List[Record], Optional[TaskIndex]]:
+        return self.tasks, self.index
+
+    def save_tasks(self, tasks: List[Record]) -> None:
+        pass
+
+    def save_changes(self, tasks: List[Record], **changes) -> None:
+        self.changes.append(changes)
+
+
+class AsyncTaskManager(ABC):
+    """Асинхронный вариант TaskManager: методы возвращают записи задач
+    вместо вывода в консоль.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncTaskStorage,
+        task: Type[Task] = FileTask
+    ):
+        self.storage = storage
+        self.task = task
+
+    @abstractmethod
+    async def view_tasks(
+        self,
+        category: Optional[str] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        reverse: bool = False,
+        where: Optional[Query] = None,
+    ) -> List[Record]:
+        """Задачи категории или все задачи с сортировкой и страницей."""
+        pass
+
+    @abstractmethod
+    async def add_task(
+        self,
+        title: str,
+        description: str,
+        category: str,
+        due_date: date,
+        priority: str
+    ) -> Record:
+        """Создание задачи, возвращает ее запись."""
+        pass
+
+    @abstractmethod
+    async def delete_task(
+        self,
+        task_id: Union[int, Iterable[int], None] = None,
+        category: Optional[str] = None
+    ) -> int:
+        """Удаление задач по ID или категории, возвращает их количество."""
+        pass
+
+    @abstractmethod
+    async def edit_task(self, task_id: int, **updates) -> Record:
+        """Изменение полей задачи, возвращает измененную запись."""
+        pass
+
+    @abstractmethod
+    async def search_task(
+        self,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        where: Optional[Query] = None,
+    ) -> List[Record]:
+        """Задачи, подходящие под все указанные условия."""
+        pass
+
+    @abstractmethod
+    async def update_status_task(self, task_id: int) -> Record:
+        """Отметка задачи выполненной, возвращает ее запись."""
+        pass
+
+
+class AsyncFileTaskManager(AsyncTaskManager):
+    """Асинхронный менеджер задач поверх ExecutorTaskStorage."""
+
+    def __init__(
+        self,
+        storage: AsyncTaskStorage,
+        task: Type[Task] = FileTask
+    ):
+        super().__init__(storage, task)
+        self._collection: Optional[TaskCollection] = None
+
+    async def view_tasks(
+        self,
+        category: Optional[str] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        reverse: bool = False,
+        where: Optional[Query] = None,
+    ) -> List[Record]:
+        collection = await self.collection()
+        return list(collection.iter_tasks(
+            sort, limit, offset, reverse,
+            **pushdown(TaskFilter(category=category, where=where)),
+        ))
+
+    async def add_task(
+        self,
+        title: str,
+        description: str,
+        category: str,
+        due_date: date,
+        priority: str
+    ) -> Record:
+        updates = check_updates({
+            "title": title,
+            "description": description,
+            "category": category,
+            "due_date": due_date,
+            "priority": priority,
+        })
+        collection = await self.collection()
+        task_id = (await self.storage.allocate_ids(1))[0]
+        record = self.task(
+            task_id, updates["title"], updates["description"],
+            updates["category"], updates["due_date"], updates["priority"],
+        ).create_task()
+        collection.insert_tasks([record])
+        await self.save()
+        return record
+
+    async def delete_task(
+        self,
+        task_id: Union[int, Iterable[int], None] = None,
+        category: Optional[str] = None
+    ) -> int:
+        if task_id is None and category is None:
+            raise EmptySelectionError("Укажите ID или категорию задач.")
+        task_ids = [task_id] if isinstance(task_id, int) else task_id
+        collection = await self.collection()
+        if task_ids is not None and category is not None:
+            # Удаляются задачи, подходящие под оба условия
+            task_ids = [
+                task["id"] for task in
+                collection.find_tasks(ids=task_ids, category=category)
+            ]
+            category = None
+        deleted = collection.delete_tasks(task_ids or (), category)
+        if deleted:
+            await self.save()
+        return deleted
+
+    async def edit_task(self, task_id: int, **updates) -> Record:
+        updates = check_updates(updates)
+        collection = await self.collection()
+        task = collection.update_task(task_id, updates)
+        if task is None:
+            raise TaskNotFoundError(f"Задача с ID {task_id} не найдена.")
+        await self.save()
+        return task
+
+    async def search_task(
+        self,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        where: Optional[Query] = None,
+    ) -> List[Record]:
+        collection = await self.collection()
+        return collection.find_tasks(**pushdown(TaskFilter(
+            category_contains=category or None,
+            status=status or None,
+            where=where,
+        )))
+
+    async def update_status_task(self, task_id: int) -> Record:
+        collection = await self.collection()
+        task = collection.get_task(task_id)
+        if task is None:
+            raise TaskNotFoundError(f"Задача с ID {task_id} не найдена.")
+        if task["status"] == DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS:
+            raise TaskStatusError(
+                f"Задача с ID {task_id} уже отмечена как 'Выполнена'."
+            )
+        task = collection.update_task(task_id, completion())
+        await self.save()
+        return task
+
+    async def collection(self) -> TaskCollection:
+        """Задачи в памяти с индексами, загружаются при первом вызове.
+
+        Returns:
+            TaskCollection: набор задач, общий для всех вызовов
+        """
+        if self._collection is None:
+            tasks, index = await self.storage.load_indexed_tasks()
+            # Пока шла загрузка, набор мог создать другой вызов
+            if self._collection is None:
+                self._collection = TaskCollection(
+                    LoadedTaskStorage(tasks, index)
+                )
+        return self._collection
+
+    async def save(self) -> None:
+        """Запись изменений, накопленных набором задач, в хранилище."""
+        loaded = self._collection.storage
+        changes, loaded.changes = loaded.changes, []
+        for change in changes:
+            await self.storage.save_changes(self._collection.tasks, **change)
+
+
+def check_updates(updates: dict) -> Record:
+    """Проверка значений полей задачи по правилам опций команд.
+
+    Поля со значением None пропускаются.
+
+    Returns:
+        Record: проверенные поля, срок - в формате YYYY-MM-DD
+
+    Raises:
+        InvalidTaskError: если значение поля не прошло проверку
+    """
+    result = {}
+    for field, value in updates.items():
+        if value is None:
+            continue
+        if field in TEXT_FIELDS:
+            value = check_not_blank(field, value)
+        elif field == "due_date":
+            if not isinstance(value, datetime):
+                value = datetime(value.year, value.month, value.day)
+            value = check_date(value).date().isoformat()
+        if field == "priority" and value not in PRIORITY_TYPE:
+            raise InvalidTaskError(
+                "Поле 'priority' должно быть одним из: "
+                f"{', '.join(PRIORITY_TYPE)}."
+            )
+        if field == "status" and value not in TASK_STATUS:
+            raise InvalidTaskError(
+                "Поле 'status' должно быть одним из: "
+                f"{', '.join(TASK_STATUS)}."
+            )
+        if field not in (*TEXT_FIELDS, "due_date", "priority", "status"):
+            raise InvalidTaskError(f"Неизвестное поле задачи '{field}'.")
+        result[field] = value
+    return result
@@ -0,0 +1,497 @@
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import (Dict, Iterator, List, NamedTuple, Optional, Sequence,
+                    Tuple, Union)
+
+import click
+
+from constants import DEFAULT_STATUS_TASK, PRIORITY_TYPE, TASK_STATUS
+
+# Путь к точке входа CLI, запуск которой замеряется
+COMMANDS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "commands.py"
+)
+
+# Категории синтетических задач: частота k-й категории
+# пропорциональна 1/k, как у реальных списков дел
+BENCH_CATEGORIES = (
+    "Работа", "Дом", "Учеба", "Здоровье", "Покупки",
+    "Финансы", "Хобби", "Путешествия", "Семья", "Спорт",
+)
+# Доли приоритетов в порядке PRIORITY_TYPE и доля выполненных задач
+BENCH_PRIORITY_WEIGHTS = (3, 5, 2)
+BENCH_DONE_SHARE = 0.3
+# Сроки синтетических задач: от завтра до года вперед
+BENCH_DUE_DAYS = 365
+# Количество строк файла для замера import-tasks
+BENCH_IMPORT_ROWS = 1000
+# Количество задач, создаваемых генератором за один раз
+BENCH_GENERATE_BLOCK = 10000
+
+
+class ImportTime(NamedTuple):
+    """Строка отчета python -X importtime, время в микросекундах."""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+class StartupReport(NamedTuple):
+    """Результат замера холодного запуска."""
+    wall_ms: List[float]
+    imports: List[ImportTime]
+
+
+def parse_import_times(stderr: str) -> List[ImportTime]:
+    """Разбор вывода python -X importtime.
+
+    Строки имеют вид 'import time: <self> | <cumulative> | <module>',
+    вложенность модуля задается отступом перед именем.
+
+    Args:
+        stderr (str): вывод процесса в stderr
+
+    Returns:
+        List[ImportTime]: время импорта каждого модуля
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # Строка заголовка
+            continue
+        module = name.strip()
+        imports.append(ImportTime(
+            module,
+            int(self_us),
+            int(cumulative_us),
+            (len(name) - len(name.lstrip()) - 1) // 2,
+        ))
+    return imports
+
+
+def measure_startup(args: Sequence[str], runs: int) -> StartupReport:
+    """Замер холодного запуска CLI с указанными аргументами.
+
+    Каждый запуск - отдельный процесс python -X importtime. Для каждого
+    модуля берется минимальное время по всем запускам, чтобы отчет
+    меньше зависел от случайных задержек.
+
+    Args:
+        args (Sequence[str]): аргументы commands.py
+        runs (int): количество запусков
+
+    Returns:
+        StartupReport: время каждого запуска и время импорта модулей
+    """
+    wall_ms = []
+    best: Dict[str, ImportTime] = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", COMMANDS_PATH, *args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall_ms.append((time.perf_counter() - started) * 1000)
+        for entry in parse_import_times(result.stderr):
+            known = best.get(entry.module)
+            if known is None or entry.cumulative_us < known.cumulative_us:
+                best[entry.module] = entry
+    return StartupReport(wall_ms, list(best.values()))
+
+
+def format_startup_report(report: StartupReport, top: int) -> str:
+    """Текст отчета: время запуска и самые долгие импорты верхнего уровня.
+
+    Args:
+        report (StartupReport): результат measure_startup
+        top (int): количество модулей в отчете
+
+    Returns:
+        str: отчет для вывода в консоль
+    """
+    roots = sorted(
+        (entry for entry in report.imports if entry.depth == 0),
+        key=lambda entry: entry.cumulative_us,
+        reverse=True,
+    )
+    total = sum(entry.cumulative_us for entry in roots) / 1000
+    lines = [
+        f"Запусков: {len(report.wall_ms)}. "
+        f"Время запуска, мс: мин {min(report.wall_ms):.1f}, "
+        f"медиана {statistics.median(report.wall_ms):.1f}.",
+        f"Импорт модулей, мс: {total:.1f}.",
+        f"{'собственное':>12} {'суммарное':>10}  модуль",
+    ]
+    for entry in roots[:top]:
+        lines.append(
+            f"{entry.self_us / 1000:>12.1f} "
+            f"{entry.cumulative_us / 1000:>10.1f}  {entry.module}"
+        )
+    return "\n".join(lines)
+
+
+class BenchCase(NamedTuple):
+    """Замеряемая команда CLI."""
+    name: str
+    args: List[str]
+
+
+class BenchResult(NamedTuple):
+    """Результат замера команды на наборе задач одного размера."""
+    case: str
+    size: int
+    storage: str
+    median_ms: float
+    tasks_per_s: float
+    peak_rss_kb: Optional[int]
+    runs_ms: List[float]
+
+
+def generate_tasks(
+    count: int,
+    seed: int = 0
+) -> Iterator[Dict[str, Union[int, str]]]:
+    """Синтетический набор задач для замеров.
+
+    Категории, приоритеты и статусы распределены неравномерно,
+    а сроки лежат в будущем, поэтому задачи проходят validate_date.
+    Задачи создаются блоками, чтобы не держать в памяти весь набор.
+
+    Args:
+        count (int): количество задач
+        seed (int): начальное значение генератора случайных чисел
+
+    Returns:
+        Iterator[Dict[str, Union[int, str]]]: задачи с ID от 1 до count
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    due_dates = [
+        (today + timedelta(days=days)).isoformat()
+        for days in range(1, BENCH_DUE_DAYS + 1)
+    ]
+    category_weights = [
+        1 / rank for rank in range(1, len(BENCH_CATEGORIES) + 1)
+    ]
+    for first_id in range(1, count + 1, BENCH_GENERATE_BLOCK):
+        ids = range(first_id, min(first_id + BENCH_GENERATE_BLOCK, count + 1))
+        k = len(ids)
+        for task_id, category, due_date, priority, status in zip(
+            ids,
+            rng.choices(BENCH_CATEGORIES, weights=category_weights, k=k),
+            rng.choices(due_dates, k=k),
+            rng.choices(PRIORITY_TYPE, weights=BENCH_PRIORITY_WEIGHTS, k=k),
+            rng.choices(
+                TASK_STATUS,
+                weights=(BENCH_DONE_SHARE, 1 - BENCH_DONE_SHARE),
+                k=k,
+            ),
+        ):
+            yield {
+                "id": task_id,
+                "title": f"Задача {task_id}",
+                "description": (
+                    f"Описание задачи {task_id} " * (task_id % 4 + 1)
+                ),
+                "category": category,
+                "due_date": due_date,
+                "priority": priority,
+                "status": status,
+            }
+
+
+def write_import_file(path: str, count: int, seed: int = 0) -> int:
+    """Запись синтетических задач в JSONL-файл для import-tasks.
+
+    Args:
+        path (str): путь к файлу
+        count (int): количество задач
+        seed (int): начальное значение генератора случайных чисел
+
+    Returns:
+        int: ID, который получит первая невыполненная задача
+            из второй половины файла при импорте в пустое хранилище
+    """
+    target_id = count
+    with open(path, "w", encoding="utf-8") as file:
+        for task in generate_tasks(count, seed):
+            task_id = task.pop("id")
+            if (
+                target_id == count
+                and task_id > count // 2
+                and task["status"] == DEFAULT_STATUS_TASK
+            ):
+                target_id = task_id
+            file.write(json.dumps(task, ensure_ascii=False) + "\n")
+    return target_id
+
+
+def bench_cases(target_id: int, import_path: str) -> List[BenchCase]:
+    """Команды CLI, покрывающие все методы FileTaskManager.
+
+    Args:
+        target_id (int): ID невыполненной задачи для точечных изменений
+        import_path (str): путь к JSONL-файлу для import-tasks
+
+    Returns:
+        List[BenchCase]: замеряемые команды
+    """
+    category = BENCH_CATEGORIES[1]
+    due_date = (date.today() + timedelta(days=30)).isoformat()
+    target = str(target_id)
+    return [
+        BenchCase("view-tasks", ["view-tasks"]),
+        BenchCase(
+            "view-tasks --category", ["view-tasks", "--category", category]
+        ),
+        BenchCase(
+            "view-tasks --sort --limit",
+            ["view-tasks", "--sort", "priority", "--limit", "20"],
+        ),
+        BenchCase(
+            "view-tasks --format json", ["view-tasks", "--format", "json"]
+        ),
+        BenchCase(
+            "search-task --category",
+            ["search-task", "--category", category[:2]],
+        ),
+        BenchCase(
+            "search-task --status",
+            ["search-task", "--status", TASK_STATUS[0]],
+        ),
+        BenchCase("add-task", [
+            "add-task", "--title", "Новая задача",
+            "--description", "Описание", "--category", category,
+            "--due_date", due_date, "--priority", PRIORITY_TYPE[1],
+        ]),
+        BenchCase("import-tasks", ["import-tasks", "--file", import_path]),
+        BenchCase(
+            "update-status-task --id", ["update-status-task", "--id", target]
+        ),
+        BenchCase(
+            "update-status-task --filter-category",
+            ["update-status-task", "--filter-category", category],
+        ),
+        BenchCase(
+            "edit-task --id",
+            ["edit-task", "--id", target, "--title", "Измененная задача"],
+        ),
+        BenchCase("delete-task --id", ["delete-task", "--id", target]),
+        BenchCase(
+            "delete-task --category", ["delete-task", "--category", category]
+        ),
+    ]
+
+
+def run_command(args: Sequence[str]) -> Tuple[float, Optional[int]]:
+    """Запуск commands.py в отдельном процессе.
+
+    Args:
+        args (Sequence[str]): аргументы commands.py
+
+    Returns:
+        Tuple[float, Optional[int]]: время выполнения в мс и пиковый
+            объем занятой процессом памяти (RSS) в КБ или None,
+            если система его не сообщает
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, COMMANDS_PATH, *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    with process.stderr:
+        stderr = process.stderr.read()
+    peak_rss = None
+    if hasattr(os, "wait4"):
+        # wait4 возвращает статистику именно этого процесса
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # На macOS ru_maxrss в байтах, в Linux - в килобайтах
+        peak_rss = usage.ru_maxrss
+        if sys.platform == "darwin":
+            peak_rss //= 1024
+    else:
+        process.wait()
+    elapsed = (time.perf_counter() - started) * 1000
+    if process.returncode != 0:
+        raise click.ClickException(
+            f"Команда '{' '.join(args)}' завершилась с ошибкой: "
+            f"{stderr.strip()}"
+        )
+    return elapsed, peak_rss
+
+
+def copy_fixture(source: str, target: str) -> None:
+    """Копирование файлов хранилища source (включая журнал и счетчик ID)
+    под именем target с удалением файлов предыдущего запуска.
+    Хранилища в директории копируются целиком.
+    """
+    for path in glob.glob(glob.escape(target) + "*"):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    for path in glob.glob(glob.escape(source) + "*"):
+        if os.path.isdir(path):
+            shutil.copytree(path, target + path[len(source):])
+        else:
+            shutil.copyfile(path, target + path[len(source):])
+
+
+def run_benchmarks(
+    sizes: Sequence[int],
+    storage_type: str,
+    runs: int,
+    workdir: str
+) -> Iterator[BenchResult]:
+    """Замер всех команд из bench_cases на наборах задач разного размера.
+
+    Для каждого размера набор задач создается один раз, а перед каждым
+    запуском команды копируется заново, поэтому изменяющие команды
+    замеряются на одинаковых данных. Кеш разобранных задач
+    при копировании теряет силу, так что замеряется чтение без кеша.
+
+    Args:
+        sizes (Sequence[int]): размеры наборов задач
+        storage_type (str): тип хранилища из STORAGE_TYPES
+        runs (int): количество запусков каждой команды
+        workdir (str): каталог для наборов задач
+
+    Returns:
+        Iterator[BenchResult]: результаты по мере выполнения замеров
+    """
+    from storages import STORAGE_TYPES
+
+    if storage_type not in STORAGE_TYPES:
+        raise click.BadParameter(
+            f"Неизвестный тип хранилища '{storage_type}'. "
+            f"Доступные: {', '.join(STORAGE_TYPES)}.",
+            param_hint="'--storage-type'",
+        )
+    import_path = os.path.join(workdir, "import.jsonl")
+    write_import_file(import_path, BENCH_IMPORT_ROWS, seed=1)
+
+    for size in sizes:
+        # Набор задач создается командой import-tasks в отдельном
+        # процессе: так задачи проходят проверку, а память этого
+        # процесса не попадает в пиковый RSS замеряемых команд
+        os.makedirs(os.path.join(workdir, str(size)))
+        fixture = os.path.join(workdir, str(size), "tasks")
+        rows_path = f"{fixture}.jsonl"
+        target_id = write_import_file(rows_path, size)
+        run_command([
+            "--storage", f"{storage_type}:{fixture}",
+            "import-tasks", "--file", rows_path,
+        ])
+        os.remove(rows_path)
+
+        work = os.path.join(workdir, "work")
+        spec = f"{storage_type}:{work}"
+        for case in bench_cases(target_id, import_path):
+            runs_ms, peak_rss = [], None
+            for _ in range(runs):
+                copy_fixture(fixture, work)
+                elapsed, rss = run_command(["--storage", spec, *case.args])
+                runs_ms.append(round(elapsed, 1))
+                if rss is not None:
+                    peak_rss = max(peak_rss or 0, rss)
+            median_ms = statistics.median(runs_ms)
+            yield BenchResult(
+                case.name,
+                size,
+                storage_type,
+                median_ms,
+                round(size / median_ms * 1000),
+                peak_rss,
+                runs_ms,
+            )
+
+
+def save_results(path: str, results: List[BenchResult]) -> None:
+    """Запись результатов замеров в JSON-файл."""
+    data = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [result._asdict() for result in results],
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+
+
+def load_results(path: str) -> List[BenchResult]:
+    """Чтение результатов замеров, записанных save_results."""
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    return [BenchResult(**result) for result in data["results"]]
+
+
+def find_regressions(
+    results: List[BenchResult],
+    baseline: List[BenchResult],
+    threshold: float
+) -> List[Tuple[BenchResult, float]]:
+    """Поиск замеров, медиана которых выросла относительно базовых.
+
+    Args:
+        results (List[BenchResult]): текущие замеры
+        baseline (List[BenchResult]): базовые замеры
+        threshold (float): допустимое отношение медиан
+
+    Returns:
+        List[Tuple[BenchResult, float]]: замедлившиеся замеры
+            и отношение их медианы к базовой
+    """
+    known = {
+        (result.case, result.size, result.storage): result
+        for result in baseline
+    }
+    regressions = []
+    for result in results:
+        base = known.get((result.case, result.size, result.storage))
+        if base is not None and result.median_ms > base.median_ms * threshold:
+            regressions.append((result, result.median_ms / base.median_ms))
+    return regressions
+
+
+def format_bench_row(
+    result: Optional[BenchResult] = None,
+    baseline: Optional[BenchResult] = None
+) -> str:
+    """Строка таблицы результатов или ее заголовок, если result
+    не передан. При наличии базового замера выводится отношение медиан.
+    """
+    if result is None:
+        return (
+            f"{'команда':<38} {'задач':>8} {'медиана, мс':>12} "
+            f"{'задач/с':>11} {'RSS, МБ':>8} {'к базе':>7}"
+        )
+    rss = "-" if result.peak_rss_kb is None else (
+        f"{result.peak_rss_kb / 1024:.1f}"
+    )
+    ratio = "" if baseline is None else (
+        f"x{result.median_ms / baseline.median_ms:.2f}"
+    )
+    return (
+        f"{result.case:<38} {result.size:>8} {result.median_ms:>12.1f} "
+        f"{result.tasks_per_s:>11} {rss:>8} {ratio:>7}"
+    )
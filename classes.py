@@ -1,14 +1,100 @@
+import gc
+import gzip
+import heapq
 import json
+import marshal
+import operator
+import os
+import re
 from abc import ABC, abstractmethod
-from datetime import date
-from typing import Dict, List, Optional, TypedDict, TypeVar, Union
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from itertools import islice
+from datetime import date, timedelta
+from typing import (BinaryIO, Callable, Dict, Iterable, Iterator, List,
+                    NamedTuple, Optional, Reversible, Set, TextIO, Tuple,
+                    TypedDict, TypeVar, Union)
+
+import metrics
+import profiling
+from constants import (ARCHIVE_SUFFIX, DEFAULT_STATUS_TASK,
+                       DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS,
+                       ID_COUNTER_SUFFIX, ID_RESERVE_BLOCK,
+                       PARALLEL_SCAN_BYTES, PRIORITY_TYPE, STREAM_CHUNK_SIZE)
+from errors import (EmptySelectionError, ImportAbortedError,
+                    NoMatchingTasksError, TaskNotFoundError, TaskStatusError)
+from queries import Query, pushdown
 
-import click
+T = TypeVar("T", bound="Task")
+
+# Пробелы и запятые между записями массива задач в JSON-файле
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+# Ключи сортировки задач: сначала более важные, при равенстве по ID
+# Номер приоритета для сортировки без поиска строки в PRIORITY_TYPE
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITY_TYPE)}
+
+SORT_KEYS = {
+    "id": lambda task: task["id"],
+    "due_date": lambda task: (task["due_date"], task["id"]),
+    "priority": lambda task: (-PRIORITY_RANK[task["priority"]], task["id"]),
+    "status": lambda task: (
+        task["status"] != DEFAULT_STATUS_TASK, task["id"]
+    ),
+}
+
+
+def unique_ids(
+    tasks: Iterable[dict[str, Union[int, str]]]
+) -> Iterator[dict[str, Union[int, str]]]:
+    """Пропуск задач с тем же ID, что у предыдущей задачи."""
+    last_id = None
+    for task in tasks:
+        if task["id"] != last_id:
+            last_id = task["id"]
+            yield task
+
+
+def file_stamps(*paths: str) -> tuple:
+    """Время изменения, размер и inode файлов, None для отсутствующих."""
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    return tuple(stamps)
 
-from constants import (DEFAULT_STATUS_TASK,
-                       DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS)
 
-T = TypeVar("T", bound="Task")
+def date_string(value: date) -> str:
+    """Дата (или дата со временем) в формате YYYY-MM-DD."""
+    return value.strftime("%Y-%m-%d")
+
+
+def completion() -> dict[str, str]:
+    """Изменения задачи при выполнении: статус и дата выполнения."""
+    return {
+        "status": DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS,
+        "completed_at": date.today().isoformat(),
+    }
+
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """Отключение сборщика мусора на время разбора больших данных.
+
+    При создании сотен тысяч словарей сборщик многократно обходит
+    уже созданные объекты, хотя циклических ссылок в них нет.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 class TaskData(TypedDict):
@@ -24,6 +110,52 @@ class TaskData(TypedDict):
     status: str
 
 
+class TaskIndex(TypedDict):
+    """
+    Готовые индексы для списка задач: ID в порядке списка,
+    ID задач для каждой категории и каждого статуса и пары
+    (срок, ID), отсортированные по сроку.
+    """
+    ids: List[int]
+    category: Dict[str, Set[int]]
+    status: Dict[str, Set[int]]
+    due: List[Tuple[str, int]]
+
+
+class TaskFilter(TypedDict, total=False):
+    """
+    Условия выборки задач: задача подходит, если выполнены
+    все указанные условия. Даты сравниваются в формате YYYY-MM-DD
+    включительно.
+    """
+    ids: Iterable[int]
+    category: str
+    status: str
+    priority: str
+    category_contains: str
+    due_from: str
+    due_to: str
+    where: Query
+
+
+class Changes(NamedTuple):
+    """Результат изменения или удаления задач."""
+    # Количество задач, подходящих под условия
+    matched: int
+    # Количество измененных или удаленных задач
+    changed: int
+    # Задачи после изменения, при удалении список пуст
+    tasks: List[dict[str, Union[int, str]]]
+
+
+class ImportResult(NamedTuple):
+    """Результат импорта задач."""
+    # Количество добавленных задач
+    imported: int
+    # Номер строки и текст ошибки для строк, которые не добавлены
+    errors: List[Tuple[int, str]]
+
+
 class TaskStorage(ABC):
     @abstractmethod
     def load_tasks(self) -> List[dict[str, Union[int, str]]]:
@@ -43,8 +175,725 @@ class TaskStorage(ABC):
         """
         pass
 
+    def load_indexed_tasks(
+        self
+    ) -> Tuple[List[dict[str, Union[int, str]]], Optional[TaskIndex]]:
+        """Загрузка всех задач вместе с готовыми индексами, если
+        хранилище их сохраняет.
+
+        Returns:
+            Tuple[List[dict[str, Union[int, str]]], Optional[TaskIndex]]:
+                список всех задач и индексы для него или None
+        """
+        return self.load_tasks(), None
+
+    def iter_tasks(self, **filters) -> Iterator[dict[str, Union[int, str]]]:
+        """Последовательный обход задач, подходящих под условия.
+
+        Хранилища, которые умеют читать задачи по одной или проверять
+        условия до разбора записи, переопределяют метод, чтобы
+        не держать в памяти весь список.
+
+        Args:
+            filters (TaskFilter): условия выборки
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: задачи по порядку
+        """
+        return filter(
+            profiling.timed(
+                "filter", QueryableTaskStorage.predicate(**filters)
+            ),
+            self.load_tasks(),
+        )
+
+    def allocate_ids(self, count: int = 1) -> range:
+        """Выделение ID для новых задач.
+
+        По умолчанию ID продолжают наибольший из сохраненных, для чего
+        читаются все задачи. Хранилища с постоянным счетчиком
+        переопределяют метод, чтобы выдавать ID, не читая задачи,
+        и не повторять ID удаленных задач.
+
+        Args:
+            count (int): количество ID
+
+        Returns:
+            range: идущие подряд ID
+        """
+        first = max((task["id"] for task in self.load_tasks()), default=0) + 1
+        return range(first, first + count)
+
+    def release_ids(self, ids: range) -> None:
+        """Возврат выделенных, но не использованных ID.
+
+        Хранилища с постоянным счетчиком откатывают его, если после
+        этих ID ничего не выделялось. По умолчанию ничего не делает.
+
+        Args:
+            ids (range): ID из конца последнего выделенного блока
+        """
+
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Добавление новых задач в конец хранилища.
+
+        По умолчанию весь список перезаписывается через save_changes.
+        Хранилища, которые умеют дописывать задачи без чтения
+        остальных, переопределяют этот метод.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): новые задачи
+        """
+        self.save_changes(self.load_tasks() + tasks, added=tasks)
+
+    def save_changes(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        added: Iterable[dict[str, Union[int, str]]] = (),
+        updated: Iterable[dict[str, Union[int, str]]] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        """Сохранение изменений после одной операции над задачами.
+
+        По умолчанию весь актуальный список перезаписывается через
+        save_tasks. Хранилища, которые умеют записывать изменения
+        точечно, переопределяют этот метод.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): актуальный список
+                всех задач после изменения
+            added (Iterable[dict[str, Union[int, str]]]): добавленные задачи
+            updated (Iterable[dict[str, Union[int, str]]]): измененные задачи
+            deleted (Iterable[int]): ID удаленных задач
+        """
+        self.save_tasks(tasks)
+
+    def version(self) -> Optional[tuple]:
+        """Отметка состояния файлов хранилища.
+
+        По ней процесс, который держит задачи в памяти, замечает
+        изменения, записанные другими процессами. По умолчанию None:
+        хранилище не умеет вычислять отметку.
+
+        Returns:
+            Optional[tuple]: время изменения, размер и inode файлов
+        """
+        return None
+
+    def prefers_loading(self) -> bool:
+        """Быстрее ли выборке загрузить все задачи с индексами, чем
+        читать их потоком через iter_tasks.
+
+        По умолчанию False: хранилище без кеша читается потоком.
+
+        Returns:
+            bool: True, если выборку лучше выполнять по загруженным задачам
+        """
+        return False
+
+
+class QueryableTaskStorage(TaskStorage):
+    """Хранилище, которое само выполняет выборки и точечные изменения,
+    не передавая менеджеру весь набор задач.
+    """
+
+    @abstractmethod
+    def find_tasks(
+        self,
+        **filters
+    ) -> List[dict[str, Union[int, str]]]:
+        """Выборка задач, подходящих под все указанные условия.
+
+        Args:
+            filters (TaskFilter): условия выборки, не указанные
+                или равные None условия не проверяются
+
+        Returns:
+            List[dict[str, Union[int, str]]]: подходящие задачи
+                в порядке возрастания ID
+        """
+        pass
+
+    @abstractmethod
+    def get_task(self, task_id: int) -> Optional[dict[str, Union[int, str]]]:
+        """Возвращает задачу с указанным ID или None."""
+        pass
+
+    @abstractmethod
+    def insert_task(self, task: dict[str, Union[int, str]]) -> None:
+        """Добавление новой задачи."""
+        pass
+
+    def insert_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Добавление сразу нескольких задач.
+
+        По умолчанию задачи добавляются по одной, хранилища, умеющие
+        записать их за одну операцию, переопределяют метод.
+        """
+        for task in tasks:
+            self.insert_task(task)
+
+    @abstractmethod
+    def update_task(
+        self,
+        task_id: int,
+        updates: dict[str, Union[int, str]]
+    ) -> Optional[dict[str, Union[int, str]]]:
+        """Изменение полей задачи.
+
+        Returns:
+            Optional[dict[str, Union[int, str]]]: измененная задача или None,
+                если задачи с указанным ID нет
+        """
+        pass
+
+    def update_tasks(
+        self,
+        task_ids: Iterable[int],
+        updates: dict[str, Union[int, str]]
+    ) -> List[dict[str, Union[int, str]]]:
+        """Изменение одних и тех же полей у нескольких задач.
+
+        По умолчанию задачи изменяются по одной, хранилища, умеющие
+        записать изменения за одну операцию, переопределяют метод.
+
+        Returns:
+            List[dict[str, Union[int, str]]]: измененные задачи
+        """
+        tasks = [self.update_task(task_id, updates) for task_id in task_ids]
+        return [task for task in tasks if task is not None]
+
+    @abstractmethod
+    def delete_tasks(
+        self,
+        task_ids: Iterable[int] = (),
+        category: Optional[str] = None
+    ) -> int:
+        """Удаление задач по списку ID или по категории.
+
+        Returns:
+            int: количество удаленных задач
+        """
+        pass
+
+    @abstractmethod
+    def last_id(self) -> int:
+        """Возвращает ID последней задачи или 0, если задач нет."""
+        pass
+
+    def allocate_ids(self, count: int = 1) -> range:
+        first = self.last_id() + 1
+        return range(first, first + count)
+
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        self.insert_tasks(tasks)
+
+    def load_tasks(self) -> List[dict[str, Union[int, str]]]:
+        return self.find_tasks()
+
+    def iter_tasks(
+        self,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+        **filters
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Последовательный обход задач, подходящих под условия
+        find_tasks, с сортировкой и постраничным выводом.
+
+        Args:
+            order_by (Optional[str]): поле сортировки из SORT_KEYS
+            limit (Optional[int]): максимальное количество задач
+            offset (int): количество пропускаемых задач
+            descending (bool): обратный порядок сортировки
+            filters (TaskFilter): условия выборки
+        """
+        return self.paginate(
+            self.find_tasks(**filters), order_by, limit, offset, descending
+        )
+
+    @staticmethod
+    def paginate(
+        tasks: Iterable[dict[str, Union[int, str]]],
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Сортировка и выбор страницы из последовательности задач.
+
+        Без сортировки задачи не накапливаются, а обход прекращается
+        сразу после нужной страницы. Для первых k задач по порядку
+        используется частичный отбор через кучу за O(n log k)
+        вместо полной сортировки.
+        """
+        if order_by is None and descending:
+            order_by = "id"
+        if order_by is None:
+            stop = None if limit is None else offset + limit
+            return islice(tasks, offset, stop)
+
+        key = SORT_KEYS[order_by]
+        with profiling.phase("sort"):
+            if limit is None:
+                tasks = sorted(tasks, key=key, reverse=descending)
+                return iter(tasks[offset:])
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return iter(select(offset + limit, tasks, key=key)[offset:])
+
+    @staticmethod
+    def predicate(
+        **filters
+    ) -> Callable[[dict[str, Union[int, str]]], bool]:
+        """Проверка задачи на соответствие условиям find_tasks.
+
+        Условия разбираются один раз, а возвращаемая функция
+        проверяет только указанные из них.
+
+        Returns:
+            Callable[[dict[str, Union[int, str]]], bool]: функция,
+                возвращающая True для подходящих задач
+        """
+        checks = []
+        if filters.get("ids") is not None:
+            ids = set(filters["ids"])
+            checks.append(lambda task: task["id"] in ids)
+        for field in ("category", "status", "priority"):
+            if filters.get(field) is not None:
+                checks.append(
+                    lambda task, field=field, value=filters[field]:
+                    task[field] == value
+                )
+        if filters.get("category_contains") is not None:
+            checks.append(
+                lambda task, value=filters["category_contains"]:
+                value in task["category"]
+            )
+        if filters.get("due_from") is not None:
+            checks.append(
+                lambda task, value=filters["due_from"]:
+                task["due_date"] >= value
+            )
+        if filters.get("due_to") is not None:
+            checks.append(
+                lambda task, value=filters["due_to"]:
+                task["due_date"] <= value
+            )
+        if filters.get("where") is not None:
+            checks.append(filters["where"].matches)
+        if len(checks) == 1:
+            # Единственное условие, например скомпилированное where,
+            # проверяется без обертки
+            return checks[0]
+        return lambda task: all(check(task) for check in checks)
+
+
+class TaskCollection(QueryableTaskStorage):
+    """Выборки и изменения над загруженным в память набором задач.
+
+    Оборачивает хранилище без собственного языка запросов: задачи
+    загружаются один раз, после чего поддерживаются хеш-индексы
+    id -> позиция, категория -> ID и статус -> ID и отсортированный
+    список пар (срок, ID) для выборок по интервалу сроков и сортировки
+    по сроку за O(log n + k) двоичным поиском. Каждое изменение
+    обновляет индексы и сразу передается в save_changes исходного
+    хранилища, а внутри блока deferred накапливается до вызова flush.
+    """
+
+    def __init__(self, storage: TaskStorage):
+        self.storage = storage
+        self._tasks: Optional[Dict[int, dict[str, Union[int, str]]]] = None
+        self._positions: Dict[int, int] = {}
+        self._by_category: Dict[str, Set[int]] = {}
+        self._by_status: Dict[str, Set[int]] = {}
+        self._by_due: Optional[List[Tuple[str, int]]] = []
+        self._next_position = 0
+        self._ids_ascending = True
+        # Отложенные изменения: ID -> задача или None для удаленных
+        self._pending: Optional[
+            Dict[int, Optional[dict[str, Union[int, str]]]]
+        ] = None
+        self._pending_added: Set[int] = set()
+        self._rewrite = False
+        self._reserved = range(0)
+
+    @property
+    def tasks(self) -> List[dict[str, Union[int, str]]]:
+        """Список всех задач в порядке их добавления."""
+        return list(self._loaded().values())
+
+    def find_tasks(
+        self,
+        **filters
+    ) -> List[dict[str, Union[int, str]]]:
+        return list(self._matching(**filters))
+
+    def iter_tasks(
+        self,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+        **filters
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        if order_by == "due_date" and not any(
+            filters.get(key) is not None
+            for key in ("ids", "category", "category_contains")
+        ):
+            # Индекс сроков уже упорядочен как сортировка по сроку:
+            # берется только его часть внутри интервала
+            tasks = self._due_range(
+                filters.get("due_from"), filters.get("due_to"), descending
+            )
+            residual = {
+                key: filters.get(key)
+                for key in ("status", "priority", "where")
+                if filters.get(key) is not None
+            }
+            if residual:
+                tasks = filter(
+                    profiling.timed("filter", self.predicate(**residual)),
+                    tasks,
+                )
+            return self.paginate(tasks, None, limit, offset)
+        tasks = self._matching(**filters)
+        if order_by in (None, "id") and self._ids_ascending:
+            # Порядок добавления совпадает с порядком ID и служит готовым
+            # индексом сортировки: страница берется без сортировки
+            if descending:
+                tasks = reversed(tasks)
+            return self.paginate(tasks, None, limit, offset)
+        return self.paginate(tasks, order_by, limit, offset, descending)
+
+    @profiling.phased("filter")
+    def _matching(
+        self,
+        **filters
+    ) -> Reversible[dict[str, Union[int, str]]]:
+        tasks = self._loaded()
+
+        # Кандидаты берутся из пересечения подходящих индексов,
+        # начиная с самого короткого
+        postings = []
+        if filters.get("ids") is not None:
+            postings.append(set(filters["ids"]).intersection(tasks))
+        if filters.get("category") is not None:
+            postings.append(self._by_category.get(filters["category"], set()))
+        if filters.get("status") is not None:
+            postings.append(self._by_status.get(filters["status"], set()))
+        if filters.get("category_contains") is not None:
+            postings.append(set().union(*(
+                ids for name, ids in self._by_category.items()
+                if filters["category_contains"] in name
+            )))
+
+        # Интервал сроков берется из индекса, если в нем не больше
+        # задач, чем в самом коротком из уже выбранных списков
+        residual_keys = ["priority", "where"]
+        due_from, due_to = filters.get("due_from"), filters.get("due_to")
+        if due_from is not None or due_to is not None:
+            start, stop = self._due_bounds(due_from, due_to)
+            if postings and min(map(len, postings)) < stop - start:
+                residual_keys += ["due_from", "due_to"]
+            else:
+                postings.append(
+                    {task_id for _, task_id in self._by_due[start:stop]}
+                )
+
+        # Условия без индекса проверяются только для кандидатов
+        residual = {
+            key: filters.get(key)
+            for key in residual_keys
+            if filters.get(key) is not None
+        }
+        if not postings:
+            if not residual:
+                return tasks.values()
+            return list(filter(self.predicate(**residual), tasks.values()))
+
+        postings.sort(key=len)
+        ids = postings[0].intersection(*postings[1:])
+        candidates = (
+            tasks[task_id]
+            for task_id in sorted(ids, key=self._positions.__getitem__)
+        )
+        if residual:
+            candidates = filter(self.predicate(**residual), candidates)
+        return list(candidates)
+
+    def _due_bounds(
+        self,
+        due_from: Optional[str],
+        due_to: Optional[str]
+    ) -> Tuple[int, int]:
+        """Границы интервала сроков в индексе сроков, включительно."""
+        self._loaded()
+        start = 0 if due_from is None else bisect_left(
+            self._by_due, (due_from,)
+        )
+        # Пара (due_to, ID) меньше (due_to + "~") при любом ID:
+        # символ "~" больше цифр и "-" в датах
+        stop = len(self._by_due) if due_to is None else bisect_right(
+            self._by_due, (due_to + "~",)
+        )
+        return start, max(start, stop)
+
+    def _due_range(
+        self,
+        due_from: Optional[str],
+        due_to: Optional[str],
+        descending: bool = False
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Задачи со сроком в интервале в порядке сортировки по сроку."""
+        start, stop = self._due_bounds(due_from, due_to)
+        entries = self._by_due[start:stop]
+        if descending:
+            entries.reverse()
+        tasks = self._tasks
+        return (tasks[task_id] for _, task_id in entries)
+
+    def get_task(self, task_id: int) -> Optional[dict[str, Union[int, str]]]:
+        return self._loaded().get(task_id)
+
+    def insert_task(self, task: dict[str, Union[int, str]]) -> None:
+        self.insert_tasks([task])
+
+    def insert_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        self._loaded()
+        for task in tasks:
+            self._index(task)
+        self._save(added=tasks)
+
+    def update_task(
+        self,
+        task_id: int,
+        updates: dict[str, Union[int, str]]
+    ) -> Optional[dict[str, Union[int, str]]]:
+        task = self.get_task(task_id)
+        if task is None:
+            return None
+        self._unindex_fields(task)
+        task.update(updates)
+        self._index_fields(task)
+        self._save(updated=[task])
+        return task
+
+    def update_tasks(
+        self,
+        task_ids: Iterable[int],
+        updates: dict[str, Union[int, str]]
+    ) -> List[dict[str, Union[int, str]]]:
+        tasks = self._loaded()
+        updated = [tasks[task_id] for task_id in task_ids if task_id in tasks]
+        for task in updated:
+            self._unindex_fields(task)
+            task.update(updates)
+            self._index_fields(task)
+        if updated:
+            self._save(updated=updated)
+        return updated
+
+    def delete_tasks(
+        self,
+        task_ids: Iterable[int] = (),
+        category: Optional[str] = None
+    ) -> int:
+        tasks = self._loaded()
+        deleted = {task_id for task_id in task_ids if task_id in tasks}
+        if category is not None:
+            deleted |= self._by_category.get(category, set())
+        deleted = sorted(deleted, key=self._positions.__getitem__)
+        for task_id in deleted:
+            self._unindex(tasks[task_id])
+        if deleted:
+            self._save(deleted=deleted)
+        return len(deleted)
+
+    def last_id(self) -> int:
+        tasks = self._loaded()
+        return next(reversed(tasks)) if tasks else 0
+
+    def allocate_ids(self, count: int = 1) -> range:
+        if self._pending is None:
+            return self._allocate(count)
+        # Внутри блока deferred ID резервируются блоками, чтобы
+        # не записывать счетчик хранилища для каждой новой задачи,
+        # неиспользованный остаток блока возвращается при выходе
+        if len(self._reserved) < count:
+            self._reserved = self._allocate(max(count, ID_RESERVE_BLOCK))
+        ids, self._reserved = self._reserved[:count], self._reserved[count:]
+        return ids
+
+    def _allocate(self, count: int) -> range:
+        ids = self.storage.allocate_ids(count)
+        # Задачи, добавленные внутри блока deferred, еще не записаны,
+        # и хранилище без постоянного счетчика о них не знает
+        if self._tasks:
+            last = self.last_id() if self._ids_ascending else max(self._tasks)
+            if ids.start <= last:
+                return range(last + 1, last + 1 + count)
+        return ids
+
+    def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        self._build(tasks)
+        if self._pending is None:
+            self.storage.save_tasks(tasks)
+        else:
+            self._rewrite = True
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """Отложенное сохранение изменений.
+
+        Внутри блока изменения только применяются к индексам,
+        а в хранилище записываются одной операцией при вызове flush
+        и при выходе из блока.
+        """
+        self._pending, self._pending_added, self._rewrite = {}, set(), False
+        try:
+            yield
+        finally:
+            self.flush()
+            self._pending = None
+            if self._reserved:
+                self.storage.release_ids(self._reserved)
+                self._reserved = range(0)
+
+    def flush(self) -> None:
+        """Запись накопленных в блоке deferred изменений в хранилище."""
+        if self._pending is None:
+            return None
+        pending, added = self._pending, self._pending_added
+        if self._rewrite:
+            self.storage.save_tasks(self.tasks)
+        elif pending:
+            self.storage.save_changes(
+                self.tasks,
+                added=[pending[task_id] for task_id in added],
+                updated=[
+                    task for task_id, task in pending.items()
+                    if task is not None and task_id not in added
+                ],
+                deleted=[
+                    task_id for task_id, task in pending.items()
+                    if task is None
+                ],
+            )
+        self._pending, self._pending_added, self._rewrite = {}, set(), False
+
+    def _save(
+        self,
+        added: Iterable[dict[str, Union[int, str]]] = (),
+        updated: Iterable[dict[str, Union[int, str]]] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        if self._pending is None:
+            self.storage.save_changes(
+                self.tasks, added=added, updated=updated, deleted=deleted
+            )
+            return None
+        if self._rewrite:
+            # Весь список и так будет перезаписан при flush
+            return None
+
+        # Для каждого ID хранится только итоговое состояние задачи,
+        # задачи, добавленные и удаленные внутри блока, не записываются
+        for task in added:
+            if task["id"] not in self._pending:
+                self._pending_added.add(task["id"])
+            self._pending[task["id"]] = task
+        for task in updated:
+            self._pending[task["id"]] = task
+        for task_id in deleted:
+            if task_id in self._pending_added:
+                self._pending_added.discard(task_id)
+                del self._pending[task_id]
+            else:
+                self._pending[task_id] = None
+
+    def _loaded(self) -> Dict[int, dict[str, Union[int, str]]]:
+        if self._tasks is None:
+            self._build(*self.storage.load_indexed_tasks())
+        return self._tasks
+
+    @profiling.phased("index")
+    def _build(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        index: Optional[TaskIndex] = None
+    ) -> None:
+        if index is not None:
+            # Готовые индексы из хранилища позволяют обойтись
+            # без цикла по задачам на стороне Python
+            ids = index["ids"]
+            self._tasks = dict(zip(ids, tasks))
+            self._positions = dict(zip(ids, range(len(ids))))
+            self._by_category = index["category"]
+            self._by_status = index["status"]
+            self._by_due = index["due"]
+            self._next_position = len(ids)
+            self._ids_ascending = all(map(operator.lt, ids, ids[1:]))
+            return None
+
+        self._tasks = {}
+        self._positions = {}
+        self._by_category = {}
+        self._by_status = {}
+        # Индекс сроков строится одной сортировкой после обхода,
+        # а не вставкой каждой задачи
+        self._by_due = None
+        self._next_position = 0
+        self._ids_ascending = True
+        for task in tasks:
+            self._index(task)
+        self._by_due = sorted(
+            (task["due_date"], task_id)
+            for task_id, task in self._tasks.items()
+        )
+
+    def _index(self, task: dict[str, Union[int, str]]) -> None:
+        if self._tasks and task["id"] <= next(reversed(self._tasks)):
+            self._ids_ascending = False
+        self._tasks[task["id"]] = task
+        self._positions[task["id"]] = self._next_position
+        self._next_position += 1
+        self._index_fields(task)
+
+    def _unindex(self, task: dict[str, Union[int, str]]) -> None:
+        self._unindex_fields(task)
+        del self._tasks[task["id"]]
+        del self._positions[task["id"]]
+
+    def _index_fields(self, task: dict[str, Union[int, str]]) -> None:
+        self._by_category.setdefault(task["category"], set()).add(task["id"])
+        self._by_status.setdefault(task["status"], set()).add(task["id"])
+        if self._by_due is not None:
+            insort(self._by_due, (task["due_date"], task["id"]))
+
+    def _unindex_fields(self, task: dict[str, Union[int, str]]) -> None:
+        for index, key in (
+            (self._by_category, task["category"]),
+            (self._by_status, task["status"]),
+        ):
+            ids = index[key]
+            ids.discard(task["id"])
+            if not ids:
+                del index[key]
+        entry = (task["due_date"], task["id"])
+        position = bisect_left(self._by_due, entry)
+        if self._by_due[position:position + 1] == [entry]:
+            del self._by_due[position]
+
 
 class Task(ABC):
+    # Задача хранит только свои поля без словаря атрибутов: объекты
+    # создаются из записей хранилища для каждой выводимой строки
+    __slots__ = (
+        "id", "title", "description", "due_date",
+        "category", "priority", "status",
+    )
+
     def __init__(
         self,
         id: int,
@@ -63,6 +912,29 @@ class Task(ABC):
         self.priority = priority
         self.status = status
 
+    @classmethod
+    def from_record(cls, record: dict[str, Union[int, str]]) -> "Task":
+        """Создание задачи из записи хранилища.
+
+        Поля заполняются напрямую, без разбора именованных аргументов
+        конструктора: так задача создается для каждой выводимой строки.
+
+        Args:
+            record (dict[str, Union[int, str]]): запись задачи
+
+        Returns:
+            Task: объект задачи
+        """
+        task = cls.__new__(cls)
+        task.id = record["id"]
+        task.title = record["title"]
+        task.description = record["description"]
+        task.due_date = record["due_date"]
+        task.category = record["category"]
+        task.priority = record["priority"]
+        task.status = record["status"]
+        return task
+
     @abstractmethod
     def display(self) -> str:
         """Возвращает задачу.
@@ -79,18 +951,35 @@ class Task(ABC):
 
 
 class TaskManager(ABC):
+    """Операции с задачами без вывода в консоль.
+
+    Выборки возвращают итераторы записей задач, изменения - количество
+    затронутых задач, а ошибки сообщаются исключениями из errors.
+    Вывод результатов остается командам консоли.
+    """
     def __init__(self, storage: TaskStorage, task: Task):
         self.storage = storage
         self.task = task
 
     @abstractmethod
-    def view_tasks(self, category: Optional[str]) -> Union[List[Task], None]:
-        """Возвращает список всех задач.
+    def view_tasks(
+        self,
+        category: Optional[str],
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        reverse: bool = False,
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Возвращает задачи по порядку сортировки.
 
         Args:
             category (Optional[str]): Если передать название категории,
-            то список будет отсортирован и будут выведены только задачи
-            с указанной категорией
+            то будут возвращены только задачи с указанной категорией
+            sort (Optional[str]): поле сортировки: id, due_date,
+                priority или status
+            limit (Optional[int]): максимальное количество задач
+            offset (int): количество пропускаемых задач
+            reverse (bool): обратный порядок сортировки
         """
         pass
 
@@ -102,7 +991,7 @@ class TaskManager(ABC):
         category: str,
         due_date: date,
         priority: str
-    ) -> None:
+    ) -> dict[str, Union[int, str]]:
         """Создает задачу с указанными аргументами
 
         Args:
@@ -111,37 +1000,49 @@ class TaskManager(ABC):
             category (str): категория задачи
             due_date (date): срок выполнения задачи
             priority (str): приоритет задачи.
+
+        Returns:
+            dict[str, Union[int, str]]: созданная задача
         """
         pass
 
     @abstractmethod
-    def delete_task(self, task_id: int, category: str) -> None:
+    def delete_task(
+        self,
+        task_id: Union[int, Iterable[int], None],
+        category: Optional[str],
+        filters: Optional[TaskFilter] = None
+    ) -> Changes:
         """Удаление задач в зависимости от аргумента.
 
         Args:
-            task_id (int): удаление задачи с указанным ID
+            task_id (Union[int, Iterable[int], None]): удаление задачи
+                с указанным ID или задач из списка ID
             category (str): удаление всех задач с указанной категорией
-        Return: Если задача удалена успешно,
-            будет выведено соотствующее информационное сообщение,
-            в противном случае будет возвращена ошибка
+            filters (Optional[TaskFilter]): дополнительные условия отбора
+
+        Returns:
+            Changes: количество подходящих и удаленных задач
         """
         pass
 
     @abstractmethod
     def edit_task(
         self,
-        id: int,
+        id: Union[int, Iterable[int], None],
         title: Optional[str] = None,
         description: Optional[str] = None,
         category: Optional[str] = None,
         due_date: Optional[date] = None,
         priority: Optional[str] = None,
         status: Optional[str] = None,
-    ) -> Optional[T]:
+        filters: Optional[TaskFilter] = None,
+    ) -> Changes:
         """Редактирование выбранной задачи.
 
         Args:
-            id (int): обязательное поле, указывает задачу для редактирования
+            id (Union[int, Iterable[int], None]): указывает задачу
+                или список задач для редактирования
             title (Optional[str], optional): опциальное поле названия задачи
                 для редактирования, если не указать будет равно None.
             description (Optional[str], optional): опциальное поле описания
@@ -155,22 +1056,174 @@ class TaskManager(ABC):
                 задачи для редактирования, если не указать будет равно None.
             status (Optional[str], optional): опциальное поле статуса задачи
                 для редактирования, если не указать будет равно None.
+            filters (Optional[TaskFilter]): условия отбора задач для
+                редактирования, все указанные условия должны выполняться
 
         Returns:
-            Optional[T]: Если ID указан верно, то вернется выбранная задача
-                с измененными задачи, если ID указан не верно,
-                то вернется ошибка
+            Changes: количество подходящих задач и измененные задачи
         """
         pass
 
     @abstractmethod
-    def search_task(self, category: str, status: str) -> List[T]:
+    def search_task(
+        self,
+        category: Optional[str],
+        status: Optional[str]
+    ) -> Iterator[dict[str, Union[int, str]]]:
         pass
 
 
+class IdAllocator:
+    """Постоянный счетчик ID задач в файле рядом с хранилищем.
+
+    В файле хранится следующий свободный ID, поэтому для выдачи ID
+    не нужно читать задачи, а ID удаленных задач не выдаются повторно.
+    Пока файла нет, счетчик продолжает наибольший ID в хранилище.
+    Одновременные процессы читают и меняют счетчик по очереди
+    благодаря блокировке файла <path>.lock.
+    """
+
+    def __init__(self, path: str, last_id: Callable[[], int]):
+        """
+        Args:
+            path (str): путь к файлу счетчика
+            last_id (Callable[[], int]): наибольший ID в хранилище,
+                вызывается, только если файла счетчика еще нет
+        """
+        self.path = path
+        self.last_id = last_id
+
+    def allocate(self, count: int = 1) -> range:
+        """Выделение блока из count идущих подряд ID.
+
+        Returns:
+            range: выделенные ID
+        """
+        with self._locked():
+            first = self._read()
+            if first is None:
+                first = self.last_id() + 1
+            self._write(first + count)
+        return range(first, first + count)
+
+    def release(self, ids: range) -> None:
+        """Откат счетчика к началу ids, если после них ID не выдавались."""
+        with self._locked():
+            if self._read() == ids.stop:
+                self._write(ids.start)
+
+    def advance(self, last_id: int) -> None:
+        """Сдвиг счетчика за ID, записанные в хранилище в обход него,
+        например при переносе задач из другого хранилища.
+        """
+        with self._locked():
+            next_id = self._read()
+            if next_id is None or last_id >= next_id:
+                self._write(last_id + 1)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        import fcntl
+
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read(self) -> Optional[int]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return int(file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, next_id: int) -> None:
+        # Счетчик заменяется атомарно, чтобы прерванная запись
+        # не оставила пустой файл
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(f"{next_id}\n")
+        os.replace(tmp_path, self.path)
+
+
+class TaskArchive:
+    """Архив выполненных задач: сжатый gzip файл JSON Lines рядом
+    с хранилищем, в который задачи только дописываются.
+
+    Каждая запись дописывается отдельным членом gzip, поэтому
+    архив не перечитывается и не переписывается при добавлении,
+    а при чтении gzip разворачивает все члены подряд.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): путь к файлу архива
+        """
+        self.path = path
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def append(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Дописывание задач в конец архива."""
+        if not tasks:
+            return None
+        data = gzip.compress("".join(
+            json.dumps(task, ensure_ascii=False) + "\n" for task in tasks
+        ).encode("utf-8"))
+        with open(self.path, "ab") as file:
+            file.write(data)
+        metrics.inc("tasks_storage_written_bytes_total", len(data))
+
+    def iter_tasks(self, **filters) -> Iterator[dict[str, Union[int, str]]]:
+        """Обход архивных задач, подходящих под условия.
+
+        Args:
+            filters (TaskFilter): условия выборки
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: задачи в порядке архива
+        """
+        return filter(
+            profiling.timed(
+                "filter", QueryableTaskStorage.predicate(**filters)
+            ),
+            profiling.timed_iter(
+                "load",
+                metrics.counted("tasks_scanned_total", self._iter_records()),
+            ),
+        )
+
+    def _iter_records(self) -> Iterator[dict[str, Union[int, str]]]:
+        try:
+            file = gzip.open(self.path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with file:
+            try:
+                for line in file:
+                    yield json.loads(line)
+            except (EOFError, json.JSONDecodeError):
+                # Последний член мог оборваться при аварийной записи
+                pass
+            metrics.inc(
+                "tasks_storage_read_bytes_total", file.buffer.fileobj.tell()
+            )
+
+
 class FileTaskStorage(TaskStorage):
-    def __init__(self, file_path):
+    CACHE_VERSION = 3
+
+    def __init__(self, file_path, cache: bool = True):
+        """Создает хранилище задач в JSON-файле.
+
+        Args:
+            file_path (str): путь к файлу задач
+            cache (bool): хранить ли рядом с файлом кеш
+                <file_path>.cache с уже разобранными задачами
+        """
         self.file_path = file_path
+        self.cache_path = f"{file_path}.cache" if cache else None
+        self.ids = IdAllocator(f"{file_path}{ID_COUNTER_SUFFIX}", self._max_id)
 
     def load_tasks(self) -> List[dict[str, Union[int, str]]]:
         """Возвращает список всех задач.
@@ -179,12 +1232,155 @@ class FileTaskStorage(TaskStorage):
             List[dict[str, Union[int, str]]]: Список всех задач в
                 формате списка словарей
         """
+        return self.load_indexed_tasks()[0]
+
+    def version(self) -> Optional[tuple]:
+        return file_stamps(self.file_path)
+
+    def prefers_loading(self) -> bool:
+        """Выборка загружает задачи, если есть кеш: файл меньше
+        PARALLEL_SCAN_BYTES (кеш используется или пересоздается для
+        следующих команд) или кеш совпадает с файлом. Большой файл
+        без актуального кеша читается потоком.
+        """
+        if self.cache_path is None:
+            return False
         try:
-            with open(self.file_path, "r", encoding="utf-8") as file:
-                return json.load(file)
+            key = self._cache_key()
         except FileNotFoundError:
-            return []
+            return True
+        return key[1] < PARALLEL_SCAN_BYTES or self._cache_matches(key)
 
+    @metrics.timed("load")
+    @profiling.phased("load")
+    def load_indexed_tasks(
+        self
+    ) -> Tuple[List[dict[str, Union[int, str]]], Optional[TaskIndex]]:
+        """Возвращает список всех задач и индексы для него.
+
+        Если JSON-файл не менялся с момента записи кеша (совпадают
+        время изменения, размер и inode), задачи и индексы читаются
+        из кеша без разбора JSON, иначе кеш пересоздается.
+
+        Returns:
+            Tuple[List[dict[str, Union[int, str]]], Optional[TaskIndex]]:
+                список всех задач и индексы для него
+        """
+        try:
+            key = self._cache_key()
+        except FileNotFoundError:
+            return [], None
+
+        cached = self._read_cache(key)
+        if cached is not None:
+            metrics.inc("tasks_scanned_total", len(cached[0]))
+            return cached
+
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            with paused_gc():
+                tasks = self._read_file(file)
+        metrics.inc("tasks_storage_read_bytes_total", key[1])
+        metrics.inc("tasks_scanned_total", len(tasks))
+        if self.cache_path is None:
+            return tasks, None
+        index = self._build_index(tasks)
+        self._write_cache(key, tasks, index)
+        return tasks, index
+
+    def iter_tasks(self, **filters) -> Iterator[dict[str, Union[int, str]]]:
+        """Потоковое чтение задач из JSON-файла.
+
+        Файл читается блоками, и каждая задача разбирается сразу,
+        как только ее запись целиком оказалась в буфере, поэтому
+        память не зависит от размера файла. Большие файлы делятся
+        на диапазоны, которые разбираются и фильтруются в нескольких
+        процессах (см. модуль parallel).
+
+        Args:
+            filters (TaskFilter): условия выборки
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: задачи в порядке файла
+        """
+        import parallel
+
+        ranges = parallel.split(self.file_path)
+        if ranges is not None:
+            return profiling.timed_iter(
+                "load", self._iter_parallel(ranges, filters)
+            )
+        return filter(
+            profiling.timed(
+                "filter", QueryableTaskStorage.predicate(**filters)
+            ),
+            profiling.timed_iter(
+                "load",
+                metrics.counted("tasks_scanned_total", self._iter_records()),
+            ),
+        )
+
+    def _iter_parallel(
+        self,
+        ranges: List[Tuple[int, int]],
+        filters: TaskFilter
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        import parallel
+
+        for tasks, scanned in parallel.scan(self.file_path, ranges, filters):
+            metrics.inc("tasks_scanned_total", scanned)
+            yield from tasks
+        metrics.inc("tasks_storage_read_bytes_total", ranges[-1][1])
+
+    def _iter_records(self) -> Iterator[dict[str, Union[int, str]]]:
+        try:
+            file = open(self.file_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        decoder = json.JSONDecoder()
+        try:
+            buffer, position = "", 0
+            opened, eof = False, False
+            while True:
+                position = JSON_SEPARATORS.match(buffer, position).end()
+                if not opened:
+                    if buffer.startswith("[", position):
+                        opened = True
+                        position += 1
+                        continue
+                elif buffer.startswith("]", position):
+                    return
+                elif position < len(buffer):
+                    try:
+                        task, position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        yield task
+                        continue
+
+                if eof:
+                    if opened or position < len(buffer):
+                        raise json.JSONDecodeError(
+                            "Неожиданный конец файла", buffer, position
+                        )
+                    return
+
+                # Запись не поместилась в буфер: дочитываем следующий блок,
+                # увеличивая его для записей крупнее блока
+                chunk = file.read(max(STREAM_CHUNK_SIZE, len(buffer)))
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+        finally:
+            # Сколько байт файла прочитано, в том числе при обходе,
+            # прерванном до конца файла
+            metrics.inc("tasks_storage_read_bytes_total", file.buffer.tell())
+            file.close()
+
+    @metrics.timed("save")
+    @profiling.phased("save")
     def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
         """Сохранение актуального списка задач.
 
@@ -193,10 +1389,159 @@ class FileTaskStorage(TaskStorage):
                 список всех задач для сохранения
         """
         with open(self.file_path, "w", encoding="utf-8") as file:
-            json.dump(tasks, file, indent=4, ensure_ascii=False)
+            self._write_file(tasks, file)
+            metrics.inc("tasks_storage_written_bytes_total", file.tell())
+        if self.cache_path is not None:
+            self._write_cache(
+                self._cache_key(), tasks, self._build_index(tasks)
+            )
+        self.ids.advance(max((task["id"] for task in tasks), default=0))
+
+    def allocate_ids(self, count: int = 1) -> range:
+        return self.ids.allocate(count)
+
+    def release_ids(self, ids: range) -> None:
+        self.ids.release(ids)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Дописывание новых задач в конец JSON-массива.
+
+        Закрывающая скобка массива заменяется новыми записями в том же
+        оформлении, что и при полной записи, остальные задачи
+        не читаются. Если конец файла не похож на массив задач,
+        файл перезаписывается целиком.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): новые задачи
+        """
+        if not tasks:
+            return None
+        # Записи без скобок массива: "\n    {...},\n    {...}"
+        records = json.dumps(tasks, indent=4, ensure_ascii=False)[1:-2]
+        try:
+            file = open(self.file_path, "r+b")
+        except FileNotFoundError:
+            return self.save_tasks(tasks)
+        with file:
+            size = file.seek(0, os.SEEK_END)
+            start = file.seek(max(size - STREAM_CHUNK_SIZE, 0))
+            tail = file.read().rstrip()
+            head = tail[:-1].rstrip()
+            appendable = tail.endswith(b"]") and head[-1:] in (b"[", b"}")
+            if appendable:
+                separator = "," if head.endswith(b"}") else ""
+                data = f"{separator}{records}\n]".encode("utf-8")
+                file.seek(start + len(head))
+                file.write(data)
+                file.truncate()
+                metrics.inc("tasks_storage_written_bytes_total", len(data))
+        if not appendable:
+            self.save_tasks(self.load_tasks() + tasks)
+
+    def _max_id(self) -> int:
+        return max((task["id"] for task in self.iter_tasks()), default=0)
+
+    def _read_file(self, file: TextIO) -> List[dict[str, Union[int, str]]]:
+        """Разбор содержимого файла задач."""
+        import parallel
+
+        ranges = parallel.split(self.file_path)
+        if ranges is not None:
+            return [
+                task
+                for tasks, _ in parallel.scan(self.file_path, ranges, {})
+                for task in tasks
+            ]
+        return json.load(file)
+
+    def _write_file(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        file: TextIO
+    ) -> None:
+        """Запись списка задач в открытый файл."""
+        json.dump(tasks, file, indent=4, ensure_ascii=False)
+
+    def _cache_key(self) -> List[int]:
+        stat = os.stat(self.file_path)
+        return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+    def _read_cache(
+        self,
+        key: List[int]
+    ) -> Optional[Tuple[List[dict[str, Union[int, str]]], TaskIndex]]:
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path, "rb") as file:
+                if not self._valid_header(file, key):
+                    return None
+                # Задачи разбираются из байтов целиком: marshal.load
+                # из файла читает его мелкими частями
+                data = file.read()
+                metrics.inc("tasks_storage_read_bytes_total", file.tell())
+            with paused_gc():
+                tasks, index = marshal.loads(data)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return tasks, index
+
+    def _cache_matches(self, key: List[int]) -> bool:
+        # Читается только заголовок кеша, без задач
+        try:
+            with open(self.cache_path, "rb") as file:
+                return self._valid_header(file, key)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+    def _valid_header(self, file: BinaryIO, key: List[int]) -> bool:
+        header = marshal.load(file)
+        return (
+            isinstance(header, dict)
+            and header.get("version") == self.CACHE_VERSION
+            and header.get("key") == key
+        )
+
+    def _write_cache(
+        self,
+        key: List[int],
+        tasks: List[dict[str, Union[int, str]]],
+        index: TaskIndex
+    ) -> None:
+        # Заголовок с ключом - отдельный объект marshal в начале файла,
+        # чтобы проверять кеш, не читая задачи
+        header = {"version": self.CACHE_VERSION, "key": key}
+        tmp_path = f"{self.cache_path}.tmp"
+        # Кеш только ускоряет чтение, поэтому ошибки записи
+        # (например, каталог только для чтения) не мешают работе
+        try:
+            data = marshal.dumps(header) + marshal.dumps((tasks, index))
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, self.cache_path)
+            metrics.inc("tasks_storage_written_bytes_total", len(data))
+        except OSError:
+            pass
+
+    @staticmethod
+    @profiling.phased("index")
+    def _build_index(tasks: List[dict[str, Union[int, str]]]) -> TaskIndex:
+        index = TaskIndex(ids=[], category={}, status={}, due=[])
+        for task in tasks:
+            index["ids"].append(task["id"])
+            index["category"].setdefault(task["category"], set()).add(
+                task["id"]
+            )
+            index["status"].setdefault(task["status"], set()).add(task["id"])
+            index["due"].append((task["due_date"], task["id"]))
+        index["due"].sort()
+        return index
 
 
 class FileTask(Task):
+    __slots__ = ()
 
     def __init__(
         self,
@@ -267,40 +1612,51 @@ class FileTaskManager(TaskManager):
         """
         self.storage = storage
         self.task = task
+        self._collection: Optional[TaskCollection] = None
+        self._version: Optional[tuple] = None
 
-    def view_tasks(self, category: Optional[str]) -> None:
-        """Возвращает список всех задач.
+    @metrics.operation
+    @profiling.operation
+    def view_tasks(
+        self,
+        category: Optional[str],
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        reverse: bool = False,
+        include_archived: bool = False,
+        where: Optional[Query] = None,
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Задачи категории или все задачи с сортировкой и страницей.
 
         Args:
             category (Optional[str]): Если передать название категории,
-            то список будет отсортирован и будут выведены только задачи
-            с указанной категорией
-
-        Returns: возвращает список всех подходящих под условия задач,
-         если задачи отсутвуют вернется None
-        """
-        tasks = self.storage.load_tasks()
-
-        # Получение списка задач, в зависимости от наличия передаваемого
-        # аргумента, если параметр категория указан,
-        # то список фильтруется по ней
-        filter_tasks = (
-            [self.task(**task) for task in tasks]
-            if category is None
-            else (
-                [self.task(**task) for task in tasks
-                 if task["category"] == category]
-            )
-        )
-
-        if not filter_tasks:
-            print("Нет задач.")
-            return None
+            то будут возвращены только задачи с указанной категорией
+            sort (Optional[str]): поле сортировки: id, due_date,
+                priority (сначала высокий) или status
+                (сначала невыполненные)
+            limit (Optional[int]): максимальное количество задач
+            offset (int): количество пропускаемых задач
+            reverse (bool): обратный порядок сортировки
+            include_archived (bool): возвращать и задачи из архива
+            where (Optional[Query]): дополнительное условие отбора
 
-        # Вывод в консоль всех задач
-        [print(task.display()) for task in filter_tasks]
-        return None
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: подходящие задачи,
+                читаются из хранилища по мере обхода
+        """
+        return self.stream_tasks(
+            category=category,
+            order_by=sort,
+            limit=limit,
+            offset=offset,
+            descending=reverse,
+            include_archived=include_archived,
+            where=where,
+        )
 
+    @metrics.operation
+    @profiling.operation
     def add_task(
         self,
         title: str,
@@ -308,7 +1664,7 @@ class FileTaskManager(TaskManager):
         category: str,
         due_date: date,
         priority: str
-    ) -> None:
+    ) -> dict[str, Union[int, str]]:
         """Создает задачу с указанными аргументами
 
         Args:
@@ -317,72 +1673,137 @@ class FileTaskManager(TaskManager):
             category (str): категория задачи
             due_date (date): срок выполнения задачи
             priority (str): приоритет задачи.
-        """
-        tasks = self.storage.load_tasks()
 
+        Returns:
+            dict[str, Union[int, str]]: созданная задача
+        """
         # Вызов функции создания ID для записи
-        task_id = self.create_id(tasks)
+        task_id = self.create_ids(1)[0]
         # Форматирование даты в подходяший формат для записи в JSON
-        due_date = due_date.date().isoformat()
+        due_date = date_string(due_date)
 
         task = self.task(
             task_id, title, description, category, due_date, priority
         )
-        tasks.append(self.task.create_task(task))
+        record = self.task.create_task(task)
+        self.append_tasks([record])
+        return record
+
+    @metrics.operation
+    @profiling.operation
+    def import_tasks(
+        self,
+        rows: Iterable[
+            Tuple[int, Optional[dict[str, Union[int, str]]], Optional[str]]
+        ],
+        strict: bool = False
+    ) -> ImportResult:
+        """Массовое добавление задач из разобранных строк файла.
 
-        self.storage.save_tasks(tasks)
-        print("Задача добавлена.")
+        ID выделяются одним блоком, а все задачи сохраняются
+        одной записью в хранилище.
 
-    def delete_task(self, task_id: int, category: str) -> None:
+        Args:
+            rows (Iterable[Tuple[int, Optional[dict], Optional[str]]]):
+                номер строки, проверенные данные задачи без ID
+                или текст ошибки
+            strict (bool): при наличии ошибок не добавлять ни одной задачи
+
+        Returns:
+            ImportResult: количество добавленных задач и строки с ошибками
+
+        Raises:
+            ImportAbortedError: если strict и в строках есть ошибки
+        """
+        tasks, errors = [], []
+        for number, data, error in rows:
+            if error is not None:
+                errors.append((number, error))
+            else:
+                tasks.append(data)
+
+        if errors and strict:
+            raise ImportAbortedError(errors)
+
+        if tasks:
+            tasks = [
+                {"id": task_id, **data}
+                for task_id, data in zip(self.create_ids(len(tasks)), tasks)
+            ]
+            self.append_tasks(tasks)
+        return ImportResult(len(tasks), errors)
+
+    @metrics.operation
+    @profiling.operation
+    def delete_task(
+        self,
+        task_id: Union[int, Iterable[int], None],
+        category: Optional[str],
+        filters: Optional[TaskFilter] = None
+    ) -> Changes:
         """Удаление задач указанных в аргументе
 
         Args:
-            task_id (int): удаление задачи с указанным ID
+            task_id (Union[int, Iterable[int], None]): удаление задачи
+                с указанным ID или задач из списка ID
             category (str): удаление всех задач с указанной категорией
-        Return: Если задача удалена успешно,
-            будет выведено соотствующее информационное сообщение,
-            в противном случае будет возвращена ошибка
+            filters (Optional[TaskFilter]): дополнительные условия отбора,
+                все указанные условия должны выполняться
+
+        Returns:
+            Changes: количество подходящих и удаленных задач
+
+        Raises:
+            TaskNotFoundError: если задачи с единственным ID нет
+            NoMatchingTasksError: если подходящих задач нет
+            EmptySelectionError: если не указано ни одного условия
         """
-        if task_id and category:
-            raise click.ClickException(
-                "Можно указать только одну опцию: --id или --category."
-            )
-        tasks = self.storage.load_tasks()
-        if task_id:
-            # Поиск и удаление задачи с указанным ID
-            try:
-                task = next(task for task in tasks if task["id"] == task_id)
-                tasks.remove(task)
-            except StopIteration:
-                raise click.ClickException("Задача с указанным ID не найдена.")
-        else:
-            # Поиск всех задач с указанной категорией
-            new_tasks = [t for t in tasks if t["category"] != category]
+        task_ids = self.target_ids(task_id)
+        filters = dict(filters or {})
+        if category:
+            filters["category"] = category
+        storage = self.query_storage()
 
-            # Если длина не изменилась, значит ничего не удалили
-            if len(tasks) == len(new_tasks):
-                raise click.ClickException(
+        if task_ids is not None and len(task_ids) == 1 and not filters:
+            # Поиск и удаление задачи с указанным ID
+            if not storage.delete_tasks(task_ids=task_ids):
+                raise TaskNotFoundError("Задача с указанным ID не найдена.")
+            return Changes(1, 1, [])
+        if task_ids is None and list(filters) == ["category"]:
+            # Удаление всех задач с указанной категорией,
+            # если ничего не удалили, значит задач с ней нет
+            deleted = storage.delete_tasks(category=filters["category"])
+            if not deleted:
+                raise NoMatchingTasksError(
                     "Задачи с указанной категорией не найдены."
                 )
-            tasks = new_tasks
+            return Changes(deleted, deleted, [])
 
-        self.storage.save_tasks(tasks)
-        print("Успешное удаление.")
+        # Удаление всех задач, подходящих под условия, одной записью
+        matched = self.select_tasks(storage, task_ids, filters)
+        deleted = storage.delete_tasks(
+            task_ids=[task["id"] for task in matched]
+        )
+        return Changes(len(matched), deleted, [])
 
+    @metrics.operation
+    @profiling.operation
     def edit_task(
         self,
-        id: int,
+        id: Union[int, Iterable[int], None],
         title: Optional[str] = None,
         description: Optional[str] = None,
         category: Optional[str] = None,
         due_date: Optional[date] = None,
         priority: Optional[str] = None,
         status: Optional[str] = None,
-    ) -> Optional[T]:
+        filters: Optional[TaskFilter] = None,
+    ) -> Changes:
         """Редактирование выбранной задачи.
 
         Args:
-            id (int): обязательное поле, указывает задачу для редактирования
+            id (Union[int, Iterable[int], None]): указывает задачу
+                или список задач для редактирования
             title (Optional[str], optional): опциальное поле названия задачи
                 для редактирования, если не указать будет равно None.
             description (Optional[str], optional): опциальное поле описания
@@ -396,20 +1817,19 @@ class FileTaskManager(TaskManager):
                 задачи для редактирования, если не указать будет равно None.
             status (Optional[str], optional): опциальное поле статуса задачи
                 для редактирования, если не указать будет равно None.
+            filters (Optional[TaskFilter]): условия отбора задач для
+                редактирования, все указанные условия должны выполняться
 
         Returns:
-            Optional[T]: Если ID указан верно, то вернется выбранная задача
-                с измененными задачи, если ID указан не верно,
-                то вернется ошибка
-        """
-        tasks = self.storage.load_tasks()
-
-        # Поиск задачи
-        task = next((t for t in tasks if t["id"] == id), None)
-        if not task:
-            raise click.ClickException(f"Задача с ID {id} не найдена.")
+            Changes: количество подходящих задач и измененные задачи,
+                задача с единственным ID возвращается всегда
 
-        due_date = due_date.date().isoformat() if due_date else None
+        Raises:
+            TaskNotFoundError: если задачи с единственным ID нет
+            NoMatchingTasksError: если подходящих задач нет
+            EmptySelectionError: если не указано ни одного условия
+        """
+        due_date = date_string(due_date) if due_date else None
 
         # Обновление только измененных полей
         updates = {key: value for key, value in {
@@ -421,89 +1841,374 @@ class FileTaskManager(TaskManager):
             "status": status,
         }.items() if value is not None}
 
-        task.update(updates)
+        task_ids = self.target_ids(id)
+        storage = self.query_storage()
+        if task_ids is None or len(task_ids) != 1 or filters:
+            # Изменение всех подходящих задач одной записью
+            matched = self.select_tasks(storage, task_ids, filters or {})
+            changed = [
+                task["id"] for task in matched
+                if any(task[key] != value for key, value in updates.items())
+            ]
+            tasks = storage.update_tasks(changed, updates) if changed else []
+            return Changes(len(matched), len(tasks), tasks)
 
-        self.storage.save_tasks(tasks)
-        print(f"Задача с ID {id} успешно обновлена.")
-        task = self.task(**task)
-        print(task.display())
+        # Поиск и изменение задачи
+        id = task_ids[0]
+        task = storage.update_task(id, updates)
+        if not task:
+            raise TaskNotFoundError(f"Задача с ID {id} не найдена.")
+        return Changes(1, 1, [task])
 
-    def search_task(self, category: str, status: str) -> None:
-        """Поиск и вывод в консоль всех задач подходящих под условия поиска
+    @metrics.operation
+    @profiling.operation
+    def search_task(
+        self,
+        category: Optional[str],
+        status: Optional[str],
+        include_archived: bool = False,
+        where: Optional[Query] = None,
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Поиск задач, подходящих под все указанные условия
 
         Args:
-            status (str): будут найдены все задачи с указанным статусом
-            category (str): будут найдены все задачи с подходящими категориями
+            category (Optional[str]): подстрока категории задачи
+            status (Optional[str]): статус задачи
+            include_archived (bool): искать и среди задач из архива
+            where (Optional[Query]): условие отбора, проверяется
+                вместе с остальными условиями
 
-        С помощью print() выводится список всех под
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: подходящие задачи,
+                без условий поиска - ни одной
         """
-        if status and category:
-            raise click.ClickException(
-                "Можно указать только одну опцию: --status или --category."
-            )
-
-        tasks = self.storage.load_tasks()
-
-        if category:
-            # Фильтрация задач по категории
-            tasks = [
-                self.task(**task)
-                for task in tasks
-                if category in task["category"]
-            ]
-            if not len(tasks):
-                raise click.ClickException(
-                    "Задачи с указанной категорией не найдены."
-                )
-        else:
-            # Фильтрация задач по статусу
-            tasks = [
-                self.task(**task)
-                for task in tasks
-                if task["status"] == status
-            ]
-            if not len(tasks):
-                raise click.ClickException(
-                    "Задачи с указанным статусом не найдены."
-                )
-
-        # Вывод отфильтрованных задач в консоль
-        for task in tasks:
-            print(task.display())
+        # Указанные условия объединяются: задача должна подходить
+        # под все из них
+        filters = {
+            "category_contains": category or None,
+            "status": status or None,
+            "where": where,
+        }
+        if all(value is None for value in filters.values()):
+            return iter(())
+        return self.stream_tasks(include_archived=include_archived, **filters)
 
-    def update_status_task(self, id: int) -> None:
+    @metrics.operation
+    @profiling.operation
+    def update_status_task(
+        self,
+        id: Union[int, Iterable[int], None],
+        filters: Optional[TaskFilter] = None
+    ) -> Changes:
         """
         Изменение статуса задачи на 'Выполнена'.
         Если статус задачи уже отмечен этим статусом,
-        будет возвращена ошибка с соответствующим сообщением
+        будет возвращена ошибка с соответствующим сообщением.
+        При выборе нескольких задач уже выполненные задачи
+        пропускаются.
 
         Args:
-            id (int): ID задачи для изменения статуса
+            id (Union[int, Iterable[int], None]): ID задачи
+                или список ID для изменения статуса
+            filters (Optional[TaskFilter]): условия отбора задач,
+                все указанные условия должны выполняться
+
+        Returns:
+            Changes: количество подходящих задач и измененные задачи
+
+        Raises:
+            TaskNotFoundError: если задачи с единственным ID нет
+            TaskStatusError: если задача с единственным ID уже выполнена
+            NoMatchingTasksError: если подходящих задач нет
+            EmptySelectionError: если не указано ни одного условия
         """
-        tasks = self.storage.load_tasks()
+        task_ids = self.target_ids(id)
+        storage = self.query_storage()
+        if task_ids is None or len(task_ids) != 1 or filters:
+            matched = self.select_tasks(storage, task_ids, filters or {})
+            changed = [
+                task["id"] for task in matched
+                if task["status"] != DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS
+            ]
+            tasks = storage.update_tasks(
+                changed, completion()
+            ) if changed else []
+            return Changes(len(matched), len(tasks), tasks)
+        id = task_ids[0]
 
         # Находим нужную задачу
-        task = next((t for t in tasks if t["id"] == id), None)
+        task = storage.get_task(id)
         if not task:
-            raise click.ClickException(f"Задача с ID {id} не найдена.")
+            raise TaskNotFoundError(f"Задача с ID {id} не найдена.")
 
         # Возвращаем ошибку, если задача уже имеет нудный статус
         if task["status"] == DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS:
-            raise click.ClickException(
+            raise TaskStatusError(
                 f"Задача с ID {id} уже отмечена как 'Выполнена'."
             )
 
-        # Изменяем статус задачи
-        task["status"] = DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS
+        # Изменяем статус задачи и запоминаем дату выполнения
+        task = storage.update_task(id, completion())
+        return Changes(1, 1, [task])
+
+    @metrics.operation
+    @profiling.operation
+    def due_tasks(
+        self,
+        due_from: date,
+        due_to: Optional[date] = None,
+        include_done: bool = False,
+        limit: Optional[int] = None
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Задачи со сроком в интервале по возрастанию срока.
+
+        Args:
+            due_from (date): начало интервала включительно
+            due_to (Optional[date]): конец интервала включительно,
+                без него возвращаются все задачи со сроком не раньше
+                due_from
+            include_done (bool): возвращать и выполненные задачи
+            limit (Optional[int]): максимальное количество задач
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: подходящие задачи
+        """
+        return self._by_due(
+            date_string(due_from),
+            date_string(due_to) if due_to else None,
+            include_done,
+            limit,
+        )
+
+    @metrics.operation
+    @profiling.operation
+    def overdue_tasks(
+        self,
+        limit: Optional[int] = None
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Невыполненные задачи, срок которых уже прошел,
+        начиная с самых давних.
+
+        Args:
+            limit (Optional[int]): максимальное количество задач
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: просроченные задачи
+        """
+        return self._by_due(
+            None,
+            (date.today() - timedelta(days=1)).isoformat(),
+            False,
+            limit,
+        )
+
+    def _by_due(
+        self,
+        due_from: Optional[str],
+        due_to: Optional[str],
+        include_done: bool,
+        limit: Optional[int]
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        # Выборка идет через хранилище с запросами: в памяти
+        # интервал берется из отсортированного индекса сроков,
+        # который файловые хранилища сохраняют в кеше
+        return self.query_storage().iter_tasks(
+            order_by="due_date",
+            limit=limit,
+            due_from=due_from,
+            due_to=due_to,
+            status=None if include_done else DEFAULT_STATUS_TASK,
+        )
 
-        self.storage.save_tasks(tasks)
-        task = self.task(**task)
-        print(task.display())
+    @metrics.operation
+    @profiling.operation
+    def archive_tasks(self, older_than: Optional[int] = None) -> int:
+        """Перенос выполненных задач из рабочего набора в архив.
+
+        Задачи сначала дописываются в архив и только потом удаляются
+        из хранилища, поэтому при сбое между этими шагами задача
+        остается в обоих местах, а не теряется. Такие задачи
+        при чтении с архивом возвращаются один раз.
+
+        Возраст задачи считается от даты выполнения completed_at,
+        а у задач, выполненных до появления этого поля, - от срока.
+
+        Args:
+            older_than (Optional[int]): переносить только задачи,
+                выполненные больше указанного количества дней назад,
+                без него переносятся все выполненные задачи
+
+        Returns:
+            int: количество перенесенных задач
+        """
+        storage = self.query_storage()
+        tasks = storage.find_tasks(
+            status=DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS
+        )
+        if older_than is not None:
+            completed_to = (
+                date.today() - timedelta(days=older_than + 1)
+            ).isoformat()
+            tasks = [
+                task for task in tasks
+                if (task.get("completed_at") or task["due_date"])
+                <= completed_to
+            ]
+        if tasks:
+            self.archive.append(tasks)
+            storage.delete_tasks(task_ids=[task["id"] for task in tasks])
+        return len(tasks)
+
+    @property
+    def archive(self) -> TaskArchive:
+        """Архив выполненных задач рядом с файлом хранилища."""
+        return TaskArchive(f"{self.storage.file_path}{ARCHIVE_SUFFIX}")
+
+    def stream_tasks(
+        self,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+        include_archived: bool = False,
+        **filters
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        """Последовательный обход задач, подходящих под условия.
+
+        Если задачи еще не загружены в память и хранилище не предпочитает
+        загрузку (prefers_loading, например при актуальном кеше), они
+        читаются из хранилища по одной и сразу фильтруются, не собираясь
+        в общий список.
+        Параметры те же, что у QueryableTaskStorage.iter_tasks,
+        а include_archived добавляет подходящие задачи из архива.
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: подходящие задачи
+        """
+        filters = pushdown(filters)
+        if include_archived:
+            # Рабочие и архивные задачи сливаются по ID, при равных ID
+            # рабочая задача идет первой и остается единственной
+            key = operator.itemgetter("id")
+            tasks = unique_ids(heapq.merge(
+                self.stream_tasks(**filters),
+                sorted(self.archive.iter_tasks(**filters), key=key),
+                key=key,
+            ))
+            return QueryableTaskStorage.paginate(
+                tasks, order_by, limit, offset, descending
+            )
+        if (
+            isinstance(self.storage, QueryableTaskStorage)
+            or self._collection is not None
+            or self.storage.prefers_loading()
+        ):
+            return self.query_storage().iter_tasks(
+                order_by, limit, offset, descending, **filters
+            )
+        tasks = self.storage.iter_tasks(**filters)
+        return QueryableTaskStorage.paginate(
+            tasks, order_by, limit, offset, descending
+        )
+
+    @staticmethod
+    def target_ids(
+        task_id: Union[int, Iterable[int], None]
+    ) -> Optional[List[int]]:
+        """Приведение ID или набора ID к списку без повторов.
+
+        Returns:
+            Optional[List[int]]: список ID или None, если ID не указаны
+        """
+        if task_id is None:
+            return None
+        if isinstance(task_id, int):
+            return [task_id]
+        return list(dict.fromkeys(task_id))
+
+    @staticmethod
+    def select_tasks(
+        storage: QueryableTaskStorage,
+        task_ids: Optional[List[int]],
+        filters: TaskFilter
+    ) -> List[dict[str, Union[int, str]]]:
+        """Отбор задач для массового изменения.
+
+        Returns:
+            List[dict[str, Union[int, str]]]: подходящие задачи, если
+                таких нет, будет возвращена ошибка
+        """
+        if task_ids is None and not filters:
+            raise EmptySelectionError(
+                "Укажите --id или условия отбора задач."
+            )
+        matched = storage.find_tasks(**pushdown({"ids": task_ids, **filters}))
+        if not matched:
+            raise NoMatchingTasksError(
+                "Задачи, подходящие под условия, не найдены."
+            )
+        return matched
+
+    def query_storage(self) -> QueryableTaskStorage:
+        """Хранилище, через которое выполняются выборки и изменения.
+
+        Если хранилище само поддерживает запросы, фильтры передаются
+        ему напрямую, иначе задачи один раз загружаются в память
+        и дальше обслуживаются индексами TaskCollection.
+
+        Returns:
+            QueryableTaskStorage: хранилище с поддержкой запросов
+        """
+        if isinstance(self.storage, QueryableTaskStorage):
+            return self.storage
+        if self._collection is None:
+            self._collection = TaskCollection(self.storage)
+        return self._collection
+
+    @contextmanager
+    def deferred_saves(self) -> Iterator[Callable[[], None]]:
+        """Отложенное сохранение изменений для пакетного режима.
+
+        Внутри блока задачи остаются в памяти, а изменения всех
+        выполненных команд записываются в хранилище одной операцией
+        при вызове возвращаемой функции и при выходе из блока.
+        Хранилища с собственными запросами записывают изменения сразу.
+
+        Yields:
+            Callable[[], None]: функция записи накопленных изменений
+        """
+        storage = self.query_storage()
+        if not isinstance(storage, TaskCollection):
+            yield lambda: None
+            return None
+        with storage.deferred():
+            yield storage.flush
+
+    @contextmanager
+    def synced(self) -> Iterator[None]:
+        """Блок работы с задачами в памяти, пока хранилище могут
+        изменять другие процессы.
+
+        При входе задачи перечитываются, если файлы хранилища
+        изменились после прошлого блока, при выходе запоминается
+        их состояние с учетом собственных изменений блока.
+        """
+        if self._collection is not None:
+            version = self.storage.version()
+            if version is None or version != self._version:
+                self._collection = None
+        try:
+            yield
+        finally:
+            self._version = self.storage.version()
 
     @staticmethod
     def create_id(tasks: List[dict[str, Union[int, str]]]) -> int:
         """Создание ID для новой задачи.
 
+        Оставлен для совместимости: сам менеджер выделяет ID через
+        create_ids, не читая весь список задач.
+
         Args:
             tasks (List[dict[str, Union[int, str]]]): список всех задач
                 для определения id
@@ -512,3 +2217,33 @@ class FileTaskManager(TaskManager):
             int: возвращает ID для новой задачи
         """
         return tasks[-1]["id"] + 1 if tasks else 1
+
+    def create_ids(self, count: int) -> range:
+        """Создание ID для новых задач одним блоком.
+
+        Если задачи не загружены в память, ID выдает счетчик
+        хранилища без чтения задач.
+
+        Args:
+            count (int): количество новых задач
+
+        Returns:
+            range: возвращает ID для новых задач
+        """
+        if self._collection is None:
+            return self.storage.allocate_ids(count)
+        return self._collection.allocate_ids(count)
+
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Сохранение новых задач.
+
+        Загруженный набор задач обновляется через TaskCollection,
+        иначе задачи дописываются в хранилище без чтения остальных.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): новые задачи
+        """
+        if self._collection is None:
+            self.storage.append_tasks(tasks)
+        else:
+            self._collection.insert_tasks(tasks)
@@ -1,25 +1,269 @@
-
-from datetime import date
-from typing import Optional
+import functools
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Iterable, List, Optional, TextIO, Tuple
 
 import click
 
-from classes import FileTask, FileTaskManager, FileTaskStorage
-from constants import PRIORITY_TYPE, TASK_STATUS
-from validators import validate_date, validate_not_blank
+from constants import (BENCH_SIZES, DAEMON_SOCKET_SUFFIX, DEFAULT_STORAGE,
+                       IMPORT_FORMATS, OUTPUT_FORMATS, PRIORITY_TYPE,
+                       SORT_FIELDS, STORAGE_TYPE_NAMES, TASK_STATUS)
+from errors import ImportAbortedError, TaskError
+from validators import (IdRange, QueryType, split_spec, validate_date,
+                        validate_not_blank)
+
+# Модули с логикой задач и хранилищ импортируются внутри команд,
+# чтобы --help и передача команды демону не тратили на них время
+if TYPE_CHECKING:
+    from classes import Changes, FileTaskManager
+    from queries import Query
+
+
+where_option = click.option(
+    "--where",
+    type=QueryType(),
+    default=None,
+    help="Условие отбора, например \"status = 'Не выполнена' and "
+         "priority in ('высокий', 'средний') and due_date < 2026-12-01\".",
+)
+
+
+def filter_options(command):
+    """Опции отбора задач для массовых изменений."""
+    options = [
+        click.option(
+            "--filter-category",
+            type=str,
+            callback=validate_not_blank,
+            help="Отобрать задачи с указанной категорией.",
+        ),
+        click.option(
+            "--filter-status",
+            type=click.Choice(TASK_STATUS),
+            help="Отобрать задачи с указанным статусом.",
+        ),
+        click.option(
+            "--filter-priority",
+            type=click.Choice(PRIORITY_TYPE),
+            help="Отобрать задачи с указанным приоритетом.",
+        ),
+        click.option(
+            "--due-from",
+            type=click.DateTime(formats=["%Y-%m-%d"]),
+            help="Отобрать задачи со сроком не раньше указанной даты.",
+        ),
+        click.option(
+            "--due-to",
+            type=click.DateTime(formats=["%Y-%m-%d"]),
+            help="Отобрать задачи со сроком не позже указанной даты.",
+        ),
+        where_option,
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def format_option(command):
+    """Опция формата вывода для команд просмотра задач."""
+    return click.option(
+        "--format",
+        "output_format",
+        type=click.Choice(OUTPUT_FORMATS),
+        default="text",
+        help="Формат вывода: text - для чтения, json, ndjson и csv - "
+             "для скриптов, table - таблица.",
+    )(command)
+
+
+def archived_option(command):
+    """Опция вывода задач из архива для команд просмотра задач."""
+    return click.option(
+        "--include-archived",
+        is_flag=True,
+        help="Выводить и выполненные задачи, перенесенные в архив.",
+    )(command)
+
+
+def collect_filters(options: dict) -> dict:
+    """Преобразование опций filter_options в условия отбора задач."""
+    filters = {
+        "category": options.get("filter_category"),
+        "status": options.get("filter_status"),
+        "priority": options.get("filter_priority"),
+        "due_from": options.get("due_from"),
+        "due_to": options.get("due_to"),
+        "where": options.get("where"),
+    }
+    for key in ("due_from", "due_to"):
+        if filters[key] is not None:
+            filters[key] = filters[key].date().isoformat()
+    return {key: value for key, value in filters.items() if value is not None}
+
+
+def collect_ids(ranges: Tuple[List[range], ...]) -> Optional[List[int]]:
+    """Объединение значений повторяемой опции --id в список ID."""
+    if not ranges:
+        return None
+    return [task_id for group in ranges for part in group for task_id in part]
+
+
+def single_target(ids: Optional[List[int]], filters: dict) -> bool:
+    """Команда изменяет одну задачу по ID, а не набор задач по условиям."""
+    return ids is not None and len(set(ids)) == 1 and not filters
+
+
+def task_errors(command):
+    """Декоратор команды: ошибки менеджера задач и хранилищ
+    выводятся как ошибки команды.
+    """
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        try:
+            return command(*args, **kwargs)
+        except TaskError as error:
+            raise click.ClickException(str(error)) from error
+    return wrapper
+
+
+def show_tasks(
+    task_manager: "FileTaskManager",
+    tasks: Iterable[dict],
+    output_format: str
+) -> int:
+    """Вывод задач в формате output_format.
+
+    Returns:
+        int: количество выведенных задач
+    """
+    import metrics
+    from renderers import render_tasks
+
+    found = render_tasks(tasks, output_format, task_manager.task)
+    metrics.inc("tasks_returned_total", found)
+    return found
+
+
+def show_task(task_manager: "FileTaskManager", task: dict) -> None:
+    """Вывод одной задачи в текстовом формате."""
+    click.echo(task_manager.task.from_record(task).display())
+
+
+def show_changes(changes: "Changes", action: str) -> None:
+    """Вывод количества подходящих и измененных задач."""
+    click.echo(
+        f"Найдено задач: {changes.matched}. {action}: {changes.changed}."
+    )
+
+
+def show_import_errors(errors: List[Tuple[int, str]]) -> None:
+    """Вывод строк файла импорта, которые не добавлены."""
+    for number, error in errors:
+        click.echo(f"Строка {number}: {error}")
+
+
+# Переменная окружения с хранилищем по умолчанию
+STORAGE_ENVVAR = "TASKS_STORAGE"
+
+# Переменная окружения с файлом, в котором копятся метрики запусков
+METRICS_ENVVAR = "TASKS_METRICS_FILE"
+
+# Переменная окружения с порогом автоматического переноса в архив
+ARCHIVE_AFTER_ENVVAR = "TASKS_ARCHIVE_AFTER"
+
+# Опции группы cli со значением, которые main пропускает вместе
+# со значением при поиске имени команды
+VALUE_OPTIONS = ("--storage", "--profile-json", "--profile-dump",
+                 "--metrics-file")
 
 
 @click.group()
 @click.pass_context
-def cli(ctx):
+@click.option(
+    "--storage",
+    default=DEFAULT_STORAGE,
+    envvar=STORAGE_ENVVAR,
+    show_default=True,
+    help="Хранилище задач в формате '<тип>:<путь>', например "
+         "'journal:tasks.json'. Без типа используется JSON-файл.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Вывести в stderr время и время CPU по фазам операций: "
+         "чтение, индексы, фильтрация, сортировка, вывод, запись.",
+)
+@click.option(
+    "--profile-json",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Записать замер по фазам в JSON-файл вместо stderr.",
+)
+@click.option(
+    "--profile-dump",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Дополнительно записать полный профиль cProfile в файл "
+         "для pstats или snakeviz.",
+)
+@click.option(
+    "--metrics-file",
+    default=None,
+    envvar=METRICS_ENVVAR,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Прибавить метрики запуска к файлу в текстовом формате "
+         "Prometheus, например для textfile-коллектора node_exporter.",
+)
+def cli(
+    ctx,
+    storage: str,
+    profile: bool,
+    profile_json: Optional[str],
+    profile_dump: Optional[str],
+    metrics_file: Optional[str],
+):
     """
     Базовая группа команд для управления задачами.
 
     Инициализирует CLI и передает объект контекста (ctx),
     содержащий экземпляры:
     FileTaskManager, связанный с хранилищем задач.
+    Если менеджер не передан заранее, он создается
+    для хранилища из опции --storage при первом обращении
+    через get_manager.
+    """
+    if profile or profile_json or profile_dump:
+        import profiling
+
+        profiling.start(profile_dump)
+        ctx.call_on_close(lambda: profiling.stop(profile_json))
+    if metrics_file:
+        import metrics
+
+        ctx.call_on_close(lambda: metrics.flush(metrics_file))
+
+
+def get_manager(ctx) -> "FileTaskManager":
+    """
+    Менеджер задач текущего запуска.
+
+    Менеджер создается только когда он нужен команде, поэтому
+    вывод справки не загружает модули с логикой задач.
+
+    Returns:
+        FileTaskManager: менеджер, переданный в obj, или новый менеджер
+            для хранилища из опции --storage
     """
-    pass
+    root = ctx.find_root()
+    if root.obj is None:
+        from classes import FileTask, FileTaskManager
+        from storages import make_storage
+
+        root.obj = FileTaskManager(
+            make_storage(root.params["storage"]), FileTask
+        )
+    return root.obj
 
 
 @cli.command()
@@ -29,9 +273,44 @@ def cli(ctx):
     default=None,
     help="Категория задач для отображения."
 )
+@click.option(
+    "--sort",
+    type=click.Choice(SORT_FIELDS),
+    default=None,
+    help="Сортировка: по ID, сроку, приоритету (сначала высокий) "
+         "или статусу (сначала невыполненные).",
+)
+@click.option(
+    "--reverse",
+    is_flag=True,
+    help="Обратный порядок сортировки.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Максимальное количество задач для отображения.",
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Количество пропускаемых задач.",
+)
+@where_option
+@format_option
+@archived_option
+@task_errors
 def view_tasks(
     ctx,
-    category: Optional[str]
+    category: Optional[str],
+    sort: Optional[str],
+    reverse: bool,
+    limit: Optional[int],
+    offset: int,
+    where: Optional["Query"],
+    output_format: str,
+    include_archived: bool
 ) -> None:
     """Команда для просмотра задач.
 
@@ -39,9 +318,21 @@ def view_tasks(
         category (Optional[str]): при указании категории,
             записи будут отфильтрованы и выведены только
             задачи с указанной категорией
+        sort (Optional[str]): поле сортировки задач
+        reverse (bool): обратный порядок сортировки
+        limit (Optional[int]): максимальное количество задач
+        offset (int): количество пропускаемых задач
+        where (Optional[Query]): дополнительное условие отбора
+        output_format (str): формат вывода задач
+        include_archived (bool): выводить и задачи из архива
     """
-    task_manager = ctx.obj
-    task_manager.view_tasks(category)
+    task_manager = get_manager(ctx)
+    tasks = task_manager.view_tasks(
+        category, sort, limit, offset, reverse, include_archived, where
+    )
+    if not show_tasks(task_manager, tasks, output_format):
+        if output_format == "text":
+            click.echo("Нет задач.")
 
 
 @cli.command()
@@ -80,6 +371,7 @@ def view_tasks(
     type=click.Choice(PRIORITY_TYPE),
     help="Приоритет задачи",
 )
+@task_errors
 def add_task(
     ctx,
     title: str,
@@ -104,16 +396,75 @@ def add_task(
         priority (str): приоритет
     """
 
-    task_manager = ctx.obj
+    task_manager = get_manager(ctx)
     task_manager.add_task(title, description, category, due_date, priority)
+    click.echo("Задача добавлена.")
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--file",
+    "path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Файл CSV с заголовком или JSONL с задачами.",
+)
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(IMPORT_FORMATS),
+    default=None,
+    help="Формат файла, по умолчанию определяется по расширению.",
+)
+@click.option(
+    "--strict",
+    is_flag=True,
+    help="Не импортировать ничего, если в файле есть ошибки.",
+)
+@task_errors
+def import_tasks(
+    ctx,
+    path: str,
+    file_format: Optional[str],
+    strict: bool
+) -> None:
+    """
+    Команда для массового добавления задач из файла CSV или JSONL.
+
+    Validators:
+        Каждая строка проверяется по тем же правилам, что и поля
+            команды add-task. Поле status необязательно.
+
+    Args:
+        path (str): путь к файлу с задачами
+        file_format (Optional[str]): формат файла: csv или jsonl
+        strict (bool): при наличии ошибок задачи не добавляются
+    """
+    from importers import detect_format, parse_rows
+
+    task_manager = get_manager(ctx)
+    rows = parse_rows(path, file_format or detect_format(path))
+    try:
+        result = task_manager.import_tasks(rows, strict)
+    except ImportAbortedError as error:
+        show_import_errors(error.errors)
+        raise
+    show_import_errors(result.errors)
+    click.echo(
+        f"Импортировано задач: {result.imported}. "
+        f"Строк с ошибками: {len(result.errors)}."
+    )
 
 
 @cli.command()
 @click.pass_context
 @click.option(
     "--id",
-    type=int,
-    help="Удалить задачу по ID."
+    type=IdRange(),
+    multiple=True,
+    help="Удалить задачу по ID. Опцию можно повторять, "
+         "допускаются диапазоны вида 3-10."
 )
 @click.option(
     "--category",
@@ -121,32 +472,46 @@ def add_task(
     callback=validate_not_blank,
     help="Удалить задачи по категории."
 )
+@filter_options
+@task_errors
 def delete_task(
     ctx,
-    id: Optional[int],
-    category: Optional[str]
+    id: Tuple[List[range], ...],
+    category: Optional[str],
+    **filters
 ) -> None:
     """
-    Команда для удаления записи, требует ID или категорию
-    задачи в качестве аргумента. Оба аргумента опциональны,
-    но для успешной работы должен быть указан хотя бы один из них
+    Команда для удаления записи, требует ID, категорию
+    или условия отбора задач в качестве аргумента. Все аргументы
+    опциональны, но для успешной работы должен быть указан хотя бы
+    один из них. Если указано несколько, удаляются задачи,
+    подходящие под все условия.
 
     Args:
-        id (Optional[int]): будет удалена задача с указанными ID
+        id (Tuple[List[range], ...]): будут удалены задачи с указанными ID
         category (Optional[str]): будут удалены все задачи
             с указанной категорией
+        filters: условия отбора из filter_options
     """
-    task_manager = ctx.obj
-    task_manager.delete_task(id, category)
+    ids, filters = collect_ids(id), collect_filters(filters)
+    task_manager = get_manager(ctx)
+    changes = task_manager.delete_task(ids, category, filters)
+    click.echo("Успешное удаление.")
+    selection = dict(filters, **({"category": category} if category else {}))
+    if not single_target(ids, selection) and not (
+        ids is None and list(selection) == ["category"]
+    ):
+        show_changes(changes, "Удалено")
 
 
 @cli.command()
 @click.pass_context
 @click.option(
     "--id",
-    type=int,
-    required=True,
-    help="ID задачи для редактирования."
+    type=IdRange(),
+    multiple=True,
+    help="ID задачи для редактирования. Опцию можно повторять, "
+         "допускаются диапазоны вида 3-10."
 )
 @click.option(
     "--title",
@@ -182,18 +547,22 @@ def delete_task(
     type=click.Choice(TASK_STATUS),
     help="Отредактированный статус задачи"
 )
+@filter_options
+@task_errors
 def edit_task(
     ctx,
-    id: int,
+    id: Tuple[List[range], ...],
     title: Optional[str],
     description: Optional[str],
     category: Optional[str],
     due_date: Optional[date],
     priority: Optional[str],
-    status: Optional[str]
+    status: Optional[str],
+    **filters
 ) -> None:
     """
-     Команда для редактирования выбранной задачи.
+     Команда для редактирования выбранной задачи или всех задач,
+     подходящих под условия отбора.
 
      Validators:
         Поля title, description, category проверяются валидатором на то,
@@ -202,7 +571,7 @@ def edit_task(
             выполнения обязательно больше текущей даты
 
     Args:
-        id (int): обязательное поле, указывает задачу для редактирования
+        id (Tuple[List[range], ...]): указывает задачи для редактирования
         title (Optional[str], optional): опциальное поле названия задачи
             для редактирования, если не указать будет равно None.
         description (Optional[str], optional): опциальное поле описания
@@ -216,13 +585,21 @@ def edit_task(
             задачи для редактирования, если не указать будет равно None.
         status (Optional[str], optional): опциальное поле статуса задачи
             для редактирования, если не указать будет равно None.
+        filters: условия отбора из filter_options
 
     """
-    task_manager = ctx.obj
-    print(id, title, description, category, due_date, priority, status)
-    task_manager.edit_task(
-        id, title, description, category, due_date, priority, status
+    ids, filters = collect_ids(id), collect_filters(filters)
+    task_manager = get_manager(ctx)
+    changes = task_manager.edit_task(
+        ids, title, description, category, due_date, priority, status,
+        filters
     )
+    if single_target(ids, filters):
+        task, = changes.tasks
+        click.echo(f"Задача с ID {task['id']} успешно обновлена.")
+        show_task(task_manager, task)
+    else:
+        show_changes(changes, "Изменено")
 
 
 @cli.command()
@@ -238,25 +615,43 @@ def edit_task(
     callback=validate_not_blank,
     help="Найти все задачи по  указанной категории."
 )
+@where_option
+@format_option
+@archived_option
+@task_errors
 def search_task(
     ctx,
     status: Optional[str],
-    category: Optional[str]
+    category: Optional[str],
+    where: Optional["Query"],
+    output_format: str,
+    include_archived: bool
 ) -> None:
     """
     Команда для поиска всех записей удовлетворяющих критериям поиска,
-    требует статус или категорию задачи в качестве аргумента.
-    Оба аргумента опциональны, но для успешной работы должен
-    быть указан хотя бы один из них
+    требует статус, категорию задачи или условие отбора в качестве
+    аргумента. Все аргументы опциональны, но для успешной работы
+    должен быть указан хотя бы один из них. Если указано несколько,
+    выводятся задачи, подходящие под все условия
 
     Args:
         status (Optional[int]): будут показаны все задачи с указанным статусом
         category (Optional[str]): будут показаны все задачи
             с указанной категорией
+        where (Optional[Query]): условие отбора
+        output_format (str): формат вывода задач
+        include_archived (bool): искать и среди задач из архива
     """
-    task_manager = ctx.obj
-    task_manager.search_task(
-        category, status
+    task_manager = get_manager(ctx)
+    tasks = task_manager.search_task(category, status, include_archived, where)
+    if show_tasks(task_manager, tasks, output_format):
+        return None
+    if category and not status and where is None:
+        raise click.ClickException("Задачи с указанной категорией не найдены.")
+    if status and not category and where is None:
+        raise click.ClickException("Задачи с указанным статусом не найдены.")
+    raise click.ClickException(
+        "Задачи, подходящие под условия поиска, не найдены."
     )
 
 
@@ -264,27 +659,702 @@ def search_task(
 @click.pass_context
 @click.option(
     "--id",
-    type=int,
-    required=True,
-    help="ID задачи для изменения статуса на 'Выполнена'."
+    type=IdRange(),
+    multiple=True,
+    help="ID задачи для изменения статуса на 'Выполнена'. Опцию можно "
+         "повторять, допускаются диапазоны вида 3-10."
+)
+@click.option(
+    "--archive-after",
+    type=click.IntRange(min=0),
+    default=None,
+    envvar=ARCHIVE_AFTER_ENVVAR,
+    help="После изменения перенести в архив задачи, выполненные "
+         "больше указанного количества дней назад.",
 )
+@filter_options
+@task_errors
 def update_status_task(
     ctx,
-    id: int
+    id: Tuple[List[range], ...],
+    archive_after: Optional[int],
+    **filters
 ) -> None:
     """
     Команла для изменения статуса задачи на 'Выполнена'
 
     Args:
-        id (int): обязательное поле, указывает задачу для изменения статуса
+        id (Tuple[List[range], ...]): указывает задачи для изменения статуса
+        archive_after (Optional[int]): порог переноса выполненных
+            задач в архив в днях
+        filters: условия отбора из filter_options
     """
-    task_manager = ctx.obj
-    task_manager.update_status_task(id)
+    ids, filters = collect_ids(id), collect_filters(filters)
+    task_manager = get_manager(ctx)
+    changes = task_manager.update_status_task(ids, filters)
+    if single_target(ids, filters):
+        show_task(task_manager, changes.tasks[0])
+    else:
+        show_changes(changes, "Изменено")
+    if archive_after is not None:
+        archived = task_manager.archive_tasks(archive_after)
+        if archived:
+            click.echo(f"Перенесено в архив задач: {archived}.")
 
 
-if __name__ == "__main__":
-    task_storage = FileTaskStorage("tasks.json")
-    task_class = FileTask
-    task_manager = FileTaskManager(task_storage, task_class)
+@cli.command("due")
+@click.pass_context
+@click.option(
+    "--days",
+    type=click.IntRange(min=1),
+    default=7,
+    show_default=True,
+    help="Длина интервала в днях, начиная с --from.",
+)
+@click.option(
+    "--from",
+    "due_from",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Начало интервала (YYYY-MM-DD), по умолчанию сегодня.",
+)
+@click.option(
+    "--to",
+    "due_to",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Конец интервала включительно (YYYY-MM-DD), "
+         "вместо --days.",
+)
+@click.option(
+    "--all",
+    "include_done",
+    is_flag=True,
+    help="Выводить и выполненные задачи.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Максимальное количество задач для отображения.",
+)
+@format_option
+@task_errors
+def due_tasks(
+    ctx,
+    days: int,
+    due_from: Optional[datetime],
+    due_to: Optional[datetime],
+    include_done: bool,
+    limit: Optional[int],
+    output_format: str
+) -> None:
+    """
+    Команда для просмотра задач, срок которых наступает в ближайшие
+    дни, по возрастанию срока. По умолчанию выводятся невыполненные
+    задачи на неделю вперед, начиная с сегодняшнего дня.
+
+    Args:
+        days (int): длина интервала в днях
+        due_from (Optional[datetime]): начало интервала
+        due_to (Optional[datetime]): конец интервала включительно
+        include_done (bool): выводить и выполненные задачи
+        limit (Optional[int]): максимальное количество задач
+        output_format (str): формат вывода задач
+    """
+    start = due_from.date() if due_from else date.today()
+    end = due_to.date() if due_to else start + timedelta(days=days - 1)
+    if end < start:
+        raise click.BadParameter(
+            "Конец интервала раньше его начала.", param_hint="'--to'"
+        )
+    task_manager = get_manager(ctx)
+    tasks = task_manager.due_tasks(start, end, include_done, limit)
+    if not show_tasks(task_manager, tasks, output_format):
+        if output_format == "text":
+            click.echo("Нет задач со сроком в указанном интервале.")
+
+
+@cli.command("overdue")
+@click.pass_context
+@click.option(
+    "--limit",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Максимальное количество задач для отображения.",
+)
+@format_option
+@task_errors
+def overdue_tasks(ctx, limit: Optional[int], output_format: str) -> None:
+    """
+    Команда для просмотра невыполненных задач, срок которых уже
+    прошел, начиная с самых давних.
+
+    Args:
+        limit (Optional[int]): максимальное количество задач
+        output_format (str): формат вывода задач
+    """
+    task_manager = get_manager(ctx)
+    tasks = task_manager.overdue_tasks(limit)
+    if not show_tasks(task_manager, tasks, output_format):
+        if output_format == "text":
+            click.echo("Нет просроченных задач.")
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--older-than",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Переносить только задачи, выполненные больше указанного "
+         "количества дней назад.",
+)
+@task_errors
+def archive_tasks(ctx, older_than: Optional[int]) -> None:
+    """
+    Команда для переноса выполненных задач в сжатый архив рядом
+    с хранилищем. Перенесенные задачи не читаются при обычном
+    просмотре и поиске.
 
-    cli(obj=task_manager)
+    Args:
+        older_than (Optional[int]): порог переноса в днях
+    """
+    task_manager = get_manager(ctx)
+    archived = task_manager.archive_tasks(older_than)
+    click.echo(f"Перенесено в архив задач: {archived}.")
+
+
+# Команды, которые нельзя вызывать внутри пакетного режима
+# и которые не передаются демону
+SESSION_COMMANDS = ("batch", "shell", "daemon", "startup-bench", "bench")
+
+# Символы, при которых строка команды разбирается через shlex
+QUOTE_CHARS = frozenset("\"'\\")
+
+
+def run_commands(
+    ctx,
+    lines: Iterable[Tuple[int, str]],
+    flush_every: int,
+    stop_on_error: bool
+) -> int:
+    """
+    Выполнение команд из строк на одном менеджере задач.
+
+    Задачи загружаются один раз, а изменения записываются в хранилище
+    каждые flush_every команд и после последней команды.
+    Пустые строки и строки, начинающиеся с '#', пропускаются.
+
+    Args:
+        lines (Iterable[Tuple[int, str]]): номер строки и команда
+            в том же виде, что и в командной строке
+        flush_every (int): количество команд между записями,
+            0 - запись только в конце
+        stop_on_error (bool): прекратить выполнение на первой ошибке
+
+    Returns:
+        int: количество команд, завершившихся ошибкой
+    """
+    task_manager = get_manager(ctx)
+    errors = executed = 0
+    with task_manager.deferred_saves() as flush:
+        for number, line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                # shlex нужен только для строк с кавычками и экранированием
+                if QUOTE_CHARS.isdisjoint(line):
+                    args = line.split()
+                else:
+                    import shlex
+
+                    args = shlex.split(line)
+                name, command, args = cli.resolve_command(ctx, args)
+                if name in SESSION_COMMANDS:
+                    raise click.UsageError(
+                        f"Команду '{name}' нельзя вызвать в пакетном режиме."
+                    )
+                with command.make_context(name, args, parent=ctx) as sub:
+                    command.invoke(sub)
+            except (click.ClickException, ValueError) as error:
+                errors += 1
+                message = (
+                    error.format_message()
+                    if isinstance(error, click.ClickException) else error
+                )
+                click.echo(f"Строка {number}: {message}", err=True)
+                if stop_on_error:
+                    break
+            except click.exceptions.Exit:
+                # Вывод справки по команде через --help
+                pass
+
+            executed += 1
+            if flush_every and executed % flush_every == 0:
+                flush()
+    return errors
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--file",
+    "script",
+    type=click.File("r", encoding="utf-8"),
+    default="-",
+    help="Файл с командами, по одной в строке. По умолчанию stdin.",
+)
+@click.option(
+    "--flush-every",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Сохранять изменения каждые N команд, 0 - только в конце.",
+)
+@click.option(
+    "--stop-on-error",
+    is_flag=True,
+    help="Прекратить выполнение на первой команде с ошибкой.",
+)
+def batch(
+    ctx,
+    script: TextIO,
+    flush_every: int,
+    stop_on_error: bool
+) -> None:
+    """
+    Команда для выполнения множества команд над одним набором задач.
+
+    Каждая строка файла - команда с опциями без 'python commands.py',
+    например: add-task --title Задача ... Задачи загружаются один раз,
+    а изменения сохраняются в конце или каждые --flush-every команд.
+
+    Args:
+        script (TextIO): файл с командами
+        flush_every (int): количество команд между сохранениями
+        stop_on_error (bool): прекратить выполнение на первой ошибке
+    """
+    errors = run_commands(
+        ctx, enumerate(script, start=1), flush_every, stop_on_error
+    )
+    if errors:
+        raise click.ClickException(f"Команд с ошибками: {errors}.")
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--flush-every",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Сохранять изменения каждые N команд, 0 - только при выходе.",
+)
+def shell(ctx, flush_every: int) -> None:
+    """
+    Интерактивный режим: команды вводятся по одной без перезапуска
+    программы и повторной загрузки задач. Для выхода введите exit
+    или нажмите Ctrl+D.
+
+    Args:
+        flush_every (int): количество команд между сохранениями
+    """
+    def prompt() -> Iterable[Tuple[int, str]]:
+        number = 0
+        while True:
+            number += 1
+            try:
+                line = input("tasks> ")
+            except EOFError:
+                return None
+            if line.strip() in ("exit", "quit"):
+                return None
+            yield number, line
+
+    run_commands(ctx, prompt(), flush_every, stop_on_error=False)
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--target",
+    required=True,
+    help="Хранилище, в которое переносятся задачи, в формате "
+         "'<тип>:<путь>', например 'encoded:tasks.json'.",
+)
+@task_errors
+def convert_storage(ctx, target: str) -> None:
+    """
+    Команда для переноса всех задач в другое хранилище или формат.
+    Путь может совпадать с текущим: задачи сначала полностью
+    загружаются, а затем записываются в новом формате.
+
+    Args:
+        target (str): хранилище, в которое переносятся задачи
+    """
+    from storages import make_storage
+
+    tasks = get_manager(ctx).storage.load_tasks()
+    make_storage(target).save_tasks(tasks)
+    click.echo(f"Перенесено задач: {len(tasks)}.")
+
+
+@cli.command("metrics")
+@click.option(
+    "--output",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    help="Записать метрики в файл вместо вывода.",
+)
+def show_metrics(output: Optional[str]) -> None:
+    """
+    Команда для вывода метрик в текстовом формате Prometheus:
+    количество и время операций, прочитанные и выведенные задачи,
+    байты чтения и записи хранилища, вызовы fsync. В демоне
+    и пакетном режиме метрики накоплены по всем выполненным командам.
+
+    Args:
+        output (Optional[str]): файл для записи метрик
+    """
+    import metrics
+
+    if output:
+        metrics.export(output)
+    else:
+        click.echo(metrics.REGISTRY.render(), nl=False)
+
+
+@cli.command("daemon")
+@click.pass_context
+@click.option(
+    "--stop",
+    is_flag=True,
+    help="Остановить запущенный демон.",
+)
+def run_daemon(ctx, stop: bool) -> None:
+    """
+    Запуск демона, который держит задачи в памяти и выполняет команды
+    других запусков commands.py через Unix-сокет рядом с хранилищем.
+    Пока демон запущен, команды с тем же --storage передаются ему.
+
+    Args:
+        stop (bool): остановить запущенный демон
+    """
+    import daemon
+
+    path = daemon.socket_path(storage_path(ctx.parent.params["storage"]))
+    if stop:
+        if daemon.call(path, "shutdown") is None:
+            raise click.ClickException("Демон не запущен.")
+        click.echo("Демон остановлен.")
+        return None
+
+    task_manager = get_manager(ctx)
+    # Задачи загружаются при запуске демона и перечитываются, только
+    # если хранилище изменили в обход демона, например batch или shell
+    with task_manager.synced():
+        task_manager.query_storage().last_id()
+    daemon.serve(
+        path,
+        lambda args: execute_synced(task_manager, args),
+        storage_key(ctx.parent.params["storage"]),
+    )
+
+
+@cli.command(
+    "startup-bench",
+    context_settings={"ignore_unknown_options": True},
+)
+@click.pass_context
+@click.option(
+    "--runs",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Количество запусков.",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    default=15,
+    show_default=True,
+    help="Количество модулей в отчете.",
+)
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0),
+    help="Допустимое время запуска в мс, при превышении команда "
+         "завершается ошибкой.",
+)
+@click.argument("command", nargs=-1, type=click.UNPROCESSED)
+def startup_bench(
+    ctx,
+    runs: int,
+    top: int,
+    budget: Optional[float],
+    command: Tuple[str, ...]
+) -> None:
+    """
+    Замер холодного запуска: команда COMMAND (по умолчанию --help)
+    выполняется в новых процессах python -X importtime, после чего
+    выводится время запуска и время импорта модулей верхнего уровня.
+
+    Args:
+        runs (int): количество запусков
+        top (int): количество модулей в отчете
+        budget (Optional[float]): допустимое время запуска в мс
+        command (Tuple[str, ...]): замеряемая команда с опциями
+    """
+    from benchmarks import format_startup_report, measure_startup
+
+    storage = ctx.parent.params["storage"]
+    args = ["--storage", storage, *(command or ["--help"])]
+    report = measure_startup(args, runs)
+    click.echo(format_startup_report(report, top))
+    if budget is not None and min(report.wall_ms) > budget:
+        raise click.ClickException(
+            f"Время запуска {min(report.wall_ms):.1f} мс "
+            f"превышает бюджет {budget:.1f} мс."
+        )
+
+
+@cli.command("bench")
+@click.option(
+    "--size",
+    "sizes",
+    type=click.IntRange(min=1),
+    multiple=True,
+    help="Количество задач в наборе, опцию можно повторять. "
+         f"По умолчанию: {', '.join(map(str, BENCH_SIZES))}.",
+)
+@click.option(
+    "--storage-type",
+    type=click.Choice(STORAGE_TYPE_NAMES),
+    default="file",
+    show_default=True,
+    help="Тип хранилища.",
+)
+@click.option(
+    "--runs",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="Количество запусков каждой команды.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    default="bench-results.json",
+    show_default=True,
+    help="Файл для результатов в формате JSON.",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Файл с результатами прошлого замера для сравнения.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(min=1),
+    default=1.2,
+    show_default=True,
+    help="Во сколько раз медиана может превысить базовую, прежде чем "
+         "замер считается замедлением.",
+)
+def bench(
+    sizes: Tuple[int, ...],
+    storage_type: str,
+    runs: int,
+    output: str,
+    baseline: Optional[str],
+    threshold: float
+) -> None:
+    """
+    Замер всех команд на синтетических наборах задач разного размера:
+    время выполнения, задач в секунду и пиковая память процесса.
+    Каждая команда выполняется в новом процессе на свежей копии набора.
+
+    Args:
+        sizes (Tuple[int, ...]): размеры наборов задач
+        storage_type (str): тип хранилища
+        runs (int): количество запусков каждой команды
+        output (str): файл для результатов
+        baseline (Optional[str]): файл с базовыми результатами
+        threshold (float): допустимое отношение медианы к базовой
+    """
+    import tempfile
+
+    from benchmarks import (find_regressions, format_bench_row,
+                            load_results, run_benchmarks, save_results)
+
+    base = {
+        (result.case, result.size, result.storage): result
+        for result in (load_results(baseline) if baseline else [])
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for result in run_benchmarks(
+            sizes or BENCH_SIZES, storage_type, runs, workdir
+        ):
+            if not results:
+                click.echo(format_bench_row())
+            results.append(result)
+            key = (result.case, result.size, result.storage)
+            click.echo(format_bench_row(result, base.get(key)))
+    save_results(output, results)
+    click.echo(f"Результаты записаны в {output}.")
+
+    regressions = find_regressions(results, list(base.values()), threshold)
+    if regressions:
+        raise click.ClickException(
+            "Замедление относительно базового замера: " + ", ".join(
+                f"{result.case} ({result.size}) x{ratio:.2f}"
+                for result, ratio in regressions
+            )
+        )
+
+
+def storage_path(spec: str) -> str:
+    """Абсолютный путь к хранилищу из строки '<тип>:<путь>'."""
+    return os.path.abspath(split_spec(spec)[1])
+
+
+def storage_key(spec: str) -> List[str]:
+    """Тип и абсолютный путь хранилища, по которым клиент и демон
+    проверяют, что работают с одним хранилищем.
+    """
+    return [split_spec(spec)[0], storage_path(spec)]
+
+
+def execute(task_manager: "FileTaskManager", args: List[str]) -> int:
+    """
+    Выполнение команды на готовом менеджере задач.
+
+    Args:
+        task_manager (FileTaskManager): менеджер, на котором
+            выполняется команда
+        args (List[str]): аргументы командной строки
+
+    Returns:
+        int: код завершения команды
+    """
+    try:
+        cli.main(
+            args, prog_name="commands.py", obj=task_manager,
+            standalone_mode=False,
+        )
+    except click.ClickException as error:
+        error.show()
+        return error.exit_code
+    except click.exceptions.Exit as error:
+        return error.exit_code
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    return 0
+
+
+def execute_synced(task_manager: "FileTaskManager", args: List[str]) -> int:
+    """
+    Выполнение команды демоном: задачи в памяти перед командой
+    перечитываются, если файлы хранилища изменили другие процессы.
+    Команды из SESSION_COMMANDS демон не выполняет, даже если их
+    прислали в обход main.
+
+    Returns:
+        int: код завершения команды
+    """
+    _, command, _ = split_command(args)
+    if command in SESSION_COMMANDS:
+        error = click.UsageError(
+            f"Команду '{command}' нельзя выполнить через демон."
+        )
+        error.show()
+        return error.exit_code
+    with task_manager.synced():
+        return execute(task_manager, args)
+
+
+def split_command(args: List[str]) -> Tuple[str, Optional[str], List[str]]:
+    """
+    Хранилище, имя команды и ее аргументы без разбора всех опций.
+
+    Args:
+        args (List[str]): аргументы командной строки
+
+    Returns:
+        Tuple[str, Optional[str], List[str]]: строка хранилища, имя
+            команды или None и аргументы после имени команды
+    """
+    spec = os.environ.get(STORAGE_ENVVAR, DEFAULT_STORAGE)
+    rest = iter(args)
+    for arg in rest:
+        option, separator, value = arg.partition("=")
+        if option in VALUE_OPTIONS and not separator:
+            value = next(rest, "")
+        if option == "--storage":
+            spec = value or spec
+        elif not arg.startswith("-"):
+            return spec, arg, list(rest)
+    return spec, None, []
+
+
+def prompts_user(command: str, args: List[str]) -> bool:
+    """
+    Будет ли команда запрашивать значения опций с клавиатуры.
+    Такие команды не передаются демону: он не может читать ввод
+    клиента и выполняет их в своем процессе.
+
+    Args:
+        command (str): имя команды
+        args (List[str]): аргументы после имени команды
+
+    Returns:
+        bool: True, если не указана хотя бы одна опция с prompt
+    """
+    subcommand = cli.commands.get(command)
+    if subcommand is None or "--help" in args:
+        return False
+    given = {arg.partition("=")[0] for arg in args}
+    return any(
+        getattr(param, "prompt", None) and given.isdisjoint(param.opts)
+        for param in subcommand.params
+    )
+
+
+def main(args: List[str]) -> None:
+    """
+    Точка входа: если для хранилища запущен демон, команда
+    выполняется им, иначе задачи читаются из хранилища напрямую.
+
+    Args:
+        args (List[str]): аргументы командной строки
+    """
+    spec, command, command_args = split_command(args)
+    response = None
+    path = storage_path(spec) + DAEMON_SOCKET_SUFFIX
+    if (
+        command is not None and command not in SESSION_COMMANDS
+        and not prompts_user(command, command_args)
+        and os.path.exists(path)
+    ):
+        import daemon
+
+        try:
+            response = daemon.forward(path, args, storage_key(spec))
+        except click.ClickException as error:
+            error.show()
+            sys.exit(error.exit_code)
+    if response is None:
+        cli.main(args, prog_name="commands.py")
+        return None
+
+    exit_code, stdout, stderr = response
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,3 +2,63 @@ PRIORITY_TYPE = ("низкий", "средний", "высокий")
 TASK_STATUS = ("Выполнена", "Не выполнена")
 DEFAULT_STATUS_TASK = "Не выполнена"
 DEFAULT_STATUS_TASK_FOR_UPDATE_STATUS = "Выполнена"
+
+# Пороги фонового сжатия журнала операций JournalTaskStorage
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+JOURNAL_COMPACT_RATIO = 0.5
+JOURNAL_COMPACT_MIN_RECORDS = 1000
+
+# Размер блока, которым JSON-файл задач читается при потоковом разборе
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Поля, по которым можно сортировать задачи при просмотре
+SORT_FIELDS = ("id", "due_date", "priority", "status")
+
+# Хранилище задач по умолчанию
+DEFAULT_STORAGE = "tasks.json"
+
+# Типы хранилищ, как в STORAGE_TYPES модуля storages: команды
+# перечисляют их, не импортируя сами хранилища
+STORAGE_TYPE_NAMES = ("file", "journal", "encoded", "sqlite", "sharded")
+
+# Суффикс Unix-сокета демона рядом с файлом хранилища
+DAEMON_SOCKET_SUFFIX = ".sock"
+
+# Форматы файлов для импорта задач
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Форматы вывода задач командами просмотра и поиска
+OUTPUT_FORMATS = ("text", "json", "ndjson", "csv", "table")
+
+# Количество задач, которые форматируются и записываются в stdout
+# одним блоком
+OUTPUT_BATCH_SIZE = 1000
+
+# Суффикс файла счетчика ID рядом с файлом хранилища
+ID_COUNTER_SUFFIX = ".ids"
+
+# Количество ID, которое пакетный режим резервирует за одну запись
+# счетчика
+ID_RESERVE_BLOCK = 100
+
+# Размеры наборов задач для команды bench
+BENCH_SIZES = (1000, 10000, 100000, 1000000)
+
+# Границы интервалов гистограмм задержек, секунды
+METRICS_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Каталог файлов категорий в директории ShardedTaskStorage и суффикс
+# новой версии файла категории до фиксации изменений
+SHARD_CATALOG = "catalog.json"
+SHARD_NEW_SUFFIX = ".new"
+
+# Размер JSON-файла задач, начиная с которого он разбирается
+# в нескольких процессах, и размер диапазона для одного процесса
+PARALLEL_SCAN_BYTES = 64 * 1024 * 1024
+PARALLEL_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Суффикс сжатого архива выполненных задач рядом с хранилищем
+ARCHIVE_SUFFIX = ".archive.jsonl.gz"
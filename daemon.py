@@ -0,0 +1,311 @@
+"""
+Демон задач: долгоживущий процесс, который держит набор задач в памяти
+и выполняет команды, присланные через Unix-сокет.
+
+Протокол - JSON-RPC 2.0, по одному JSON-объекту в строке. Запрос:
+    {"jsonrpc": "2.0", "id": 1, "method": "execute",
+     "params": {"args": ["view-tasks"], "cwd": "/home/user"}}
+Ответ:
+    {"jsonrpc": "2.0", "id": 1,
+     "result": {"exit_code": 0, "stdout": "...", "stderr": ""}}
+Кроме execute поддерживаются методы ping и shutdown. В params.storage
+клиент передает тип и абсолютный путь своего хранилища: если демон
+обслуживает другое хранилище, он отвечает ошибкой STORAGE_MISMATCH,
+и клиент выполняет команду сам.
+"""
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Callable, List, Optional, Tuple, Union
+
+import click
+
+from constants import DAEMON_SOCKET_SUFFIX
+
+# Коды ошибок JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# Ошибка демона: запрос для другого хранилища
+STORAGE_MISMATCH = -32001
+
+# Время ожидания запроса от клиента демоном и ответа демона клиентом
+# на ping и shutdown; ответа на execute клиент ждет без ограничения,
+# пока выполняется команда, например импорт большого файла
+SOCKET_TIMEOUT = 30
+
+
+def socket_path(storage_path: str) -> str:
+    """Путь к сокету демона, обслуживающего указанное хранилище.
+
+    Сокет лежит рядом с файлом хранилища, поэтому клиент находит
+    демон по тому же --storage, с которым был запущен демон.
+    """
+    return storage_path + DAEMON_SOCKET_SUFFIX
+
+
+class TaskServer(socketserver.UnixStreamServer):
+    """Однопоточный сервер: запросы выполняются строго по очереди,
+    поэтому одновременные изменения от разных клиентов не смешиваются.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        execute: Callable[[List[str]], int],
+        storage: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            path (str): путь к Unix-сокету
+            execute (Callable[[List[str]], int]): выполнение команды
+                по списку аргументов, возвращает код завершения
+            storage (Optional[List[str]]): тип и абсолютный путь
+                обслуживаемого хранилища, без него хранилище
+                клиента не проверяется
+        """
+        self.execute = execute
+        self.storage = storage
+        self.stopping = False
+        super().__init__(path, TaskRequestHandler)
+
+    def serve(self) -> None:
+        """Обработка запросов до вызова метода shutdown."""
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if os.path.exists(self.server_address):
+                os.remove(self.server_address)
+
+    def call(self, method: str, params: dict) -> Union[dict, str]:
+        """Выполнение метода JSON-RPC.
+
+        Returns:
+            Union[dict, str]: результат метода
+        """
+        if method == "ping":
+            return "pong"
+        if method == "shutdown":
+            self.stopping = True
+            return "ok"
+
+        args, cwd = params.get("args"), params.get("cwd")
+        if not isinstance(args, list) or not all(
+            isinstance(arg, str) for arg in args
+        ):
+            raise RpcError(
+                INVALID_PARAMS, "params.args: ожидается список строк"
+            )
+        storage = params.get("storage")
+        if (
+            storage is not None and self.storage is not None
+            and list(storage) != list(self.storage)
+        ):
+            raise RpcError(
+                STORAGE_MISMATCH,
+                f"Демон обслуживает хранилище {':'.join(self.storage)}",
+            )
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        previous, stdin = os.getcwd(), sys.stdin
+        try:
+            # Относительные пути в опциях команд считаются
+            # от рабочей директории клиента
+            if cwd:
+                os.chdir(cwd)
+            # Ввод клиента демону недоступен: запрос значения
+            # прерывается сразу, а не ждет ввода в терминале демона
+            sys.stdin = io.StringIO()
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                exit_code = self.execute(args)
+        finally:
+            sys.stdin = stdin
+            os.chdir(previous)
+        return {
+            "exit_code": exit_code,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+
+class RpcError(Exception):
+    """Ошибка JSON-RPC, передаваемая клиенту в поле error ответа."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class DaemonError(click.ClickException):
+    """Ошибка, полученная клиентом от демона."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"Ошибка демона: {message}")
+        self.code = code
+
+
+class TaskRequestHandler(socketserver.StreamRequestHandler):
+    """Обработка соединения: каждая строка - отдельный запрос."""
+
+    timeout = SOCKET_TIMEOUT
+
+    def handle(self) -> None:
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                response = self.respond(line)
+                self.wfile.write(
+                    json.dumps(response, ensure_ascii=False).encode("utf-8")
+                    + b"\n"
+                )
+                if self.server.stopping:
+                    break
+        except socket.timeout:
+            pass
+
+    def respond(self, line: bytes) -> dict:
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RpcError(PARSE_ERROR, "Некорректный JSON")
+            if not isinstance(request, dict) or not isinstance(
+                request.get("method"), str
+            ):
+                raise RpcError(INVALID_REQUEST, "Некорректный запрос")
+            request_id = request.get("id")
+            if request["method"] not in ("execute", "ping", "shutdown"):
+                raise RpcError(
+                    METHOD_NOT_FOUND,
+                    f"Неизвестный метод '{request['method']}'",
+                )
+            params = request.get("params") or {}
+            result = self.server.call(request["method"], params)
+        except RpcError as error:
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": error.code, "message": error.message},
+            }
+        except Exception as error:
+            # Ошибка в команде не должна останавливать демон
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": INTERNAL_ERROR, "message": repr(error)},
+            }
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def call(
+    path: str,
+    method: str,
+    params: Optional[dict] = None
+) -> Optional[Union[dict, str]]:
+    """Вызов метода демона.
+
+    Args:
+        path (str): путь к сокету демона
+        method (str): имя метода JSON-RPC
+        params (Optional[dict]): параметры метода
+
+    Returns:
+        Optional[Union[dict, str]]: результат метода или None,
+            если демон не запущен
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(SOCKET_TIMEOUT)
+        try:
+            client.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Сокет остался от завершившегося демона
+            return None
+        if method == "execute":
+            client.settimeout(None)
+        request = {"jsonrpc": "2.0", "id": 1, "method": method}
+        if params is not None:
+            request["params"] = params
+        try:
+            client.sendall(
+                json.dumps(request, ensure_ascii=False).encode("utf-8")
+                + b"\n"
+            )
+            with client.makefile("rb") as reader:
+                line = reader.readline()
+        except socket.timeout:
+            raise DaemonError(INTERNAL_ERROR, "нет ответа")
+    if not line:
+        raise DaemonError(INTERNAL_ERROR, "соединение закрыто")
+    response = json.loads(line)
+    if "error" in response:
+        error = response["error"]
+        raise DaemonError(error["code"], error["message"])
+    return response["result"]
+
+
+def forward(
+    path: str,
+    args: List[str],
+    storage: Optional[List[str]] = None
+) -> Optional[Tuple[int, str, str]]:
+    """Передача команды демону, если он запущен.
+
+    Args:
+        path (str): путь к сокету демона
+        args (List[str]): аргументы команды
+        storage (Optional[List[str]]): тип и абсолютный путь хранилища
+            клиента
+
+    Returns:
+        Optional[Tuple[int, str, str]]: код завершения и вывод команды
+            или None, если демон не запущен или обслуживает
+            другое хранилище
+    """
+    params = {"args": args, "cwd": os.getcwd()}
+    if storage is not None:
+        params["storage"] = storage
+    try:
+        result = call(path, "execute", params)
+    except DaemonError as error:
+        if error.code == STORAGE_MISMATCH:
+            return None
+        raise
+    if result is None:
+        return None
+    return result["exit_code"], result["stdout"], result["stderr"]
+
+
+def serve(
+    path: str,
+    execute: Callable[[List[str]], int],
+    storage: Optional[List[str]] = None
+) -> None:
+    """Запуск демона на указанном сокете.
+
+    Args:
+        path (str): путь к Unix-сокету
+        execute (Callable[[List[str]], int]): выполнение команды
+            по списку аргументов, возвращает код завершения
+        storage (Optional[List[str]]): тип и абсолютный путь
+            обслуживаемого хранилища
+    """
+    if call(path, "ping") is not None:
+        raise click.ClickException(f"Демон уже запущен: {path}")
+    if os.path.exists(path):
+        os.remove(path)
+    server = TaskServer(path, execute, storage)
+    click.echo(f"Демон запущен: {path}")
+    server.serve()
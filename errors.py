@@ -0,0 +1,50 @@
+"""
+Ошибки операций с задачами.
+
+Менеджеры задач и хранилища сообщают об ошибках этими исключениями
+и не зависят от click: при использовании как библиотеки их можно
+перехватывать по типу, а команды консоли выводят их текст как ошибку
+команды с кодом завершения 1.
+"""
+from typing import List, Tuple
+
+
+class TaskError(Exception):
+    """Базовая ошибка операций с задачами."""
+
+
+class TaskNotFoundError(TaskError, LookupError):
+    """Задача с указанным ID не найдена."""
+
+
+class NoMatchingTasksError(TaskError, LookupError):
+    """Нет задач, подходящих под условия изменения."""
+
+
+class EmptySelectionError(TaskError, ValueError):
+    """Для массового изменения не указаны ни ID, ни условия отбора."""
+
+
+class TaskStatusError(TaskError):
+    """Задача уже в статусе, который ей пытаются назначить."""
+
+
+class InvalidTaskError(TaskError, ValueError):
+    """Значение поля задачи не прошло проверку."""
+
+
+class ImportAbortedError(TaskError):
+    """Строгий импорт отменен из-за строк с ошибками."""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        """
+        Args:
+            errors (List[Tuple[int, str]]): номер строки и текст ошибки
+                для каждой строки с ошибкой
+        """
+        super().__init__(f"Импорт отменен, строк с ошибками: {len(errors)}.")
+        self.errors = errors
+
+
+class StorageFormatError(TaskError):
+    """Файл хранилища записан в неподдерживаемом формате."""
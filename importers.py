@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from errors import InvalidTaskError
+from validators import validate_task_row
+
+# Результат разбора строки файла: номер строки, данные или текст ошибки
+ImportRow = Tuple[int, Optional[Dict[str, Union[int, str]]], Optional[str]]
+
+
+def detect_format(path: str) -> str:
+    """Определение формата импортируемого файла по расширению.
+
+    Args:
+        path (str): путь к файлу
+
+    Returns:
+        str: 'csv' или 'jsonl'
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return "csv" if extension == ".csv" else "jsonl"
+
+
+def read_rows(path: str, file_format: str) -> Iterator[ImportRow]:
+    """Потоковое чтение строк CSV (с заголовком) или JSONL файла.
+
+    Args:
+        path (str): путь к файлу
+        file_format (str): 'csv' или 'jsonl'
+
+    Returns:
+        Iterator[ImportRow]: номер строки, строка файла в виде словаря
+            или текст ошибки разбора; пустые строки JSONL пропускаются
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row, None
+            return
+
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield number, None, f"Некорректный JSON: {error.msg}."
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Строка должна быть JSON-объектом."
+                continue
+            yield number, row, None
+
+
+def parse_rows(path: str, file_format: str) -> Iterator[ImportRow]:
+    """Чтение и проверка строк импортируемого файла.
+
+    Каждая строка проверяется правилами validators.validate_task_row,
+    ошибки не прерывают чтение, а возвращаются вместе с номером строки.
+
+    Args:
+        path (str): путь к файлу
+        file_format (str): 'csv' или 'jsonl'
+
+    Returns:
+        Iterator[ImportRow]: номер строки, данные задачи без ID
+            или текст ошибки
+    """
+    for number, row, error in read_rows(path, file_format):
+        if error is not None:
+            yield number, None, error
+            continue
+        try:
+            yield number, validate_task_row(row), None
+        except InvalidTaskError as error:
+            yield number, None, str(error)
@@ -0,0 +1,348 @@
+"""
+Счетчики и гистограммы задержек работы с задачами в текстовом
+формате Prometheus.
+
+Метрики копятся в общем реестре REGISTRY, пока жив процесс: в демоне
+и пакетном режиме - по всем выполненным командам. Команда metrics
+выводит реестр, а опция --metrics-file дописывает накопленное
+с прошлой записи в файл для textfile-коллектора node_exporter.
+
+Учет всегда включен, поэтому обновление метрики - это несколько
+операций со словарем: имя и значения меток передаются позиционно,
+а не именованными аргументами.
+"""
+import functools
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple, TypeVar)
+
+from constants import METRICS_LATENCY_BUCKETS
+from profiling import Finalized
+
+T = TypeVar("T")
+
+Labels = Tuple[str, ...]
+
+# Имя метрики -> (тип, имена меток, описание)
+METRICS: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "tasks_operations_total": (
+        "counter", ("operation",), "Выполнено операций менеджера задач.",
+    ),
+    "tasks_operation_errors_total": (
+        "counter", ("operation",),
+        "Операций менеджера задач, завершенных ошибкой.",
+    ),
+    "tasks_operation_duration_seconds": (
+        "histogram", ("operation",),
+        "Время выполнения операций менеджера задач.",
+    ),
+    "tasks_storage_duration_seconds": (
+        "histogram", ("action",),
+        "Время чтения (load) и записи (save) хранилища задач.",
+    ),
+    "tasks_scanned_total": (
+        "counter", (), "Задач прочитано из хранилища.",
+    ),
+    "tasks_returned_total": (
+        "counter", (), "Задач выведено командами просмотра и поиска.",
+    ),
+    "tasks_storage_read_bytes_total": (
+        "counter", (), "Байт прочитано из файлов хранилища.",
+    ),
+    "tasks_storage_written_bytes_total": (
+        "counter", (), "Байт записано в файлы хранилища.",
+    ),
+    "tasks_storage_fsyncs_total": (
+        "counter", (), "Вызовов fsync при записи хранилища.",
+    ),
+}
+
+SAMPLE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+
+class Metrics:
+    """Реестр значений метрик из METRICS."""
+
+    def __init__(self):
+        # имя -> значения меток -> значение
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        # имя -> значения меток -> [попаданий в каждый интервал
+        # METRICS_LATENCY_BUCKETS и выше последнего, сумма]
+        self.histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        # Журнал может сжиматься в фоновом потоке
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, *labels: str) -> None:
+        """Увеличение счетчика name с метками labels на value."""
+        with self._lock:
+            values = self.counters.setdefault(name, {})
+            values[labels] = values.get(labels, 0) + value
+
+    def observe(self, name: str, value: float, *labels: str) -> None:
+        """Учет значения value в гистограмме name с метками labels."""
+        with self._lock:
+            values = self.histograms.setdefault(name, {})
+            buckets = values.get(labels)
+            if buckets is None:
+                buckets = values[labels] = [0] * (
+                    len(METRICS_LATENCY_BUCKETS) + 2
+                )
+            buckets[bisect_left(METRICS_LATENCY_BUCKETS, value)] += 1
+            buckets[-1] += value
+
+    def copy(self) -> "Metrics":
+        """Копия текущих значений."""
+        result = Metrics()
+        result.merge(self)
+        return result
+
+    def merge(self, other: "Metrics", sign: int = 1) -> None:
+        """Прибавление (или вычитание при sign=-1) значений other."""
+        with self._lock:
+            for name, values in other.counters.items():
+                counters = self.counters.setdefault(name, {})
+                for labels, value in values.items():
+                    counters[labels] = counters.get(labels, 0) + sign * value
+            for name, values in other.histograms.items():
+                histograms = self.histograms.setdefault(name, {})
+                for labels, buckets in values.items():
+                    current = histograms.setdefault(
+                        labels, [0] * len(buckets)
+                    )
+                    for position, value in enumerate(buckets):
+                        current[position] += sign * value
+
+    def drop_zeros(self) -> None:
+        """Удаление нулевых счетчиков и пустых гистограмм."""
+        with self._lock:
+            for values in self.counters.values():
+                for labels in [key for key, value in values.items()
+                               if not value]:
+                    del values[labels]
+            for values in self.histograms.values():
+                for labels in [key for key, buckets in values.items()
+                               if not any(buckets)]:
+                    del values[labels]
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            for name, (kind, label_names, description) in METRICS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    values = self.counters.get(name, {})
+                    if not values and not label_names:
+                        values = {(): 0}
+                    for labels, value in sorted(values.items()):
+                        lines.append(
+                            f"{name}{format_labels(label_names, labels)} "
+                            f"{format_value(value)}"
+                        )
+                    continue
+                for labels, buckets in sorted(
+                    self.histograms.get(name, {}).items()
+                ):
+                    lines.extend(
+                        histogram_lines(name, label_names, labels, buckets)
+                    )
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def parse(cls, text: str) -> "Metrics":
+        """Разбор метрик, записанных render.
+
+        Неизвестные метрики и строки другого вида пропускаются.
+        """
+        result = cls()
+        bounds = [format_value(bound) for bound in METRICS_LATENCY_BUCKETS]
+        for line in text.splitlines():
+            match = SAMPLE.match(line)
+            if match is None:
+                continue
+            name, label_text, value = match.groups()
+            labels = dict(LABEL.findall(label_text or ""))
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            if name in METRICS and METRICS[name][0] == "counter":
+                key = tuple(
+                    labels.get(label, "") for label in METRICS[name][1]
+                )
+                result.counters.setdefault(name, {})[key] = value
+                continue
+            base, _, suffix = name.rpartition("_")
+            if base not in METRICS or f"_{suffix}" not in HISTOGRAM_SUFFIXES:
+                continue
+            key = tuple(labels.get(label, "") for label in METRICS[base][1])
+            buckets = result.histograms.setdefault(base, {}).setdefault(
+                key, [0] * (len(bounds) + 2)
+            )
+            if suffix == "sum":
+                buckets[-1] = value
+            elif suffix == "count":
+                buckets[-2] = value
+            elif labels.get("le") in bounds:
+                buckets[bounds.index(labels["le"])] = value
+        # В файле интервалы накопительные, а в реестре - нет
+        for values in result.histograms.values():
+            for buckets in values.values():
+                for position in range(len(bounds), 0, -1):
+                    buckets[position] -= buckets[position - 1]
+        return result
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def format_labels(names: Iterable[str], values: Labels) -> str:
+    pairs = [
+        f'{name}="{escape(value)}"' for name, value in zip(names, values)
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value: str) -> str:
+    return (
+        value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+    )
+
+
+def histogram_lines(
+    name: str,
+    label_names: Tuple[str, ...],
+    labels: Labels,
+    buckets: List[float]
+) -> Iterator[str]:
+    """Строки гистограммы: накопительные интервалы, сумма и количество."""
+    label_names = (*label_names, "le")
+    total = 0
+    bounds = [*map(format_value, METRICS_LATENCY_BUCKETS), "+Inf"]
+    for bound, count in zip(bounds, buckets):
+        total += count
+        yield (
+            f"{name}_bucket{format_labels(label_names, (*labels, bound))} "
+            f"{format_value(total)}"
+        )
+    suffix = format_labels(label_names[:-1], labels)
+    yield f"{name}_sum{suffix} {format_value(buckets[-1])}"
+    yield f"{name}_count{suffix} {format_value(total)}"
+
+
+# Метрики текущего процесса
+REGISTRY = Metrics()
+# Значения, уже дописанные в файлы метрик
+_flushed = Metrics()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+
+
+def operation(method: Callable[..., T]) -> Callable[..., T]:
+    """Декоратор метода менеджера: количество вызовов, ошибок
+    и время выполнения под именем метода.
+
+    Вызов, вернувший итератор, учитывается после того, как итератор
+    исчерпан или закрыт, вместе с ошибками итерации.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+
+        def finish(error: Optional[BaseException] = None) -> None:
+            if error is not None:
+                inc("tasks_operation_errors_total", 1, name)
+            inc("tasks_operations_total", 1, name)
+            observe(
+                "tasks_operation_duration_seconds",
+                time.perf_counter() - started, name,
+            )
+
+        try:
+            result = method(*args, **kwargs)
+        except BaseException as error:
+            finish(error)
+            raise
+        if isinstance(result, Iterator):
+            return Finalized(result, finish)
+        finish()
+        return result
+    return wrapper
+
+
+def timed(action: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Декоратор метода хранилища: время выполнения как действие
+    action (load или save).
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(
+                    "tasks_storage_duration_seconds",
+                    time.perf_counter() - started, action,
+                )
+        return wrapper
+    return decorator
+
+
+def counted(name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Последовательность, количество полученных элементов которой
+    прибавляется к счетчику name после ее окончания.
+    """
+    count = 0
+    try:
+        for count, item in enumerate(iterable, start=1):
+            yield item
+    finally:
+        inc(name, count)
+
+
+def export(path: str) -> None:
+    """Запись метрик процесса в файл без промежуточного состояния."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def flush(path: str) -> None:
+    """Прибавление к метрикам в файле path всего, что накоплено
+    с прошлого вызова flush.
+
+    Одновременные запуски с одним файлом выполняются по очереди
+    благодаря блокировке файла <path>.lock.
+    """
+    import fcntl
+
+    delta = REGISTRY.copy()
+    delta.merge(_flushed, sign=-1)
+    # Метрики без изменений с прошлой записи в файл не попадают
+    delta.drop_zeros()
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                total = Metrics.parse(file.read())
+        except FileNotFoundError:
+            total = Metrics()
+        total.merge(delta)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(total.render())
+        os.replace(tmp_path, path)
+    _flushed.merge(delta)
@@ -0,0 +1,161 @@
+"""
+Разбор и фильтрация больших JSON-файлов задач в нескольких процессах.
+
+FileTaskStorage пишет задачи массивом с отступом в 4 пробела, поэтому
+каждая запись начинается с новой строки вида '    {'. Внутри строк
+JSON перевод строки экранируется, а задачи не содержат вложенных
+объектов, значит такая последовательность байт встречается только
+в начале записи. По ней файл делится на диапазоны байт, выровненные
+по записям, без чтения и разбора всего файла.
+
+Каждый диапазон разбирается и фильтруется отдельным процессом,
+а результаты возвращаются в порядке диапазонов, то есть в том же
+порядке, что и при последовательном чтении файла.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from constants import (PARALLEL_CHUNK_BYTES, PARALLEL_SCAN_BYTES,
+                       STREAM_CHUNK_SIZE)
+
+# Начало записи задачи в файле, записанном FileTaskStorage
+RECORD_START = b"\n    {"
+
+# Переменная окружения с количеством процессов для разбора файла
+WORKERS_ENVVAR = "TASKS_SCAN_WORKERS"
+
+Record = Dict[str, Union[int, str]]
+
+
+def worker_count() -> int:
+    """Количество процессов для разбора: из TASKS_SCAN_WORKERS или
+    по числу доступных процессу ядер.
+    """
+    value = os.environ.get(WORKERS_ENVVAR)
+    if value:
+        try:
+            return max(int(value), 1)
+        except ValueError:
+            pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split(path: str) -> Optional[List[Tuple[int, int]]]:
+    """Деление файла задач на диапазоны байт по границам записей.
+
+    Args:
+        path (str): путь к JSON-файлу задач
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: диапазоны [начало, конец)
+            с целыми записями или None, если файл меньше
+            PARALLEL_SCAN_BYTES, процесс доступен только один
+            или файл записан не в формате FileTaskStorage
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    if size < PARALLEL_SCAN_BYTES or worker_count() < 2:
+        return None
+    with open(path, "rb") as file:
+        if file.read(len(RECORD_START) + 1) != b"[" + RECORD_START:
+            return None
+        offset = file.seek(max(size - STREAM_CHUNK_SIZE, 0))
+        tail = file.read().rstrip()
+        if not tail.endswith(b"]"):
+            return None
+        # Позиция закрывающей скобки массива
+        end = offset + len(tail) - 1
+        bounds = [1]
+        while True:
+            start = find_record(file, bounds[-1] + PARALLEL_CHUNK_BYTES, end)
+            if start is None:
+                break
+            bounds.append(start)
+        bounds.append(max(end, 1))
+    return list(zip(bounds, bounds[1:]))
+
+
+def find_record(file, position: int, end: int) -> Optional[int]:
+    """Позиция первого начала записи не раньше position и до end."""
+    overlap = len(RECORD_START) - 1
+    while position < end:
+        file.seek(position)
+        block = file.read(min(STREAM_CHUNK_SIZE, end - position) + overlap)
+        found = block.find(RECORD_START)
+        if found != -1:
+            return position + found if position + found < end else None
+        position += STREAM_CHUNK_SIZE
+    return None
+
+
+def scan(
+    path: str,
+    ranges: List[Tuple[int, int]],
+    filters: dict
+) -> Iterator[Tuple[List[Record], int]]:
+    """Разбор и фильтрация диапазонов файла в пуле процессов.
+
+    Одновременно в работе не больше двух диапазонов на процесс,
+    поэтому память не зависит от размера файла. Если обход
+    прекращен раньше, оставшиеся диапазоны не разбираются.
+
+    Args:
+        path (str): путь к JSON-файлу задач
+        ranges (List[Tuple[int, int]]): диапазоны из split
+        filters (dict): условия выборки QueryableTaskStorage.predicate
+
+    Returns:
+        Iterator[Tuple[List[Record], int]]: подходящие задачи каждого
+            диапазона по порядку и количество разобранных в нем задач
+    """
+    workers = min(worker_count(), len(ranges))
+    # Новые процессы запускаются без копии памяти родителя,
+    # в которой могут быть потоки демона или сжатия журнала
+    pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+    pending: Deque[Future] = deque()
+    remaining = iter(ranges)
+    try:
+        for start, end in remaining:
+            pending.append(pool.submit(scan_range, path, start, end, filters))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            result = pending.popleft().result()
+            for start, end in remaining:
+                pending.append(
+                    pool.submit(scan_range, path, start, end, filters)
+                )
+                break
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown()
+
+
+def scan_range(
+    path: str,
+    start: int,
+    end: int,
+    filters: dict
+) -> Tuple[List[Record], int]:
+    """Разбор и фильтрация одного диапазона в процессе пула."""
+    from classes import QueryableTaskStorage
+
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    tasks = json.loads(b"[" + data.rstrip().rstrip(b",") + b"]")
+    if not filters:
+        return tasks, len(tasks)
+    predicate = QueryableTaskStorage.predicate(**filters)
+    return [task for task in tasks if predicate(task)], len(tasks)
@@ -0,0 +1,332 @@
+"""
+Замер времени по фазам работы с задачами для опции --profile.
+
+Хранилища и менеджер отмечают фазы (чтение, индексы, фильтрация,
+сортировка, вывод, запись) через phase, phased, timed и timed_iter,
+а методы менеджера - декоратором operation. Фаза относится
+к операции, во время которой она началась: вывод задач, которые
+метод вернул лениво, попадает в операцию этого метода. Пока профилирование
+не запущено, эти функции почти ничего не стоят: timed и timed_iter
+возвращают переданный объект без обертки.
+
+Время фазы считается без вложенных фаз: если вывод задач сам
+дочитывает их из файла, чтение попадает в фазу load, а не в render.
+"""
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple, TypeVar, Union)
+
+T = TypeVar("T")
+
+# Подпись для фаз, выполненных вне операций менеджера,
+# например записи накопленных изменений в конце пакетного режима
+OUTSIDE_OPERATIONS = "вне операций"
+
+
+class Profiler:
+    """Накопление времени фаз по операциям менеджера задач."""
+
+    def __init__(self, dump_path: Optional[str] = None):
+        """
+        Args:
+            dump_path (Optional[str]): файл для полного профиля cProfile
+        """
+        self.dump_path = dump_path
+        # (операция, фаза) -> [вызовов, время, время CPU]
+        self.phases: Dict[Tuple[str, str], List[float]] = {}
+        # операция -> [вызовов, время, время CPU] с учетом всех фаз
+        self.operations: Dict[str, List[float]] = {}
+        self.operation: Optional[str] = None
+        # [начало, начало CPU, время вложенных фаз, их время CPU,
+        # операция] для каждой незавершенной фазы
+        self._stack: List[List[Union[float, Optional[str]]]] = []
+        self._thread = threading.get_ident()
+        self._cprofile = None
+        if dump_path:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self.wall = self.cpu = 0.0
+        self._started = (time.perf_counter(), time.process_time())
+
+    def stop(self) -> None:
+        """Остановка замера и запись профиля cProfile."""
+        self.wall = time.perf_counter() - self._started[0]
+        self.cpu = time.process_time() - self._started[1]
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.dump_path)
+
+    def enter(self) -> bool:
+        """Начало фазы.
+
+        Returns:
+            bool: замеряется ли фаза; фазы фоновых потоков,
+                например сжатия журнала, не учитываются
+        """
+        if threading.get_ident() != self._thread:
+            return False
+        self._stack.append([
+            time.perf_counter(), time.process_time(), 0.0, 0.0,
+            self.operation,
+        ])
+        return True
+
+    def exit(self, name: str) -> None:
+        """Завершение фазы, начатой последним вызовом enter."""
+        (wall_start, cpu_start, child_wall, child_cpu,
+         operation) = self._stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        key = (operation or OUTSIDE_OPERATIONS, name)
+        totals = self.phases.setdefault(key, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += wall - child_wall
+        totals[2] += cpu - child_cpu
+        if self._stack:
+            self._stack[-1][2] += wall
+            self._stack[-1][3] += cpu
+
+    def as_dict(self) -> dict:
+        """Результаты замера для записи в JSON, время в мс."""
+        def entry(name: str, totals: List[float]) -> dict:
+            return {
+                "name": name,
+                "calls": totals[0],
+                "wall_ms": round(totals[1] * 1000, 3),
+                "cpu_ms": round(totals[2] * 1000, 3),
+            }
+
+        operations = dict(self.operations)
+        for operation, _ in self.phases:
+            operations.setdefault(operation, [0, 0.0, 0.0])
+        result = []
+        for operation, totals in operations.items():
+            phases = [
+                entry(phase, phase_totals)
+                for (owner, phase), phase_totals in self.phases.items()
+                if owner == operation
+            ]
+            result.append({**entry(operation, totals), "phases": phases})
+        return {
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "operations": result,
+        }
+
+    def report(self) -> str:
+        """Текстовый отчет для вывода в stderr."""
+        data = self.as_dict()
+        lines = [
+            f"Профиль: всего {data['wall_ms']:.1f} мс, "
+            f"CPU {data['cpu_ms']:.1f} мс.",
+            f"{'фаза':<24} {'вызовов':>9} {'время, мс':>11} {'CPU, мс':>11}",
+        ]
+        for operation in data["operations"]:
+            calls = operation["calls"] or ""
+            lines.append(
+                f"{operation['name']:<24} {calls:>9} "
+                f"{operation['wall_ms']:>11.1f} {operation['cpu_ms']:>11.1f}"
+            )
+            for phase in operation["phases"]:
+                lines.append(
+                    f"  {phase['name']:<22} {phase['calls']:>9} "
+                    f"{phase['wall_ms']:>11.1f} {phase['cpu_ms']:>11.1f}"
+                )
+        return "\n".join(lines)
+
+
+# Запущенный замер или None
+_profiler: Optional[Profiler] = None
+
+
+def start(dump_path: Optional[str] = None) -> Profiler:
+    """Запуск замера фаз.
+
+    Args:
+        dump_path (Optional[str]): файл для полного профиля cProfile
+
+    Returns:
+        Profiler: запущенный замер
+    """
+    global _profiler
+    _profiler = Profiler(dump_path)
+    return _profiler
+
+
+def stop(json_path: Optional[str] = None) -> Optional[Profiler]:
+    """Остановка замера и вывод результатов в JSON-файл или stderr.
+
+    Args:
+        json_path (Optional[str]): файл для результатов в JSON,
+            без него отчет выводится в stderr
+
+    Returns:
+        Optional[Profiler]: остановленный замер или None,
+            если замер не запускался
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(profiler.as_dict(), file, indent=4, ensure_ascii=False)
+    else:
+        print(profiler.report(), file=sys.stderr, flush=True)
+    return profiler
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Замер блока кода как фазы name."""
+    profiler = _profiler
+    if profiler is None or not profiler.enter():
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.exit(name)
+
+
+def phased(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Декоратор: каждый вызов функции замеряется как фаза name."""
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed(name: str, func: Callable[..., T]) -> Callable[..., T]:
+    """Функция, каждый вызов которой замеряется как фаза name.
+
+    Без запущенного замера возвращается сама функция.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        if not profiler.enter():
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.exit(name)
+    return wrapper
+
+
+def timed_iter(name: str, iterable: Iterable[T]) -> Iterable[T]:
+    """Последовательность, получение каждого элемента которой
+    замеряется как фаза name.
+
+    Без запущенного замера возвращается сама последовательность.
+    """
+    if _profiler is None:
+        return iterable
+    return map(timed(name, next), _repeat(iter(iterable)))
+
+
+def _repeat(iterator: Iterator[T]) -> Iterator[Iterator[T]]:
+    # next(iterator) внутри map: StopIteration исходной
+    # последовательности завершает и map
+    while True:
+        yield iterator
+
+
+def operation(method: Callable[..., T]) -> Callable[..., T]:
+    """Декоратор метода менеджера: фазы внутри вызова учитываются
+    под именем метода.
+
+    Если метод вернул итератор, операция продолжается, пока итератор
+    не исчерпан или не закрыт: чтение и вывод задач, найденных лениво,
+    учитываются вместе с вызовом.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profiler = _profiler
+        if profiler is None or profiler.operation is not None:
+            return method(*args, **kwargs)
+        profiler.operation = method.__name__
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        def finish(error: Optional[BaseException] = None) -> None:
+            totals = profiler.operations.setdefault(
+                method.__name__, [0, 0.0, 0.0]
+            )
+            totals[0] += 1
+            totals[1] += time.perf_counter() - wall
+            totals[2] += time.process_time() - cpu
+            profiler.operation = None
+
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            finish()
+            raise
+        if isinstance(result, Iterator):
+            return Finalized(result, finish)
+        finish()
+        return result
+    return wrapper
+
+
+class Finalized(Iterator[T]):
+    """Итератор, после исчерпания, ошибки, закрытия или удаления
+    которого один раз вызывается callback.
+
+    В отличие от генератора с finally, callback вызывается и для
+    итератора, из которого не получено ни одного элемента.
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator[T],
+        callback: Callable[[Optional[BaseException]], None]
+    ):
+        """
+        Args:
+            iterator (Iterator[T]): исходный итератор
+            callback (Callable[[Optional[BaseException]], None]):
+                вызывается с ошибкой итерации или с None
+        """
+        self._iterator = iterator
+        self._callback: Optional[Callable] = callback
+
+    def __next__(self) -> T:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as error:
+            self._finish(error)
+            raise
+
+    def close(self) -> None:
+        """Досрочное завершение итерации."""
+        close = getattr(self._iterator, "close", None)
+        if self._callback is not None and close is not None:
+            close()
+        self._finish(None)
+
+    def __del__(self) -> None:
+        self._finish(None)
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        callback, self._callback = self._callback, None
+        if callback is not None:
+            callback(error)
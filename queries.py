@@ -0,0 +1,338 @@
+"""
+Язык условий отбора задач для опции --where.
+
+    status = 'Не выполнена' and priority in ('высокий', 'средний')
+        and due_date < 2026-12-01
+
+Условие сравнивает поля задачи (id, title, description, category,
+due_date, priority, status) со значениями операторами =, !=, <, <=,
+>, >= (порядок - только для id и due_date), in (...), not in (...)
+и contains (подстрока, для текстовых полей). Условия объединяются
+через and, or, not и скобки. Строки пишутся в одинарных или двойных
+кавычках, кавычка внутри строки удваивается; слова без пробелов,
+числа и даты YYYY-MM-DD можно писать без кавычек.
+
+Условие компилируется один раз: в одну функцию Python, которая
+проверяет задачу за один проход, и в выражение WHERE для SQLite.
+Условия верхнего уровня, объединенные через and, которые совпадают
+с TaskFilter (ID, категория, статус, приоритет, границы срока),
+передаются хранилищам вместе с условием, чтобы они сократили
+перебор своими индексами.
+"""
+import re
+from datetime import date
+from typing import Callable, Dict, List, Tuple, Union
+
+Value = Union[int, str]
+Node = tuple
+
+FIELDS = (
+    "id", "title", "description", "category", "due_date", "priority",
+    "status",
+)
+# Поля, для которых имеет смысл порядок значений
+ORDERED_FIELDS = ("id", "due_date")
+TEXT_FIELDS = ("title", "description", "category")
+KEYWORDS = ("and", "or", "not", "in", "contains")
+COMPARISONS = ("=", "==", "!=", "<", "<=", ">", ">=")
+
+TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+        |(?P<date>\d{4}-\d{2}-\d{2}\b)
+        |(?P<number>\d+\b)
+        |(?P<op><=|>=|!=|==|=|<|>|\(|\)|,)
+        |(?P<word>[^\W\d]\w*)
+    )""", re.VERBOSE)
+
+
+class QueryError(ValueError):
+    """Ошибка в тексте условия."""
+
+
+class Query:
+    """Скомпилированное условие отбора задач."""
+
+    def __init__(self, text: str):
+        """
+        Args:
+            text (str): текст условия
+
+        Raises:
+            QueryError: если условие записано с ошибкой
+        """
+        self.text = text
+        self.tree = Parser(text).parse()
+        self.matches = compile_predicate(self.tree)
+        self.filters = index_filters(self.tree)
+
+    def sql(self) -> Tuple[str, List[Value]]:
+        """Условие в виде выражения WHERE для таблицы задач SQLite.
+
+        Returns:
+            Tuple[str, List[Value]]: выражение и его параметры
+        """
+        params: List[Value] = []
+        return to_sql(self.tree, params), params
+
+    def __reduce__(self):
+        # Для передачи в процессы parallel достаточно текста условия
+        return Query, (self.text,)
+
+    def __repr__(self) -> str:
+        return f"Query({self.text!r})"
+
+
+def pushdown(filters: dict) -> dict:
+    """Дополнение условий выборки условиями из where, которые
+    хранилища могут проверить своими индексами.
+
+    Явно указанные условия не заменяются: where все равно
+    проверяется целиком, поэтому результат не меняется.
+
+    Args:
+        filters (dict): условия выборки TaskFilter
+
+    Returns:
+        dict: условия выборки без значений None
+    """
+    filters = {
+        key: value for key, value in filters.items() if value is not None
+    }
+    query = filters.get("where")
+    if query is None:
+        return filters
+    return {**query.filters, **filters}
+
+
+class Parser:
+    """Разбор текста условия методом рекурсивного спуска.
+
+    Узлы дерева - кортежи: ("and", [узлы]), ("or", [узлы]),
+    ("not", узел), ("cmp", поле, оператор, значение),
+    ("in", поле, значения) и ("contains", поле, значение).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = list(self._tokenize(text))
+        self.position = 0
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QueryError("Условие отбора не может быть пустым.")
+        node = self._or()
+        if self.position < len(self.tokens):
+            self._expected("and или or")
+        return node
+
+    def _tokenize(self, text: str):
+        position = 0
+        while text[position:].strip():
+            match = TOKEN.match(text, position)
+            if match is None:
+                raise QueryError(
+                    f"Не удалось разобрать условие с позиции {position + 1}: "
+                    f"'{text[position:].strip()}'."
+                )
+            kind = match.lastgroup
+            value, offset = match.group(kind), match.start(kind)
+            if kind == "word" and value.lower() in KEYWORDS:
+                kind, value = "keyword", value.lower()
+            elif kind == "string":
+                value = value[1:-1].replace(value[0] * 2, value[0])
+            yield kind, value, offset
+            position = match.end()
+
+    def _peek(self, *expected: str) -> bool:
+        if self.position >= len(self.tokens):
+            return False
+        kind, value, _ = self.tokens[self.position]
+        return kind in ("keyword", "op") and value in expected
+
+    def _take(self, *expected: str) -> str:
+        if not self._peek(*expected):
+            self._expected(" или ".join(expected))
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def _expected(self, what: str):
+        if self.position >= len(self.tokens):
+            raise QueryError(
+                f"Условие отбора оборвалось: ожидается {what}."
+            )
+        self._fail(f"ожидается {what}, а не")
+
+    def _fail(self, message: str):
+        _, value, offset = self.tokens[self.position]
+        raise QueryError(
+            f"Ошибка в условии отбора на позиции {offset + 1}: "
+            f"{message} '{value}'."
+        )
+
+    def _or(self) -> Node:
+        nodes = [self._and()]
+        while self._peek("or"):
+            self.position += 1
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _and(self) -> Node:
+        nodes = [self._not()]
+        while self._peek("and"):
+            self.position += 1
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _not(self) -> Node:
+        if self._peek("not"):
+            self.position += 1
+            return ("not", self._not())
+        if self._peek("("):
+            self.position += 1
+            node = self._or()
+            self._take(")")
+            return node
+        return self._condition()
+
+    def _condition(self) -> Node:
+        field = self._field()
+        if self._peek("not"):
+            self.position += 1
+            self._take("in")
+            return ("not", ("in", field, self._values(field)))
+        if self._peek("in"):
+            self.position += 1
+            return ("in", field, self._values(field))
+        if self._peek("contains"):
+            if field not in TEXT_FIELDS:
+                self._fail(f"поле {field} не поддерживает")
+            self.position += 1
+            return ("contains", field, self._value(field))
+        operator = self._take(*COMPARISONS)
+        if operator in ("<", "<=", ">", ">=") and field not in ORDERED_FIELDS:
+            self.position -= 1
+            self._fail(f"поле {field} не поддерживает сравнение")
+        return ("cmp", field, "=" if operator == "==" else operator,
+                self._value(field))
+
+    def _field(self) -> str:
+        if self.position < len(self.tokens):
+            kind, value, _ = self.tokens[self.position]
+            if kind == "word" and value in FIELDS:
+                self.position += 1
+                return value
+        self._expected(f"поле ({', '.join(FIELDS)})")
+
+    def _values(self, field: str) -> Tuple[Value, ...]:
+        self._take("(")
+        values = [self._value(field)]
+        while self._peek(","):
+            self.position += 1
+            values.append(self._value(field))
+        self._take(")")
+        return tuple(values)
+
+    def _value(self, field: str) -> Value:
+        if (
+            self.position >= len(self.tokens)
+            or self.tokens[self.position][0] in ("op", "keyword")
+        ):
+            self._expected("значение")
+        kind, value, _ = self.tokens[self.position]
+        if field == "id":
+            if kind != "number":
+                self._fail("ID должен быть числом, а не")
+            value = int(value)
+        elif field == "due_date":
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                self._fail("срок должен быть датой YYYY-MM-DD, а не")
+        self.position += 1
+        return value
+
+
+def compile_predicate(tree: Node) -> Callable[[Dict[str, Value]], bool]:
+    """Компиляция дерева условия в одну функцию Python.
+
+    Поля подставляются только из FIELDS, а значения передаются
+    через пространство имен функции, поэтому текст условия
+    не попадает в исходный код.
+    """
+    namespace: Dict[str, object] = {"__builtins__": {}}
+
+    def constant(value) -> str:
+        name = f"v{len(namespace)}"
+        namespace[name] = value
+        return name
+
+    def source(node: Node) -> str:
+        kind = node[0]
+        if kind in ("and", "or"):
+            return f" {kind} ".join(f"({source(item)})" for item in node[1])
+        if kind == "not":
+            return f"not ({source(node[1])})"
+        if kind == "in":
+            return f"task[{node[1]!r}] in {constant(frozenset(node[2]))}"
+        if kind == "contains":
+            return f"{constant(node[2])} in task[{node[1]!r}]"
+        _, field, operator, value = node
+        operator = "==" if operator == "=" else operator
+        return f"task[{field!r}] {operator} {constant(value)}"
+
+    return eval(f"lambda task: {source(tree)}", namespace)
+
+
+def to_sql(node: Node, params: List[Value]) -> str:
+    """Перевод дерева условия в выражение WHERE с параметрами params."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        return f" {kind.upper()} ".join(
+            f"({to_sql(item, params)})" for item in node[1]
+        )
+    if kind == "not":
+        return f"NOT ({to_sql(node[1], params)})"
+    if kind == "in":
+        params.extend(node[2])
+        return f"{node[1]} IN ({', '.join('?' * len(node[2]))})"
+    if kind == "contains":
+        # instr, в отличие от LIKE, чувствителен к регистру
+        params.append(node[2])
+        return f"instr({node[1]}, ?) > 0"
+    _, field, operator, value = node
+    params.append(value)
+    return f"{field} {operator} ?"
+
+
+def index_filters(tree: Node) -> dict:
+    """Условия TaskFilter, которые следуют из условия верхнего уровня.
+
+    Для каждого ключа берется первое подходящее условие, остальные
+    проверяет функция условия.
+    """
+    filters: dict = {}
+    for node in tree[1] if tree[0] == "and" else [tree]:
+        kind, field = node[0], node[1] if len(node) > 1 else None
+        if kind == "in" and field == "id":
+            filters.setdefault("ids", sorted(node[2]))
+        elif kind == "in" and len(node[2]) == 1 and field in (
+            "category", "status", "priority"
+        ):
+            filters.setdefault(field, node[2][0])
+        elif kind == "contains" and field == "category":
+            filters.setdefault("category_contains", node[2])
+        elif kind == "cmp" and node[2] == "=":
+            if field == "id":
+                filters.setdefault("ids", [node[3]])
+            elif field in ("category", "status", "priority"):
+                filters.setdefault(field, node[3])
+            elif field == "due_date":
+                filters.setdefault("due_from", node[3])
+                filters.setdefault("due_to", node[3])
+        elif kind == "cmp" and field == "due_date" and node[2] != "!=":
+            # Строгие границы передаются как нестрогие: лишние задачи
+            # на границе отсеет функция условия
+            key = "due_from" if node[2] in (">", ">=") else "due_to"
+            filters.setdefault(key, node[3])
+    return filters
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import sys
+from itertools import chain, islice
+from json.encoder import encode_basestring
+from operator import itemgetter
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    TextIO, Union)
+
+import profiling
+from constants import OUTPUT_BATCH_SIZE
+
+# Поля задачи в порядке колонок CSV и таблицы
+TASK_FIELDS = (
+    "id", "title", "description", "category",
+    "due_date", "priority", "status",
+)
+TABLE_HEADERS = (
+    "ID", "Название", "Описание", "Категория",
+    "Срок", "Приоритет", "Статус",
+)
+
+Record = Dict[str, Union[int, str]]
+
+# Один кодировщик на все записи: json.dumps с параметрами
+# создает новый кодировщик при каждом вызове
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+task_fields = itemgetter(*TASK_FIELDS)
+
+# Строка NDJSON собирается по шаблону: поля задачи известны заранее,
+# и так получается вдвое быстрее, чем кодировать каждый словарь
+NDJSON_TEMPLATE = "{" + ", ".join(
+    f'"{field}": %d' if field == "id" else f'"{field}": %s'
+    for field in TASK_FIELDS
+) + "}\n"
+
+
+def render_text(batches: Iterable[List[Record]], task: type) -> Iterator[str]:
+    """Вывод задач в формате Task.display, как раньше выводил print."""
+    for batch in batches:
+        yield "".join([
+            task.from_record(record).display() + "\n" for record in batch
+        ])
+
+
+def render_json(batches: Iterable[List[Record]], task: type) -> Iterator[str]:
+    """Вывод задач одним JSON-массивом.
+
+    Блок задач кодируется одним вызовом кодировщика как список,
+    от которого затем отрезаются скобки.
+    """
+    separator = "["
+    for batch in batches:
+        yield separator + JSON_ENCODER.encode(batch)[1:-1]
+        separator = ",\n"
+    yield "[]\n" if separator == "[" else "]\n"
+
+
+def render_ndjson(
+    batches: Iterable[List[Record]],
+    task: type
+) -> Iterator[str]:
+    """Вывод задач по одному JSON-объекту в строке."""
+    for batch in batches:
+        yield "".join([
+            NDJSON_TEMPLATE % (
+                record["id"],
+                encode_basestring(record["title"]),
+                encode_basestring(record["description"]),
+                encode_basestring(record["category"]),
+                encode_basestring(record["due_date"]),
+                encode_basestring(record["priority"]),
+                encode_basestring(record["status"]),
+            )
+            for record in batch
+        ])
+
+
+def render_csv(batches: Iterable[List[Record]], task: type) -> Iterator[str]:
+    """Вывод задач в CSV с заголовком, который понимает import-tasks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(TASK_FIELDS)
+    for batch in batches:
+        writer.writerows(map(task_fields, batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def render_table(
+    batches: Iterable[List[Record]],
+    task: type
+) -> Iterator[str]:
+    """Вывод задач таблицей.
+
+    Ширина колонок зависит от всех строк, поэтому, в отличие
+    от остальных форматов, задачи сначала собираются в список.
+    """
+    rows = [
+        [str(value) for value in task_fields(record)]
+        for record in chain.from_iterable(batches)
+    ]
+    widths = [
+        max([len(header)] + [len(row[n]) for row in rows])
+        for n, header in enumerate(TABLE_HEADERS)
+    ]
+    for row in [list(TABLE_HEADERS), ["-" * width for width in widths], *rows]:
+        yield "  ".join(
+            value.ljust(width) for value, width in zip(row, widths)
+        ).rstrip() + "\n"
+
+
+RENDERERS: Dict[
+    str, Callable[[Iterable[List[Record]], type], Iterator[str]]
+] = {
+    "text": render_text,
+    "json": render_json,
+    "ndjson": render_ndjson,
+    "csv": render_csv,
+    "table": render_table,
+}
+
+
+def render_tasks(
+    records: Iterable[Record],
+    output_format: str,
+    task: type,
+    stream: Optional[TextIO] = None
+) -> int:
+    """Вывод задач в указанном формате.
+
+    Задачи форматируются блоками по OUTPUT_BATCH_SIZE, и каждый блок
+    записывается в поток одним вызовом write. Для структурированных
+    форматов записи сериализуются напрямую, объект задачи создается
+    только для текстового формата.
+
+    Args:
+        records (Iterable[Record]): записи задач из хранилища
+        output_format (str): один из OUTPUT_FORMATS
+        task (type): класс задачи, чей display используется
+            в текстовом формате
+        stream (Optional[TextIO]): поток вывода, по умолчанию stdout
+
+    Returns:
+        int: количество выведенных задач
+    """
+    # Поток берется при вызове, чтобы вывод, перенаправленный
+    # демоном или пакетным режимом, попадал куда нужно
+    stream = stream or sys.stdout
+    records = iter(records)
+    batches = iter(lambda: list(islice(records, OUTPUT_BATCH_SIZE)), [])
+    count = 0
+
+    def counted(batches: Iterator[List[Record]]) -> Iterator[List[Record]]:
+        nonlocal count
+        for batch in batches:
+            count += len(batch)
+            yield batch
+
+    # Фаза начинается до чтения первых задач: задачи, найденные
+    # методом менеджера лениво, выводятся в рамках его операции
+    with profiling.phase("render"):
+        first = next(batches, None)
+        if first is not None:
+            batches = chain([first], batches)
+        for block in RENDERERS[output_format](counted(batches), task):
+            stream.write(block)
+    return count
@@ -0,0 +1,1197 @@
+import fcntl
+import heapq
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from operator import itemgetter
+from typing import (BinaryIO, Callable, Dict, Iterable, Iterator, List,
+                    Optional, TextIO, Tuple, Union)
+
+import click
+
+import metrics
+import profiling
+from classes import (FileTaskStorage, IdAllocator, QueryableTaskStorage,
+                     TaskStorage, file_stamps)
+from constants import (DEFAULT_STATUS_TASK, ID_COUNTER_SUFFIX,
+                       JOURNAL_COMPACT_BYTES, JOURNAL_COMPACT_MIN_RECORDS,
+                       JOURNAL_COMPACT_RATIO, PRIORITY_TYPE, SHARD_CATALOG,
+                       SHARD_NEW_SUFFIX, STREAM_CHUNK_SIZE, TASK_STATUS)
+from errors import StorageFormatError
+from validators import split_spec
+
+
+class JournalTaskStorage(TaskStorage):
+    """Хранилище задач со снимком в JSON и журналом операций.
+
+    Снимок имеет тот же формат, что и файл FileTaskStorage, поэтому
+    хранилище можно направить на уже существующий tasks.json.
+    Каждое изменение дописывается в журнал (<file_path>.journal)
+    одной строкой JSON, а при загрузке журнал применяется поверх снимка.
+    Когда журнал разрастается, он в фоне сворачивается в новый снимок.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        compact_bytes: int = JOURNAL_COMPACT_BYTES,
+        compact_ratio: float = JOURNAL_COMPACT_RATIO,
+        compact_min_records: int = JOURNAL_COMPACT_MIN_RECORDS,
+        fsync: bool = False,
+    ):
+        """Создает хранилище с журналом операций.
+
+        Args:
+            file_path (str): путь к файлу снимка задач
+            compact_bytes (int): размер журнала в байтах, после которого
+                запускается сжатие
+            compact_ratio (float): отношение числа записей журнала к числу
+                задач в снимке, после которого запускается сжатие
+            compact_min_records (int): минимальное число записей журнала
+                для срабатывания порога compact_ratio
+            fsync (bool): сбрасывать ли журнал на диск после каждой записи
+        """
+        self.file_path = file_path
+        self.journal_path = f"{file_path}.journal"
+        self.compacting_path = f"{file_path}.journal.compacting"
+        self.compact_bytes = compact_bytes
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self.fsync = fsync
+        self._snapshot = FileTaskStorage(file_path)
+        self.ids = IdAllocator(f"{file_path}{ID_COUNTER_SUFFIX}", self._max_id)
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._snapshot_records: Optional[int] = None
+        self._journal_records = 0
+        # Отложенный журнал остается, если процесс завершился во время
+        # сжатия: он сворачивается в снимок сразу при открытии
+        if os.path.exists(self.compacting_path):
+            self._compact()
+
+    @metrics.timed("load")
+    @profiling.phased("load")
+    def load_tasks(self) -> List[dict[str, Union[int, str]]]:
+        """Возвращает список всех задач: снимок с примененным журналом.
+
+        Returns:
+            List[dict[str, Union[int, str]]]: Список всех задач в
+                формате списка словарей
+        """
+        with self._lock:
+            snapshot = self._snapshot.load_tasks()
+            tasks = {task["id"]: task for task in snapshot}
+            records = self._replay(self.compacting_path, tasks)
+            records += self._replay(self.journal_path, tasks)
+        self._snapshot_records = len(snapshot)
+        self._journal_records = records
+        return list(tasks.values())
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Полная перезапись снимка с очисткой журнала.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): принимает актуальный
+                список всех задач для сохранения
+        """
+        self.wait_compaction()
+        tmp_path = self._dump_snapshot(tasks)
+        with self._lock:
+            os.replace(tmp_path, self.file_path)
+            for path in (self.compacting_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._snapshot_records = len(tasks)
+        self._journal_records = 0
+        self.ids.advance(max((task["id"] for task in tasks), default=0))
+
+    def allocate_ids(self, count: int = 1) -> range:
+        return self.ids.allocate(count)
+
+    def release_ids(self, ids: range) -> None:
+        self.ids.release(ids)
+
+    def version(self) -> Optional[tuple]:
+        return file_stamps(
+            self.file_path, self.compacting_path, self.journal_path
+        )
+
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Дописывает новые задачи в журнал без чтения снимка.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): новые задачи
+        """
+        self._append([{"op": "put", "task": task} for task in tasks])
+
+    def save_changes(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        added: Iterable[dict[str, Union[int, str]]] = (),
+        updated: Iterable[dict[str, Union[int, str]]] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        """Дописывает изменения в журнал, не трогая снимок.
+
+        Args:
+            tasks (List[dict[str, Union[int, str]]]): актуальный список
+                всех задач, не используется
+            added (Iterable[dict[str, Union[int, str]]]): добавленные задачи
+            updated (Iterable[dict[str, Union[int, str]]]): измененные задачи
+            deleted (Iterable[int]): ID удаленных задач
+        """
+        records = [{"op": "put", "task": task} for task in added]
+        records += [{"op": "put", "task": task} for task in updated]
+        records += [{"op": "delete", "id": task_id} for task_id in deleted]
+        self._append(records)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def _append(self, records: List[dict]) -> None:
+        if not records:
+            return None
+
+        data = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n"
+            for record in records
+        ).encode("utf-8")
+        with self._lock:
+            with open(self.journal_path, "a+b") as file:
+                # Процессы дописывают журнал по очереди, иначе один
+                # мог бы принять чужую недописанную строку за оборванную
+                fcntl.flock(file, fcntl.LOCK_EX)
+                self._drop_torn_tail(file)
+                file.write(data)
+                if self.fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+                    metrics.inc("tasks_storage_fsyncs_total")
+            metrics.inc("tasks_storage_written_bytes_total", len(data))
+            self._journal_records += len(records)
+
+        if self._needs_compaction():
+            self.compact()
+
+    def compact(self, wait: bool = False) -> None:
+        """Запуск сжатия журнала в новый снимок в фоновом потоке.
+
+        Текущий журнал переименовывается, новые изменения пишутся
+        в свежий журнал, а поток применяет отложенный журнал к снимку
+        и атомарно заменяет файл снимка.
+
+        Если отложенный журнал остался от сжатия, прерванного в другом
+        процессе, сначала сворачивается он, а текущий журнал - при
+        следующем вызове.
+
+        Args:
+            wait (bool): дождаться окончания сжатия
+        """
+        with self._lock:
+            busy = self._compactor is not None and self._compactor.is_alive()
+            leftover = os.path.exists(self.compacting_path)
+            if busy or not (leftover or os.path.exists(self.journal_path)):
+                return None
+            if not leftover:
+                os.replace(self.journal_path, self.compacting_path)
+                self._journal_records = 0
+            self._compactor = threading.Thread(
+                target=self._compact, name="journal-compaction"
+            )
+            self._compactor.start()
+        if wait:
+            self.wait_compaction()
+
+    def wait_compaction(self) -> None:
+        """Ожидание завершения запущенного сжатия журнала."""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def _compact(self) -> None:
+        snapshot = self._snapshot.load_tasks()
+        tasks = {task["id"]: task for task in snapshot}
+        self._replay(self.compacting_path, tasks)
+        tasks = list(tasks.values())
+        tmp_path = self._dump_snapshot(tasks)
+        with self._lock:
+            os.replace(tmp_path, self.file_path)
+            # Тот же отложенный журнал мог свернуть другой процесс
+            try:
+                os.remove(self.compacting_path)
+            except FileNotFoundError:
+                pass
+        self._snapshot_records = len(tasks)
+
+    def _max_id(self) -> int:
+        return max((task["id"] for task in self.load_tasks()), default=0)
+
+    def _needs_compaction(self) -> bool:
+        try:
+            journal_bytes = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return False
+        if journal_bytes >= self.compact_bytes:
+            return True
+        return (
+            self._snapshot_records is not None
+            and self._journal_records >= self.compact_min_records
+            and self._journal_records
+            > self.compact_ratio * self._snapshot_records
+        )
+
+    def _dump_snapshot(self, tasks: List[dict[str, Union[int, str]]]) -> str:
+        # Снимок пишется во временный файл и затем атомарно заменяет
+        # основной, чтобы прерванная запись не испортила данные.
+        # Имя файла уникально: сжимать журнал могут несколько процессов
+        descriptor, tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(self.file_path)}.",
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(self.file_path)),
+        )
+        try:
+            with open(descriptor, "w", encoding="utf-8") as file:
+                json.dump(tasks, file, indent=4, ensure_ascii=False)
+                metrics.inc("tasks_storage_written_bytes_total", file.tell())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    @staticmethod
+    def _drop_torn_tail(file: BinaryIO) -> None:
+        """Удаление оборванной последней строки журнала.
+
+        Строку, которую процесс не дописал из-за сбоя, load_tasks
+        пропускает, но новая запись, дописанная сразу за ней, слилась бы
+        с ней и тоже потерялась. Поэтому журнал обрезается до конца
+        последней целой строки.
+
+        Args:
+            file (BinaryIO): журнал, открытый в режиме "a+b"
+        """
+        end = size = file.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - STREAM_CHUNK_SIZE, 0)
+            file.seek(start)
+            position = file.read(end - start).rfind(b"\n")
+            if position >= 0:
+                end = start + position + 1
+                break
+            end = start
+        if end < size:
+            file.truncate(end)
+
+    @staticmethod
+    def _replay(
+        path: str,
+        tasks: Dict[int, dict[str, Union[int, str]]]
+    ) -> int:
+        """Применение записей журнала к словарю задач.
+
+        Записи идемпотентны: 'put' заменяет задачу целиком,
+        'delete' удаляет ее, если она есть, поэтому повторное
+        применение уже учтенного журнала не меняет результат.
+
+        Returns:
+            int: количество примененных записей
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+                metrics.inc("tasks_storage_read_bytes_total", file.tell())
+        except FileNotFoundError:
+            return 0
+
+        count = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Последняя строка могла оборваться при аварийной записи
+                if number == len(lines):
+                    break
+                raise
+            if record["op"] == "put":
+                task = record["task"]
+                tasks[task["id"]] = task
+            else:
+                tasks.pop(record["id"], None)
+            count += 1
+        return count
+
+
+class EncodedTaskStorage(FileTaskStorage):
+    """Хранилище задач в JSON-файле со словарным кодированием.
+
+    Категории, приоритеты и статусы перечисляются один раз в заголовке
+    файла, а в задачах хранятся их номера. Задачи записываются
+    массивами полей в порядке FIELDS, без повторения имен полей,
+    а дата выполнения невыполненной задачи записывается как null:
+
+        {"format": "encoded", "version": 2,
+         "dictionary": {"category": [...], "priority": [...],
+                        "status": [...]},
+         "fields": ["id", "title", ...],
+         "tasks": [[1, "Задача", "Описание", 0, "2099-12-12", 2, 1,
+                    null], ...]}
+
+    Файлы в формате FileTaskStorage и версии 1 без даты выполнения
+    тоже читаются и переводятся в новый формат при первой записи.
+    """
+    FORMAT = "encoded"
+    VERSION = 2
+    FIELDS = (
+        "id", "title", "description", "category",
+        "due_date", "priority", "status", "completed_at",
+    )
+    # Поля прежних версий формата
+    LEGACY_FIELDS = {1: FIELDS[:-1]}
+    ENCODED_FIELDS = ("category", "priority", "status")
+
+    def iter_tasks(self, **filters) -> Iterator[dict[str, Union[int, str]]]:
+        """Обход задач, подходящих под условия.
+
+        Условия по категории, приоритету и статусу переводятся в номера
+        из словаря файла и сравниваются с полями задачи как числа,
+        а в словари превращаются только подходящие задачи.
+
+        Args:
+            filters (TaskFilter): условия выборки
+
+        Returns:
+            Iterator[dict[str, Union[int, str]]]: задачи в порядке файла
+        """
+        try:
+            file = open(self.file_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return iter(())
+        with file, profiling.phase("load"):
+            data = json.load(file)
+            metrics.inc("tasks_storage_read_bytes_total", file.tell())
+        if isinstance(data, list):
+            return super().iter_tasks(**filters)
+
+        dictionary, rows = self._check_header(data), data["tasks"]
+        metrics.inc("tasks_scanned_total", len(rows))
+        matches = self._row_predicate(dictionary, **filters)
+        if matches is None:
+            return iter(())
+        tasks = self._decode(
+            dictionary, filter(profiling.timed("filter", matches), rows)
+        )
+        if filters.get("where") is not None:
+            # Условие where проверяется уже на раскодированных задачах,
+            # прошедших сравнение номеров словаря
+            tasks = filter(
+                profiling.timed("filter", filters["where"].matches), tasks
+            )
+        return profiling.timed_iter("load", tasks)
+
+    def append_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        # Новые категории добавляются в словарь в заголовке файла,
+        # поэтому файл перезаписывается целиком
+        self.save_tasks(self.load_tasks() + tasks)
+
+    def _read_file(self, file: TextIO) -> List[dict[str, Union[int, str]]]:
+        data = json.load(file)
+        if isinstance(data, list):
+            # Файл в формате FileTaskStorage
+            return data
+        return list(self._decode(self._check_header(data), data["tasks"]))
+
+    def _write_file(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        file: TextIO
+    ) -> None:
+        # Приоритеты и статусы нумеруются в порядке констант,
+        # категории - в порядке первого появления
+        codes = {
+            "category": {},
+            "priority": {value: n for n, value in enumerate(PRIORITY_TYPE)},
+            "status": {value: n for n, value in enumerate(TASK_STATUS)},
+        }
+        rows = []
+        for task in tasks:
+            row = [task.get(field) for field in self.FIELDS]
+            for n, field in enumerate(self.FIELDS):
+                if field in codes:
+                    row[n] = codes[field].setdefault(row[n], len(codes[field]))
+            rows.append(row)
+
+        header = {
+            "format": self.FORMAT,
+            "version": self.VERSION,
+            "dictionary": {
+                field: list(codes[field]) for field in self.ENCODED_FIELDS
+            },
+            "fields": list(self.FIELDS),
+        }
+        file.write("{\n")
+        for key, value in header.items():
+            file.write(f'"{key}": {json.dumps(value, ensure_ascii=False)},\n')
+        file.write('"tasks": [\n')
+        file.write(",\n".join(
+            json.dumps(row, ensure_ascii=False) for row in rows
+        ))
+        file.write("\n]}\n")
+
+    def _check_header(self, data: dict) -> Dict[str, List[str]]:
+        """Проверка заголовка файла, возвращает словари кодов."""
+        fields = (
+            self.FIELDS if data.get("version") == self.VERSION
+            else self.LEGACY_FIELDS.get(data.get("version"))
+        )
+        if (
+            data.get("format") != self.FORMAT
+            or fields is None
+            or data.get("fields") != list(fields)
+        ):
+            raise StorageFormatError(
+                f"Неподдерживаемый формат файла задач: {self.file_path}"
+            )
+        return data["dictionary"]
+
+    @staticmethod
+    def _decode(
+        dictionary: Dict[str, List[str]],
+        rows: Iterable[List[Union[int, str]]]
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        # Значения берутся из словаря, поэтому все задачи ссылаются
+        # на одни и те же строки категорий, приоритетов и статусов
+        categories = dictionary["category"]
+        priorities = dictionary["priority"]
+        statuses = dictionary["status"]
+        for (
+            id, title, description, category, due_date, priority, status,
+            *completed_at
+        ) in rows:
+            task = {
+                "id": id,
+                "title": title,
+                "description": description,
+                "category": categories[category],
+                "due_date": due_date,
+                "priority": priorities[priority],
+                "status": statuses[status],
+            }
+            # В версии 1 даты выполнения нет, а null означает,
+            # что задача не выполнялась командой update-status-task
+            if completed_at and completed_at[0] is not None:
+                task["completed_at"] = completed_at[0]
+            yield task
+
+    def _row_predicate(
+        self,
+        dictionary: Dict[str, List[str]],
+        **filters
+    ) -> Optional[Callable[[List[Union[int, str]]], bool]]:
+        """Проверка закодированной задачи на соответствие условиям.
+
+        Returns:
+            Optional[Callable[[List[Union[int, str]]], bool]]: функция
+                проверки или None, если под условия не подходит
+                ни одно значение словаря
+        """
+        position = {field: n for n, field in enumerate(self.FIELDS)}
+        checks = []
+        if filters.get("ids") is not None:
+            ids = set(filters["ids"])
+            checks.append(lambda row, n=position["id"]: row[n] in ids)
+        for field in self.ENCODED_FIELDS:
+            if filters.get(field) is None:
+                continue
+            if filters[field] not in dictionary[field]:
+                return None
+            checks.append(
+                lambda row, n=position[field],
+                code=dictionary[field].index(filters[field]):
+                row[n] == code
+            )
+        if filters.get("category_contains") is not None:
+            codes = {
+                code for code, name in enumerate(dictionary["category"])
+                if filters["category_contains"] in name
+            }
+            if not codes:
+                return None
+            checks.append(
+                lambda row, n=position["category"]: row[n] in codes
+            )
+        if filters.get("due_from") is not None:
+            checks.append(
+                lambda row, n=position["due_date"], value=filters["due_from"]:
+                row[n] >= value
+            )
+        if filters.get("due_to") is not None:
+            checks.append(
+                lambda row, n=position["due_date"], value=filters["due_to"]:
+                row[n] <= value
+            )
+        return lambda row: all(check(row) for check in checks)
+
+
+class SqliteTaskStorage(QueryableTaskStorage):
+    """Хранилище задач в базе SQLite.
+
+    Выборки выполняются запросами с индексами по id, category,
+    status и due_date, а изменения затрагивают только нужные строки.
+    """
+
+    FIELDS = (
+        "id", "title", "description", "category",
+        "due_date", "priority", "status", "completed_at",
+    )
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            completed_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category);
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+    # Выражения ORDER BY, совпадающие с порядком SORT_KEYS
+    ORDER_BY = {
+        "id": ("id",),
+        "due_date": ("due_date", "id"),
+        "priority": (
+            "CASE priority "
+            + " ".join(
+                f"WHEN '{name}' THEN {-rank}"
+                for rank, name in enumerate(PRIORITY_TYPE)
+            )
+            + " END",
+            "id",
+        ),
+        "status": (f"status != '{DEFAULT_STATUS_TASK}'", "id"),
+    }
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.file_path)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.executescript(self.SCHEMA)
+            # В базах, созданных до появления даты выполнения,
+            # колонка добавляется при первом открытии
+            columns = {
+                row["name"] for row in
+                self._connection.execute("PRAGMA table_info(tasks)")
+            }
+            if "completed_at" not in columns:
+                with self._connection:
+                    self._connection.execute(
+                        "ALTER TABLE tasks ADD COLUMN completed_at TEXT"
+                    )
+        return self._connection
+
+    def find_tasks(self, **filters) -> List[dict[str, Union[int, str]]]:
+        return list(self.iter_tasks(**filters))
+
+    def iter_tasks(
+        self,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+        **filters
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        where, params = self._where(**filters)
+        direction = " DESC" if descending else ""
+        order = ", ".join(
+            f"{term}{direction}"
+            for term in self.ORDER_BY[order_by or "id"]
+        )
+        # Сортировка и страница выполняются в SQL: для id и due_date
+        # используется индекс, а обход останавливается после страницы
+        with profiling.phase("load"):
+            rows = self.connection.execute(
+                f"SELECT * FROM tasks{where} ORDER BY {order} "
+                "LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else limit, offset),
+            )
+        return profiling.timed_iter(
+            "load",
+            metrics.counted("tasks_scanned_total", map(self._record, rows)),
+        )
+
+    def _where(self, **filters) -> Tuple[str, List[Union[int, str]]]:
+        """Построение условия WHERE по условиям выборки TaskFilter."""
+        conditions, params = [], []
+        if filters.get("ids") is not None:
+            # Список ID передается одним JSON-параметром, чтобы
+            # не упираться в ограничение на число параметров запроса
+            conditions.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(filters["ids"])))
+        for field in ("category", "status", "priority"):
+            if filters.get(field) is not None:
+                conditions.append(f"{field} = ?")
+                params.append(filters[field])
+        if filters.get("category_contains") is not None:
+            # instr, в отличие от LIKE, чувствителен к регистру,
+            # как и проверка подстроки в Python
+            conditions.append("instr(category, ?) > 0")
+            params.append(filters["category_contains"])
+        if filters.get("due_from") is not None:
+            conditions.append("due_date >= ?")
+            params.append(filters["due_from"])
+        if filters.get("due_to") is not None:
+            conditions.append("due_date <= ?")
+            params.append(filters["due_to"])
+        if filters.get("where") is not None:
+            clause, query_params = filters["where"].sql()
+            conditions.append(f"({clause})")
+            params.extend(query_params)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    @metrics.timed("load")
+    @profiling.phased("load")
+    def get_task(self, task_id: int) -> Optional[dict[str, Union[int, str]]]:
+        row = self.connection.execute(
+            "SELECT * FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        metrics.inc("tasks_scanned_total", int(row is not None))
+        return self._record(row) if row else None
+
+    def insert_task(self, task: dict[str, Union[int, str]]) -> None:
+        self.insert_tasks([task])
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def insert_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        with self.connection:
+            self._upsert(tasks)
+
+    def update_task(
+        self,
+        task_id: int,
+        updates: dict[str, Union[int, str]]
+    ) -> Optional[dict[str, Union[int, str]]]:
+        self.update_tasks([task_id], updates)
+        return self.get_task(task_id)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def update_tasks(
+        self,
+        task_ids: Iterable[int],
+        updates: dict[str, Union[int, str]]
+    ) -> List[dict[str, Union[int, str]]]:
+        task_ids = list(task_ids)
+        updates = {
+            key: value for key, value in updates.items()
+            if key in self.FIELDS and key != "id"
+        }
+        if updates:
+            assignments = ", ".join(f"{key} = ?" for key in updates)
+            where, params = self._where(ids=task_ids)
+            with self.connection:
+                self.connection.execute(
+                    f"UPDATE tasks SET {assignments}{where}",
+                    (*updates.values(), *params),
+                )
+        return self.find_tasks(ids=task_ids)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def delete_tasks(
+        self,
+        task_ids: Iterable[int] = (),
+        category: Optional[str] = None
+    ) -> int:
+        with self.connection:
+            deleted = self.connection.executemany(
+                "DELETE FROM tasks WHERE id = ?",
+                ((task_id,) for task_id in task_ids),
+            ).rowcount
+            if category is not None:
+                deleted += self.connection.execute(
+                    "DELETE FROM tasks WHERE category = ?", (category,)
+                ).rowcount
+        return max(deleted, 0)
+
+    def last_id(self) -> int:
+        row = self.connection.execute("SELECT MAX(id) FROM tasks").fetchone()
+        return row[0] or 0
+
+    def allocate_ids(self, count: int = 1) -> range:
+        """Выделение ID из счетчика в таблице counters.
+
+        Счетчик не уменьшается при удалении задач и не отстает
+        от задач, записанных в обход него: MAX(id) берется по индексу
+        первичного ключа.
+        """
+        with self.connection:
+            # Изменение счетчика первым запросом сразу блокирует базу
+            # на запись, поэтому параллельные процессы получают разные ID
+            self.connection.execute(
+                "INSERT OR IGNORE INTO counters (name, value) "
+                "VALUES ('task_id', 1)"
+            )
+            self.connection.execute(
+                "UPDATE counters SET value = MAX(value, "
+                "(SELECT IFNULL(MAX(id), 0) + 1 FROM tasks)) + ? "
+                "WHERE name = 'task_id'",
+                (count,),
+            )
+            next_id = self.connection.execute(
+                "SELECT value FROM counters WHERE name = 'task_id'"
+            ).fetchone()[0]
+        return range(next_id - count, next_id)
+
+    def release_ids(self, ids: range) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE counters SET value = ? "
+                "WHERE name = 'task_id' AND value = ?",
+                (ids.start, ids.stop),
+            )
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self._upsert(tasks)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def save_changes(
+        self,
+        tasks: List[dict[str, Union[int, str]]],
+        added: Iterable[dict[str, Union[int, str]]] = (),
+        updated: Iterable[dict[str, Union[int, str]]] = (),
+        deleted: Iterable[int] = (),
+    ) -> None:
+        with self.connection:
+            self._upsert([*added, *updated])
+            self.connection.executemany(
+                "DELETE FROM tasks WHERE id = ?",
+                ((task_id,) for task_id in deleted),
+            )
+
+    def close(self) -> None:
+        """Закрытие соединения с базой."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _upsert(self, tasks: Iterable[dict[str, Union[int, str]]]) -> None:
+        placeholders = ", ".join("?" for _ in self.FIELDS)
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO tasks ({', '.join(self.FIELDS)}) "
+            f"VALUES ({placeholders})",
+            ([task.get(field) for field in self.FIELDS] for task in tasks),
+        )
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> dict[str, Union[int, str]]:
+        """Запись задачи из строки таблицы.
+
+        Пустая дата выполнения не попадает в запись, как и у задач
+        в JSON-файлах, которые не выполнялись.
+        """
+        task = dict(row)
+        if task["completed_at"] is None:
+            del task["completed_at"]
+        return task
+
+
+class ShardFile(FileTaskStorage):
+    """Файл задач одной категории ShardedTaskStorage.
+
+    ID выдает общий счетчик хранилища, а новая версия файла сначала
+    пишется рядом с суффиксом SHARD_NEW_SUFFIX и заменяет текущую
+    только при фиксации изменений.
+    """
+
+    def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        self.prepare(tasks)
+        self.finish()
+
+    def prepare(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Запись новой версии файла и кеша для нее.
+
+        Переименование сохраняет время изменения, размер и inode
+        файла, поэтому кеш, записанный для новой версии, подходит
+        к файлу после finish.
+        """
+        new_path = self.file_path + SHARD_NEW_SUFFIX
+        with open(new_path, "w", encoding="utf-8") as file:
+            self._write_file(tasks, file)
+            metrics.inc("tasks_storage_written_bytes_total", file.tell())
+        if self.cache_path is not None:
+            stat = os.stat(new_path)
+            self._write_cache(
+                [stat.st_mtime_ns, stat.st_size, stat.st_ino],
+                tasks,
+                self._build_index(tasks),
+            )
+
+    def finish(self) -> None:
+        """Замена файла новой версией, если она есть."""
+        new_path = self.file_path + SHARD_NEW_SUFFIX
+        if os.path.exists(new_path):
+            os.replace(new_path, self.file_path)
+
+    def remove(self) -> None:
+        """Удаление файла вместе с кешем и новой версией."""
+        for path in (
+            self.file_path,
+            self.file_path + SHARD_NEW_SUFFIX,
+            self.cache_path,
+            self.ids.path,
+            f"{self.ids.path}.lock",
+        ):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+class ShardedTaskStorage(QueryableTaskStorage):
+    """Хранилище задач в директории с отдельным файлом на категорию.
+
+    Каталог SHARD_CATALOG сопоставляет категориям файлы и хранит
+    количество задач в каждом. Выборки по категории читают только
+    ее файл, удаление категории удаляет файл, остальные запросы
+    обходят файлы всех категорий. Задачи в файле лежат по возрастанию
+    ID, поэтому общий порядок получается слиянием файлов.
+
+    Изменение нескольких файлов, например перенос задачи в другую
+    категорию, атомарно: новые версии файлов пишутся рядом, затем
+    атомарно заменяется каталог со списком замен, и только после
+    этого файлы переименовываются. Прерванная замена доводится
+    до конца при следующем чтении каталога.
+    """
+
+    FIELDS = SqliteTaskStorage.FIELDS
+    CATALOG_VERSION = 1
+
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path (str): путь к директории хранилища
+        """
+        self.file_path = file_path
+        self.catalog_path = os.path.join(file_path, SHARD_CATALOG)
+        self.ids = IdAllocator(
+            os.path.join(file_path, f"tasks{ID_COUNTER_SUFFIX}"), self.last_id
+        )
+
+    def find_tasks(self, **filters) -> List[dict[str, Union[int, str]]]:
+        return list(self.iter_tasks(**filters))
+
+    def iter_tasks(
+        self,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        descending: bool = False,
+        **filters
+    ) -> Iterator[dict[str, Union[int, str]]]:
+        catalog = self._read_catalog()
+        categories = self._categories(catalog, **filters)
+        # Категорию уже проверил выбор файлов
+        filters.pop("category", None)
+        filters.pop("category_contains", None)
+        matches = profiling.timed("filter", self.predicate(**filters))
+        tasks = heapq.merge(
+            *(
+                filter(matches, self._shard(catalog, category).load_tasks())
+                for category in categories
+            ),
+            key=itemgetter("id"),
+        )
+        return self.paginate(tasks, order_by, limit, offset, descending)
+
+    def get_task(self, task_id: int) -> Optional[dict[str, Union[int, str]]]:
+        return next(iter(self.find_tasks(ids=[task_id])), None)
+
+    def insert_task(self, task: dict[str, Union[int, str]]) -> None:
+        self.insert_tasks([task])
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def insert_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        """Добавление задач: в файлы существующих категорий задачи
+        дописываются без чтения, для новых категорий создаются файлы.
+        """
+        catalog = self._read_catalog()
+        created = {}
+        for category, group in self._group(tasks).items():
+            entry = catalog["shards"].get(category)
+            if entry is None:
+                created[category] = group
+                continue
+            # Новые ID больше сохраненных, порядок файла не нарушается
+            self._shard(catalog, category).append_tasks(group)
+            entry["count"] += len(group)
+        self._commit(catalog, created)
+
+    def update_task(
+        self,
+        task_id: int,
+        updates: dict[str, Union[int, str]]
+    ) -> Optional[dict[str, Union[int, str]]]:
+        tasks = self.update_tasks([task_id], updates)
+        return tasks[0] if tasks else None
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def update_tasks(
+        self,
+        task_ids: Iterable[int],
+        updates: dict[str, Union[int, str]]
+    ) -> List[dict[str, Union[int, str]]]:
+        """Изменение задач с переносом в файл новой категории,
+        если изменилась категория.
+        """
+        wanted = set(task_ids)
+        updates = {
+            key: value for key, value in updates.items()
+            if key in self.FIELDS and key != "id"
+        }
+        catalog = self._read_catalog()
+        changes, moved, updated = {}, [], []
+        for category in list(catalog["shards"]):
+            tasks = self._shard(catalog, category).load_tasks()
+            if wanted.isdisjoint(task["id"] for task in tasks):
+                continue
+            kept = []
+            for task in tasks:
+                if task["id"] in wanted:
+                    task = {**task, **updates}
+                    updated.append(task)
+                    if task["category"] != category:
+                        moved.append(task)
+                        continue
+                kept.append(task)
+            changes[category] = kept
+        for category, group in self._group(moved).items():
+            current = changes.get(category)
+            if current is None:
+                current = (
+                    self._shard(catalog, category).load_tasks()
+                    if category in catalog["shards"] else []
+                )
+            changes[category] = list(
+                heapq.merge(current, group, key=itemgetter("id"))
+            )
+        if changes:
+            self._commit(catalog, changes)
+        return sorted(updated, key=itemgetter("id"))
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def delete_tasks(
+        self,
+        task_ids: Iterable[int] = (),
+        category: Optional[str] = None
+    ) -> int:
+        """Удаление задач по ID или всей категории.
+
+        Для удаления категории задачи не читаются: удаляется ее файл,
+        а количество задач берется из каталога.
+        """
+        wanted = set(task_ids)
+        catalog = self._read_catalog()
+        changes, deleted = {}, 0
+        if wanted:
+            for name in catalog["shards"]:
+                tasks = self._shard(catalog, name).load_tasks()
+                kept = [task for task in tasks if task["id"] not in wanted]
+                if len(kept) != len(tasks):
+                    changes[name] = kept
+                    deleted += len(tasks) - len(kept)
+        if category is not None and category in catalog["shards"]:
+            remaining = changes.get(category)
+            deleted += (
+                catalog["shards"][category]["count"]
+                if remaining is None else len(remaining)
+            )
+            changes[category] = []
+        if changes:
+            self._commit(catalog, changes)
+        return deleted
+
+    def last_id(self) -> int:
+        catalog = self._read_catalog()
+        return max(
+            (
+                tasks[-1]["id"]
+                for tasks in (
+                    self._shard(catalog, category).load_tasks()
+                    for category in catalog["shards"]
+                )
+                if tasks
+            ),
+            default=0,
+        )
+
+    def allocate_ids(self, count: int = 1) -> range:
+        os.makedirs(self.file_path, exist_ok=True)
+        return self.ids.allocate(count)
+
+    def release_ids(self, ids: range) -> None:
+        self.ids.release(ids)
+
+    @metrics.timed("save")
+    @profiling.phased("save")
+    def save_tasks(self, tasks: List[dict[str, Union[int, str]]]) -> None:
+        catalog = self._read_catalog()
+        changes = {category: [] for category in catalog["shards"]}
+        changes.update(self._group(sorted(tasks, key=itemgetter("id"))))
+        self._commit(catalog, changes)
+        self.ids.advance(max((task["id"] for task in tasks), default=0))
+
+    @staticmethod
+    def _group(
+        tasks: Iterable[dict[str, Union[int, str]]]
+    ) -> Dict[str, List[dict[str, Union[int, str]]]]:
+        groups = {}
+        for task in tasks:
+            groups.setdefault(task["category"], []).append(task)
+        return groups
+
+    @staticmethod
+    def _categories(catalog: dict, **filters) -> List[str]:
+        """Категории, файлы которых нужно прочитать для выборки."""
+        categories = catalog["shards"]
+        if filters.get("category") is not None:
+            return [filters["category"]] if (
+                filters["category"] in categories
+            ) else []
+        if filters.get("category_contains") is not None:
+            return [
+                category for category in categories
+                if filters["category_contains"] in category
+            ]
+        return list(categories)
+
+    def _shard(self, catalog: dict, category: str) -> ShardFile:
+        return ShardFile(
+            os.path.join(self.file_path, catalog["shards"][category]["file"])
+        )
+
+    def _read_catalog(self) -> dict:
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as file:
+                catalog = json.load(file)
+        except FileNotFoundError:
+            return {
+                "version": self.CATALOG_VERSION,
+                "next_shard": 1,
+                "shards": {},
+            }
+        if catalog.get("version") != self.CATALOG_VERSION:
+            raise StorageFormatError(
+                f"Неподдерживаемый формат каталога задач: {self.catalog_path}"
+            )
+        if "commit" in catalog:
+            self._finish(catalog)
+        return catalog
+
+    def _write_catalog(self, catalog: dict) -> None:
+        tmp_path = f"{self.catalog_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(catalog, file, indent=4, ensure_ascii=False)
+            metrics.inc("tasks_storage_written_bytes_total", file.tell())
+        os.replace(tmp_path, self.catalog_path)
+
+    def _commit(
+        self,
+        catalog: dict,
+        changes: Dict[str, List[dict[str, Union[int, str]]]]
+    ) -> None:
+        """Атомарная замена файлов категорий.
+
+        Args:
+            catalog (dict): текущий каталог, изменяется на месте
+            changes (Dict[str, List[dict]]): новое содержимое файлов
+                по категориям, пустой список удаляет файл категории
+        """
+        os.makedirs(self.file_path, exist_ok=True)
+        replace, remove = [], []
+        for category, tasks in changes.items():
+            entry = catalog["shards"].get(category)
+            if not tasks:
+                if entry is not None:
+                    remove.append(entry["file"])
+                    del catalog["shards"][category]
+                continue
+            if entry is None:
+                entry = catalog["shards"][category] = {
+                    "file": f"{catalog['next_shard']:04d}.json",
+                    "count": 0,
+                }
+                catalog["next_shard"] += 1
+            entry["count"] = len(tasks)
+            self._shard(catalog, category).prepare(tasks)
+            replace.append(entry["file"])
+        if replace or remove:
+            # Запись каталога со списком замен - точка фиксации:
+            # после нее изменения будут доведены до конца
+            catalog["commit"] = {"replace": replace, "remove": remove}
+            self._write_catalog(catalog)
+            self._finish(catalog)
+        else:
+            self._write_catalog(catalog)
+
+    def _finish(self, catalog: dict) -> None:
+        """Переименование и удаление файлов зафиксированной замены."""
+        commit = catalog.pop("commit")
+        for name in commit["replace"]:
+            ShardFile(os.path.join(self.file_path, name)).finish()
+        for name in commit["remove"]:
+            ShardFile(os.path.join(self.file_path, name)).remove()
+        self._write_catalog(catalog)
+
+
+STORAGE_TYPES = {
+    "file": FileTaskStorage,
+    "journal": JournalTaskStorage,
+    "encoded": EncodedTaskStorage,
+    "sqlite": SqliteTaskStorage,
+    "sharded": ShardedTaskStorage,
+}
+
+
+def make_storage(spec: str) -> TaskStorage:
+    """Создание хранилища по строке вида '<тип>:<путь>'.
+
+    Если тип не указан, используется обычный JSON-файл.
+
+    Args:
+        spec (str): описание хранилища, например 'journal:tasks.json'
+
+    Returns:
+        TaskStorage: экземпляр выбранного хранилища
+    """
+    kind, path = split_spec(spec)
+    if kind not in STORAGE_TYPES:
+        raise click.BadParameter(
+            f"Неизвестный тип хранилища '{kind}'. "
+            f"Доступные: {', '.join(STORAGE_TYPES)}.",
+            param_hint="'--storage'",
+        )
+    # Абсолютный путь не зависит от рабочей директории, которую
+    # демон меняет на время выполнения команды клиента
+    return STORAGE_TYPES[kind](os.path.abspath(path))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import pytest
+
+from aio import AsyncFileTaskManager, ExecutorTaskStorage
+from classes import FileTaskStorage
+from errors import InvalidTaskError, TaskNotFoundError, TaskStatusError
+from queries import Query
+from storages import JournalTaskStorage
+
+
+class CountingStorage(FileTaskStorage):
+    """Файловое хранилище, считающее загрузки, перезаписи
+    и дописывания."""
+
+    def __init__(self, file_path):
+        super().__init__(file_path, cache=False)
+        self.loads = 0
+        self.saves = 0
+        self.appends = 0
+
+    def load_indexed_tasks(self):
+        self.loads += 1
+        return super().load_indexed_tasks()
+
+    def save_tasks(self, tasks):
+        self.saves += 1
+        super().save_tasks(tasks)
+
+    def append_tasks(self, tasks):
+        self.appends += 1
+        super().append_tasks(tasks)
+
+
+def test_async_manager(tmp_path):
+    """Одновременные читатели разделяют одну загрузку, одновременные
+    изменения записываются меньшим числом записей без потерь."""
+    path = tmp_path / "tasks.json"
+    path.write_text("[]", encoding="utf-8")
+    storage = CountingStorage(str(path))
+    manager = AsyncFileTaskManager(ExecutorTaskStorage(storage))
+
+    async def scenario():
+        empty = await asyncio.gather(*(manager.view_tasks() for _ in range(5)))
+        assert empty == [[]] * 5
+        added = await asyncio.gather(*(
+            manager.add_task(
+                f"Задача {number}", "Описание",
+                "Работа" if number % 2 else "Дом",
+                date(2099, 1, 1 + number), "высокий",
+            )
+            for number in range(10)
+        ))
+        assert sorted(task["id"] for task in added) == list(range(1, 11))
+        # Новые задачи дописываются в файл без перезаписи
+        assert storage.saves == 0 and 1 <= storage.appends < 10
+        done = await manager.update_status_task(added[0]["id"])
+        assert done["status"] == "Выполнена"
+        with pytest.raises(TaskStatusError):
+            await manager.update_status_task(added[0]["id"])
+        with pytest.raises(TaskNotFoundError, match="не найдена"):
+            await manager.edit_task(999, title="Новое")
+        with pytest.raises(InvalidTaskError):
+            await manager.edit_task(added[1]["id"], priority="срочный")
+        await manager.edit_task(added[1]["id"], title="Новое")
+        assert await manager.delete_task(category="Дом") == 5
+        work = await manager.search_task(
+            category="Раб", where=Query("due_date >= 2099-01-05")
+        )
+        return [task["id"] for task in work]
+
+    assert asyncio.run(scenario()) == [6, 8, 10]
+    assert storage.loads == 1
+    assert 1 <= storage.saves < 4
+
+    with open(path, encoding="utf-8") as file:
+        saved = json.load(file)
+    assert [task["id"] for task in saved] == [2, 4, 6, 8, 10]
+    assert saved[0]["title"] == "Новое"
+
+    # Новый менеджер читает записанное состояние
+    reader = AsyncFileTaskManager(ExecutorTaskStorage(CountingStorage(path)))
+    tasks = asyncio.run(reader.view_tasks(sort="due_date", reverse=True))
+    assert [task["id"] for task in tasks] == [10, 8, 6, 4, 2]
+
+
+def test_async_manager_appends_to_journal(tmp_path):
+    """Изменения записываются в журнал без перезаписи снимка."""
+    path = tmp_path / "tasks.json"
+    storage = JournalTaskStorage(str(path))
+    manager = AsyncFileTaskManager(ExecutorTaskStorage(storage))
+
+    async def scenario():
+        for number in range(3):
+            await manager.add_task(
+                f"Задача {number}", "Описание", "Работа",
+                date(2099, 1, 1), "средний",
+            )
+        await manager.edit_task(1, title="Новое")
+        await manager.update_status_task(2)
+        await manager.delete_task(3)
+
+    asyncio.run(scenario())
+    assert not path.exists()
+    journal = (tmp_path / "tasks.json.journal").read_text(encoding="utf-8")
+    assert len(journal.splitlines()) == 6
+
+    tasks = JournalTaskStorage(str(path)).load_tasks()
+    assert [(task["id"], task["title"], task["status"]) for task in tasks] == [
+        (1, "Новое", "Не выполнена"), (2, "Задача 1", "Выполнена"),
+    ]
+
+
+def test_executor_storage_copies_tasks(tmp_path):
+    """В поток записи уходят копии задач, а пул процессов отклоняется."""
+    written = []
+
+    class RecordingStorage(JournalTaskStorage):
+        def save_changes(self, tasks, **changes):
+            written.append(tasks)
+            super().save_changes(tasks, **changes)
+
+    storage = RecordingStorage(str(tmp_path / "tasks.json"))
+    manager = AsyncFileTaskManager(ExecutorTaskStorage(storage))
+
+    async def scenario():
+        await manager.add_task(
+            "Задача", "Описание", "Работа", date(2099, 1, 1), "средний"
+        )
+        await manager.edit_task(1, title="Первое")
+        await manager.edit_task(1, title="Второе")
+
+    asyncio.run(scenario())
+    assert [tasks[0]["title"] for tasks in written] == ["Первое", "Второе"]
+
+    with ProcessPoolExecutor(1) as executor:
+        with pytest.raises(TypeError, match="пулом потоков"):
+            ExecutorTaskStorage(storage, executor)
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from benchmarks import (BENCH_CATEGORIES, BenchResult, find_regressions,
+                        generate_tasks, load_results)
+from commands import cli
+from constants import STORAGE_TYPE_NAMES
+from storages import STORAGE_TYPES
+from validators import validate_task_row
+
+
+def test_generate_tasks():
+    """Синтетические задачи проходят проверки импорта, а категории
+    распределены неравномерно."""
+    tasks = list(generate_tasks(2000))
+    assert [task["id"] for task in tasks] == list(range(1, 2001))
+    for task in tasks[:100]:
+        row = {key: value for key, value in task.items() if key != "id"}
+        assert validate_task_row(row) == row
+
+    counts = Counter(task["category"] for task in tasks)
+    assert counts.most_common(1)[0][0] == BENCH_CATEGORIES[0]
+    assert counts[BENCH_CATEGORIES[0]] > 3 * counts[BENCH_CATEGORIES[-1]]
+    assert list(generate_tasks(2000)) == tasks
+
+
+def test_bench_command(runner, tmp_path):
+    """bench замеряет все команды и записывает результаты в JSON."""
+    output = tmp_path / "results.json"
+    result = runner.invoke(cli, [
+        "bench", "--size", "30", "--runs", "1", "--output", str(output)
+    ])
+    assert result.exit_code == 0, result.output
+    results = load_results(str(output))
+    assert len(results) == len(result.output.splitlines()) - 2
+    assert {item.case for item in results} >= {
+        "view-tasks", "add-task", "import-tasks", "search-task --status",
+        "update-status-task --id", "edit-task --id", "delete-task --id",
+    }
+    assert all(item.size == 30 and item.median_ms > 0 for item in results)
+
+
+def test_bench_storage_types(runner):
+    """--storage-type принимает все типы хранилищ и только их."""
+    assert STORAGE_TYPE_NAMES == tuple(STORAGE_TYPES)
+    result = runner.invoke(cli, ["bench", "--storage-type", "memory"])
+    assert result.exit_code == 2
+    assert "'sharded'" in result.output
+
+
+def test_find_regressions():
+    """Замедлением считается рост медианы больше допустимого."""
+    def result(case, median_ms):
+        return BenchResult(case, 1000, "file", median_ms, 0, None, [])
+
+    baseline = [result("view-tasks", 100.0), result("add-task", 100.0)]
+    current = [
+        result("view-tasks", 150.0),
+        result("add-task", 110.0),
+        result("delete-task --id", 500.0),
+    ]
+    assert find_regressions(current, baseline, 1.2) == [(current[0], 1.5)]
@@ -0,0 +1,208 @@
+import io
+import json
+import socket
+import threading
+
+import pytest
+
+import commands
+import daemon
+from classes import FileTask, FileTaskManager
+from storages import make_storage
+
+
+@pytest.fixture
+def running_daemon(request, tmp_path):
+    """Демон, запущенный в отдельном потоке для хранилища в tmp_path,
+    по умолчанию - с журналом.
+    """
+    kind = getattr(request, "param", "journal")
+    spec = f"{kind}:{tmp_path / 'tasks.json'}"
+    manager = FileTaskManager(make_storage(spec), FileTask)
+    path = daemon.socket_path(str(tmp_path / "tasks.json"))
+    server = daemon.TaskServer(
+        path,
+        lambda args: commands.execute_synced(manager, args),
+        commands.storage_key(spec),
+    )
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    yield spec, path, manager
+    daemon.call(path, "shutdown")
+    thread.join()
+
+
+def run(capsys, args):
+    with pytest.raises(SystemExit) as exit_info:
+        commands.main(args)
+    output = capsys.readouterr()
+    return exit_info.value.code, output.out, output.err
+
+
+def test_commands_are_forwarded_to_daemon(capsys, running_daemon):
+    """Команды с тем же --storage выполняются демоном на одном
+    наборе задач, ошибки возвращаются с кодом завершения."""
+    spec, path, manager = running_daemon
+    add = [
+        "--storage", spec, "add-task",
+        "--title", "Задача", "--description", "Описание",
+        "--category", "Работа", "--due_date", "2099-12-12",
+        "--priority", "средний",
+    ]
+    assert run(capsys, add) == (0, "Задача добавлена.\n", "")
+    assert run(capsys, add)[0] == 0
+
+    code, out, err = run(
+        capsys, ["--storage", spec, "update-status-task", "--id", "7"]
+    )
+    assert (code, out) == (1, "")
+    assert err == "Error: Задача с ID 7 не найдена.\n"
+
+    code, out, _ = run(capsys, [f"--storage={spec}", "view-tasks"])
+    assert code == 0
+    assert out.count("Название: Задача") == 2
+    assert len(manager.storage.load_tasks()) == 2
+
+
+def test_daemon_protocol_errors(running_daemon):
+    """Некорректные запросы получают ошибку JSON-RPC,
+    а демон продолжает работать."""
+    _, path, _ = running_daemon
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(
+            b"{not json\n"
+            b'{"jsonrpc": "2.0", "id": 2, "method": "drop"}\n'
+            b'{"jsonrpc": "2.0", "id": 3, "method": "execute",'
+            b' "params": {"args": "view-tasks"}}\n'
+        )
+        with client.makefile("rb") as reader:
+            codes = [
+                json.loads(reader.readline())["error"]["code"]
+                for _ in range(3)
+            ]
+    assert codes == [
+        daemon.PARSE_ERROR, daemon.METHOD_NOT_FOUND, daemon.INVALID_PARAMS
+    ]
+    assert daemon.call(path, "ping") == "pong"
+
+
+def test_falls_back_without_daemon(tmp_path, capsys):
+    """Без демона, в том числе при оставшемся сокете,
+    команды работают с хранилищем напрямую."""
+    spec = str(tmp_path / "tasks.json")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(daemon.socket_path(spec))
+    stale.close()
+
+    assert run(capsys, ["--storage", spec, "view-tasks"]) == (
+        0, "Нет задач.\n", ""
+    )
+
+
+@pytest.mark.parametrize(
+    "running_daemon", ["file", "journal"], indirect=True
+)
+def test_daemon_sees_local_writes(capsys, running_daemon):
+    """Изменения, записанные в обход демона, не теряются: демон
+    перечитывает задачи, если файлы хранилища изменились."""
+    spec, _, _ = running_daemon
+
+    def add(title):
+        return [
+            "--storage", spec, "add-task", "--title", title,
+            "--description", "Описание", "--category", "Работа",
+            "--due_date", "2099-12-12", "--priority", "средний",
+        ]
+
+    assert run(capsys, add("first"))[0] == 0
+    # Демон загружает задачи в память
+    status = ["--storage", spec, "update-status-task", "--id", "1"]
+    assert run(capsys, status)[0] == 0
+    # batch не передается демону и пишет в хранилище сам
+    local = FileTaskManager(make_storage(spec), FileTask)
+    assert commands.execute(local, add("local")[2:]) == 0
+    edit = ["--storage", spec, "edit-task", "--id", "1", "--title", "edited"]
+    assert run(capsys, edit)[0] == 0
+    assert run(capsys, add("via-daemon"))[0] == 0
+
+    titles = [
+        task["title"]
+        for task in FileTaskManager(make_storage(spec), FileTask)
+        .storage.load_tasks()
+    ]
+    assert titles == ["edited", "local", "via-daemon"]
+
+
+def test_prompting_command_runs_locally(capsys, monkeypatch, running_daemon):
+    """Команда, которая запрашивает значения с клавиатуры, выполняется
+    в процессе клиента, а демон затем видит ее изменения."""
+    spec, _, _ = running_daemon
+    forwarded = []
+    forward = daemon.forward
+
+    def spy(path, args, storage=None):
+        forwarded.append(args)
+        return forward(path, args, storage)
+
+    monkeypatch.setattr(daemon, "forward", spy)
+    monkeypatch.setattr(
+        "sys.stdin",
+        io.StringIO("Задача\nОписание\nРабота\n2099-12-12\nсредний\n"),
+    )
+    code, out, _ = run(capsys, ["--storage", spec, "add-task"])
+    assert (code, forwarded) == (0, [])
+    assert out.endswith("Задача добавлена.\n")
+
+    code, out, _ = run(capsys, ["--storage", spec, "view-tasks"])
+    assert len(forwarded) == 1
+    assert "Название: Задача" in out
+
+
+def test_daemon_refuses_session_commands(running_daemon):
+    """Команды сеансов не выполняются демоном и при вызове
+    через JSON-RPC в обход клиента."""
+    _, path, _ = running_daemon
+    for args in (["shell"], ["--profile", "batch", "--file", "x"]):
+        result = daemon.call(path, "execute", {"args": args})
+        assert result["exit_code"] == 2
+        assert result["stdout"] == ""
+        assert "нельзя выполнить через демон" in result["stderr"]
+
+
+def test_daemon_for_other_storage(capsys, running_daemon, tmp_path):
+    """Команда для хранилища другого типа по тому же пути
+    выполняется локально, а ошибка демона выводится как ошибка
+    команды."""
+    _, path, _ = running_daemon
+    spec = f"sqlite:{tmp_path / 'tasks.json'}"
+    assert daemon.forward(path, ["view-tasks"], commands.storage_key(spec)) \
+        is None
+
+    with pytest.raises(daemon.DaemonError, match="params.args"):
+        daemon.call(path, "execute", {"args": "view-tasks"})
+
+
+def test_profiled_command_runs_in_daemon(
+    capsys, monkeypatch, running_daemon
+):
+    """Команда с --profile выполняется демоном, а не пишет
+    в хранилище в обход него, отчет возвращается в stderr."""
+    spec, _, manager = running_daemon
+    responses = []
+    forward = daemon.forward
+
+    def spy(*args):
+        responses.append(forward(*args))
+        return responses[-1]
+
+    monkeypatch.setattr(daemon, "forward", spy)
+    command = [
+        "--storage", spec, "--profile", "add-task", "--title", "Задача",
+        "--description", "Описание", "--category", "Работа",
+        "--due_date", "2099-12-12", "--priority", "средний",
+    ]
+    code, out, err = run(capsys, command)
+    assert (code, out) == (0, "Задача добавлена.\n")
+    assert "add_task" in err
+    assert len(responses) == 1 and responses[0] is not None
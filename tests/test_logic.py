@@ -1,5 +1,9 @@
+import json
+
 import pytest
+from click.testing import CliRunner
 
+from classes import FileTask, FileTaskManager, FileTaskStorage
 from commands import cli
 from tests.utils import invalid_data
 
@@ -108,6 +112,24 @@ def test_delete_task_by_category(
     assert task_output_id_one.strip() == result.output.strip()
 
 
+def test_delete_task_by_filter_category(
+    runner, ctx, task_list, task_output_id_one
+):
+    """Удаление только с условием --filter-category удаляет задачи
+    этой категории, как и --category."""
+    command = ["delete-task", "--filter-category", "Домашние"]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.exit_code == 0
+    assert result.output == "Успешное удаление.\n"
+
+    result = runner.invoke(cli, ["view-tasks"], obj=ctx.obj)
+    assert task_output_id_one.strip() == result.output.strip()
+
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.exit_code == 1
+    assert "Задачи с указанной категорией не найдены." in result.output
+
+
 @pytest.mark.parametrize("data", invalid_data)
 def test_edit_task_not_valid_data(
     runner, ctx, task_one, data, task_output_id_one
@@ -232,3 +254,221 @@ def test_update_status_task(
         f"Error: Задача с ID {command[-1]} не найдена.\n"
         == result.output
     )
+
+
+def test_import_tasks(runner, ctx, task_one, tmp_path, monkeypatch):
+    """Проверка массового импорта задач из CSV одной записью."""
+    path = tmp_path / "import.csv"
+    path.write_text(
+        "title,description,category,due_date,priority,status\n"
+        "Первая,Описание,Работа,2099-01-01,высокий,\n"
+        "  ,Описание,Работа,2099-01-01,высокий,\n"
+        "Вторая,Описание,Дом,2099-13-01,высокий,\n"
+        "Третья,Описание,Дом,2099-02-01,срочный,\n"
+        "Четвертая,Описание,Дом,2099-03-01,низкий,Выполнена\n",
+        encoding="utf-8",
+    )
+    saves = []
+    append_tasks = ctx.obj.storage.append_tasks
+    monkeypatch.setattr(
+        ctx.obj.storage, "append_tasks",
+        lambda *args, **kwargs: saves.append(1) or append_tasks(
+            *args, **kwargs
+        ),
+    )
+
+    command = ["import-tasks", "--file", str(path)]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "Строка 3: Поле 'title' не может состоять только из пробелов.",
+        "Строка 4: Поле 'due_date' должно быть датой в формате YYYY-MM-DD.",
+        "Строка 5: Поле 'priority' должно быть одним из: "
+        "низкий, средний, высокий.",
+        "Импортировано задач: 2. Строк с ошибками: 3.",
+    ]
+    assert len(saves) == 1
+
+    # ID выделяются подряд после уже существующих задач
+    tasks = ctx.obj.storage.load_tasks()
+    assert [(t["id"], t["title"], t["status"]) for t in tasks] == [
+        (1, "Моя задача", "Не выполнена"),
+        (2, "Первая", "Не выполнена"),
+        (3, "Четвертая", "Выполнена"),
+    ]
+
+
+def test_import_tasks_strict_jsonl(runner, ctx, tmp_path):
+    """При --strict файл с ошибками не импортируется совсем."""
+    path = tmp_path / "import.jsonl"
+    path.write_text(
+        '{"title": "А", "description": "Б", "category": "В", '
+        '"due_date": "2099-01-01", "priority": "низкий"}\n'
+        "\n"
+        "{не json\n",
+        encoding="utf-8",
+    )
+    command = ["import-tasks", "--file", str(path), "--strict"]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.exit_code == 1
+    assert result.output.startswith("Строка 3: Некорректный JSON")
+    assert ctx.obj.storage.load_tasks() == []
+
+    result = runner.invoke(cli, command[:-1], obj=ctx.obj)
+    assert result.exit_code == 0
+    assert len(ctx.obj.storage.load_tasks()) == 1
+
+
+def test_import_tasks_non_string_field(runner, ctx, tmp_path):
+    """Нестроковое текстовое поле JSONL - ошибка строки, а не сбой
+    всего импорта."""
+    path = tmp_path / "import.jsonl"
+    path.write_text(
+        '{"title": 5, "description": "Б", "category": "В", '
+        '"due_date": "2099-01-01", "priority": "низкий"}\n'
+        '{"title": "А", "description": "Б", "category": ["В"], '
+        '"due_date": "2099-01-01", "priority": "низкий"}\n'
+        '{"title": "А", "description": "Б", "category": "В", '
+        '"due_date": "2099-01-01", "priority": "низкий"}\n',
+        encoding="utf-8",
+    )
+    command = ["import-tasks", "--file", str(path)]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "Строка 1: Поле 'title' должно быть строкой.",
+        "Строка 2: Поле 'category' должно быть строкой.",
+        "Импортировано задач: 1. Строк с ошибками: 2.",
+    ]
+
+
+def test_task_record():
+    """Задача хранится без словаря атрибутов, а создание из записи
+    хранилища дает тот же результат, что и конструктор."""
+    record = {
+        "id": 1,
+        "title": "Моя задача",
+        "description": "Задача Тест",
+        "category": "Работа",
+        "due_date": "2099-12-12",
+        "priority": "низкий",
+        "status": "Выполнена",
+    }
+    task = FileTask.from_record(record)
+    assert not hasattr(task, "__dict__")
+    assert task.display() == FileTask(**record).display()
+
+
+def test_output_formats(runner, ctx, task_list, tmp_path):
+    """Структурированные форматы вывода содержат записи хранилища
+    без изменений, а CSV можно загрузить обратно через import-tasks."""
+    tasks = ctx.obj.storage.load_tasks()
+
+    result = runner.invoke(cli, ["view-tasks", "--format", "json"], obj=ctx.obj)
+    assert json.loads(result.output) == tasks
+
+    command = ["search-task", "--status", "Выполнена", "--format", "ndjson"]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert [json.loads(line) for line in result.output.splitlines()] == [
+        tasks[1]
+    ]
+
+    result = runner.invoke(cli, ["view-tasks", "--format", "table"], obj=ctx.obj)
+    lines = result.output.splitlines()
+    assert lines[0].split() == [
+        "ID", "Название", "Описание", "Категория",
+        "Срок", "Приоритет", "Статус",
+    ]
+    assert len(lines) == 4
+    assert lines[2].index(tasks[0]["category"]) == lines[0].index("Категория")
+
+    command = ["view-tasks", "--category", "Нет", "--format", "json"]
+    result = runner.invoke(cli, command, obj=ctx.obj)
+    assert result.output == "[]\n"
+
+    path = tmp_path / "export.csv"
+    result = runner.invoke(cli, ["view-tasks", "--format", "csv"], obj=ctx.obj)
+    path.write_text(result.output, encoding="utf-8")
+    imported = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "imported.json")), FileTask
+    )
+    result = runner.invoke(
+        cli, ["import-tasks", "--file", str(path)], obj=imported
+    )
+    assert result.exit_code == 0
+    assert imported.storage.load_tasks() == tasks
+
+
+def test_profile(runner, ctx, task_list, tmp_path):
+    """--profile-json записывает время фаз по операциям менеджера,
+    а --profile-dump - профиль cProfile, читаемый pstats."""
+    import pstats
+
+    # Новый менеджер, как при запуске из командной строки,
+    # читает задачи из файла заново
+    manager = FileTaskManager(
+        FileTaskStorage(ctx.obj.storage.file_path), FileTask
+    )
+    report, dump = tmp_path / "profile.json", tmp_path / "profile.prof"
+    command = [
+        "--profile-json", str(report), "--profile-dump", str(dump),
+        "view-tasks", "--format", "json",
+    ]
+    result = runner.invoke(cli, command, obj=manager)
+    assert result.exit_code == 0
+    assert json.loads(result.output) == manager.storage.load_tasks()
+
+    data = json.loads(report.read_text(encoding="utf-8"))
+    operation, = data["operations"]
+    assert operation["name"] == "view_tasks"
+    assert operation["calls"] == 1
+    phases = {phase["name"] for phase in operation["phases"]}
+    assert {"load", "render"} <= phases
+    assert pstats.Stats(str(dump)).total_calls > 0
+
+    result = CliRunner(mix_stderr=False).invoke(
+        cli, ["--profile", "view-tasks"], obj=manager
+    )
+    assert result.exit_code == 0
+    assert "view_tasks" in result.stderr
+    assert "view_tasks" not in result.stdout
+
+
+def test_manager_library_api(tmp_path, capsys):
+    """Менеджер возвращает записи и количества без вывода в консоль
+    и сообщает об ошибках исключениями из errors."""
+    from datetime import date
+
+    from errors import (EmptySelectionError, NoMatchingTasksError,
+                        TaskNotFoundError, TaskStatusError)
+
+    manager = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "tasks.json")), FileTask
+    )
+    for number in range(4):
+        task = manager.add_task(
+            f"Задача {number}", "Описание", "Работа" if number else "Дом",
+            date(2099, 1, 1 + number), "средний",
+        )
+    assert task["id"] == 4 and task["due_date"] == "2099-01-04"
+
+    tasks = manager.view_tasks("Работа", sort="due_date", reverse=True)
+    assert [task["id"] for task in tasks] == [4, 3, 2]
+    done = manager.update_status_task(2)
+    assert done.tasks[0]["status"] == "Выполнена"
+    with pytest.raises(TaskStatusError):
+        manager.update_status_task(2)
+    changes = manager.edit_task(None, priority="высокий",
+                                filters={"category": "Работа"})
+    assert (changes.matched, changes.changed) == (3, 3)
+    assert [task["id"] for task in manager.search_task(None, "Выполнена")] \
+        == [2]
+    assert manager.delete_task(None, "Дом").changed == 1
+
+    with pytest.raises(TaskNotFoundError):
+        manager.edit_task(99, title="Новое")
+    with pytest.raises(NoMatchingTasksError):
+        manager.delete_task(None, "Дом")
+    with pytest.raises(EmptySelectionError):
+        manager.update_status_task(None)
+    assert capsys.readouterr().out == ""
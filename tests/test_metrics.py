@@ -0,0 +1,87 @@
+import metrics
+from classes import FileTask, FileTaskManager, FileTaskStorage
+from commands import cli
+from tests.test_storages import add_tasks
+
+
+def sample(text, line_start):
+    """Значение метрики из строки, начинающейся с line_start."""
+    for line in text.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rpartition(" ")[2])
+    return 0.0
+
+
+def test_batch_metrics(tmp_path, runner):
+    """В пакетном режиме команда metrics выводит метрики, накопленные
+    всеми предыдущими командами."""
+    manager = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "tasks.json")), FileTask
+    )
+    add_tasks(runner, manager, 3)
+    before = metrics.REGISTRY.render()
+    script = tmp_path / "script.txt"
+    script.write_text(
+        "view-tasks --format json\n"
+        "search-task --category Работа --format json\n"
+        "metrics\n",
+        encoding="utf-8",
+    )
+
+    result = runner.invoke(
+        cli, ["batch", "--file", str(script)], obj=manager
+    )
+    assert result.exit_code == 0
+
+    output = result.output[result.output.index("# HELP"):]
+    for name, value in (
+        ('tasks_operations_total{operation="view_tasks"}', 1),
+        ('tasks_operations_total{operation="search_task"}', 1),
+        ('tasks_operation_duration_seconds_count{operation="view_tasks"}', 1),
+        ("tasks_returned_total", 5),
+    ):
+        assert sample(output, name) - sample(before, name) == value
+
+
+def test_metrics_file_accumulates(tmp_path, runner):
+    """--metrics-file прибавляет к файлу только метрики, накопленные
+    с прошлой записи, и файл разбирается обратно без потерь."""
+    manager = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "tasks.json")), FileTask
+    )
+    add_tasks(runner, manager, 2)
+    # Все, что накопили предыдущие тесты, считается уже записанным
+    metrics.flush(str(tmp_path / "earlier.prom"))
+    path = tmp_path / "tasks.prom"
+    command = ["--metrics-file", str(path), "view-tasks"]
+
+    for _ in range(2):
+        result = runner.invoke(cli, command, obj=manager)
+        assert result.exit_code == 0
+
+    text = path.read_text(encoding="utf-8")
+    assert sample(text, 'tasks_operations_total{operation="view_tasks"}') == 2
+    assert sample(text, "tasks_returned_total") == 4
+    assert sample(
+        text,
+        'tasks_operation_duration_seconds_bucket'
+        '{operation="view_tasks",le="+Inf"}',
+    ) == 2
+    assert "add_task" not in text
+    assert metrics.Metrics.parse(text).render() == text
+
+
+def test_library_calls_are_counted(tmp_path, runner):
+    """Вызовы менеджера без команд учитываются под именем метода,
+    а ленивый результат - после того, как он прочитан."""
+    manager = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "tasks.json")), FileTask
+    )
+    add_tasks(runner, manager, 2)
+    name = 'tasks_operations_total{operation="view_tasks"}'
+    before = sample(metrics.REGISTRY.render(), name)
+
+    tasks = manager.view_tasks(None)
+    assert sample(metrics.REGISTRY.render(), name) == before
+    assert len(list(tasks)) == 2
+    assert sample(metrics.REGISTRY.render(), name) == before + 1
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from classes import FileTask, FileTaskManager, FileTaskStorage
+from commands import cli
+from queries import Query, QueryError, pushdown
+from storages import make_storage
+
+TASK = {
+    "id": 7, "title": "Отчет", "description": "Квартальный 'итог'",
+    "category": "Работа", "due_date": "2026-11-30",
+    "priority": "высокий", "status": "Не выполнена",
+}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("status='Не выполнена' and priority in ('высокий','средний') "
+     "and due_date<2026-12-01", True),
+    ("status = Выполнена or id >= 7", True),
+    ("not (category contains Раб) or priority != высокий", False),
+    ("description contains 'Квартальный ''итог'''", True),
+    ("id not in (1, 2, 3) and (due_date > 2026-11-30 or title = Отчет)",
+     True),
+    ("due_date = 2026-12-01", False),
+])
+def test_query_matches(text, expected):
+    assert Query(text).matches(TASK) is expected
+
+
+@pytest.mark.parametrize("text", [
+    "", "status", "status <", "priority > высокий", "id = x", "foo = 1",
+    "status = a b", "(id = 1", "due_date = 2026-13-01", "status = 'x",
+    "status contains x", "id in ()",
+])
+def test_query_errors(text):
+    with pytest.raises(QueryError):
+        Query(text)
+
+
+def test_query_pushdown():
+    """Условия верхнего уровня через and переходят в условия индексов,
+    а условия внутри or остаются только в функции условия."""
+    query = Query(
+        "category = Работа and id in (3, 1) and due_date > 2026-01-01 "
+        "and (status = Выполнена or priority = низкий)"
+    )
+    assert query.filters == {
+        "category": "Работа", "ids": [1, 3], "due_from": "2026-01-01",
+    }
+    assert pushdown({"category": "Дом", "status": None, "where": query}) == {
+        "category": "Дом", "ids": [1, 3], "due_from": "2026-01-01",
+        "where": query,
+    }
+    clause, params = query.sql()
+    assert clause.count("?") == len(params) == 6
+    # Неравенство не задает границ срока
+    assert Query("due_date != 2026-01-01").filters == {}
+
+
+@pytest.mark.parametrize(
+    "storage_type", ["stream", "memory", "sqlite", "encoded", "sharded"]
+)
+def test_where_option(tmp_path, runner, storage_type):
+    """--where дает одинаковый результат для всех хранилищ и работает
+    вместе с остальными условиями поиска и массовых изменений."""
+    if storage_type in ("stream", "memory"):
+        storage = FileTaskStorage(str(tmp_path / "tasks"))
+    else:
+        storage = make_storage(f"{storage_type}:{tmp_path / 'tasks'}")
+    manager = FileTaskManager(storage, FileTask)
+    rows = [
+        ("Работа", "2099-03-01", "низкий"),
+        ("Дом", "2099-01-01", "высокий"),
+        ("Работа", "2099-02-01", "средний"),
+        ("Работа", "2099-01-15", "высокий"),
+    ]
+    for category, due_date, priority in rows:
+        command = [
+            "add-task", "--title", "Задача", "--description", "Описание",
+            "--category", category, "--due_date", due_date,
+            "--priority", priority,
+        ]
+        assert runner.invoke(cli, command, obj=manager).exit_code == 0
+    runner.invoke(cli, ["update-status-task", "--id", "4"], obj=manager)
+    if storage_type == "stream":
+        manager = FileTaskManager(storage, FileTask)
+
+    def ids(*command):
+        result = runner.invoke(
+            cli, [*command, "--format", "json"], obj=manager
+        )
+        assert result.exit_code == 0, result.output
+        return [task["id"] for task in json.loads(result.output or "[]")]
+
+    where = (
+        "status = 'Не выполнена' and priority in ('высокий', 'средний') "
+        "and due_date < 2099-02-15"
+    )
+    assert ids("view-tasks", "--where", where) == [2, 3]
+    assert ids(
+        "view-tasks", "--category", "Работа", "--where", where
+    ) == [3]
+    assert ids(
+        "view-tasks", "--where", "category = Работа or id = 2",
+        "--sort", "due_date",
+    ) == [2, 4, 3, 1]
+    assert ids(
+        "search-task", "--category", "Раб", "--status", "Выполнена"
+    ) == [4]
+    assert ids("search-task", "--where", "not priority = высокий") == [1, 3]
+    assert ids(
+        "view-tasks", "--where", "due_date != 2099-02-01"
+    ) == [1, 2, 4]
+
+    command = ["delete-task", "--where", "category = Работа and id >= 3"]
+    result = runner.invoke(cli, command, obj=manager)
+    assert "Найдено задач: 2. Удалено: 2." in result.output
+    assert ids("view-tasks") == [1, 2]
+
+    result = runner.invoke(
+        cli, ["view-tasks", "--where", "priority > низкий"], obj=manager
+    )
+    assert result.exit_code == 2
+    assert "не поддерживает сравнение" in result.output
@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+from benchmarks import (StartupReport, format_startup_report,
+                        parse_import_times)
+from commands import cli
+
+# Модули, которые не должны загружаться при выводе справки
+HEAVY_MODULES = (
+    "classes", "storages", "importers", "daemon", "benchmarks",
+    "sqlite3", "json", "socket",
+)
+
+
+def test_help_does_not_import_task_modules():
+    """Справка и разбор опций не загружают модули с логикой задач."""
+    code = (
+        "import sys\n"
+        "from click.testing import CliRunner\n"
+        "from commands import cli\n"
+        "result = CliRunner().invoke(cli, ['view-tasks', '--help'])\n"
+        "assert result.exit_code == 0, result.output\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[]\n"
+
+
+def test_parse_import_times():
+    """Разбор вывода python -X importtime и отчет по нему."""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   click.core\n"
+        "import time:       500 |       2600 | click\n"
+        "import time:      1000 |       1000 | classes\n"
+    )
+    imports = parse_import_times(stderr)
+    assert [(i.module, i.depth) for i in imports] == [
+        ("click.core", 1), ("click", 0), ("classes", 0)
+    ]
+
+    report = format_startup_report(StartupReport([12.0, 10.0], imports), 1)
+    assert report.splitlines()[0] == (
+        "Запусков: 2. Время запуска, мс: мин 10.0, медиана 11.0."
+    )
+    assert report.splitlines()[1] == "Импорт модулей, мс: 3.6."
+    assert report.splitlines()[-1].split() == ["0.5", "2.6", "click"]
+
+
+def test_startup_bench_budget(runner, tmp_path):
+    """startup-bench выводит отчет и завершается ошибкой
+    при превышении бюджета."""
+    command = ["--storage", str(tmp_path / "tasks.json"), "startup-bench"]
+    result = runner.invoke(cli, [*command, "--runs", "1"])
+    assert result.exit_code == 0
+    assert "click" in result.output
+
+    result = runner.invoke(
+        cli, [*command, "--runs", "1", "--budget", "0", "view-tasks"]
+    )
+    assert result.exit_code == 1
+    assert "превышает бюджет" in result.output
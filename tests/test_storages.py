@@ -0,0 +1,902 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import classes
+from classes import FileTask, FileTaskManager, FileTaskStorage
+from commands import cli
+from storages import (EncodedTaskStorage, JournalTaskStorage, ShardedTaskStorage,
+                      ShardFile, SqliteTaskStorage, make_storage)
+
+
+@pytest.fixture
+def journal_manager(tmp_path):
+    """Менеджер задач, работающий через хранилище с журналом."""
+    storage = JournalTaskStorage(str(tmp_path / "tasks.json"))
+    return FileTaskManager(storage, FileTask)
+
+
+def add_tasks(runner, manager, count):
+    for number in range(1, count + 1):
+        command = [
+            "add-task",
+            "--title", f"Задача {number}",
+            "--description", "Описание",
+            "--category", "Работа" if number % 2 else "Домашние",
+            "--due_date", "2099-12-12",
+            "--priority", "средний",
+        ]
+        result = runner.invoke(cli, command, obj=manager)
+        assert result.exit_code == 0
+
+
+def test_journal_appends_without_rewriting_snapshot(
+    runner, journal_manager
+):
+    """Изменения попадают в журнал, снимок при этом не переписывается."""
+    storage = journal_manager.storage
+    add_tasks(runner, journal_manager, 3)
+    runner.invoke(cli, ["update-status-task", "--id", "2"], obj=journal_manager)
+    runner.invoke(cli, ["delete-task", "--id", "1"], obj=journal_manager)
+
+    # Снимок еще не создан, все операции лежат в журнале
+    with open(storage.journal_path, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert [record["op"] for record in records] == [
+        "put", "put", "put", "put", "delete"
+    ]
+
+    tasks = storage.load_tasks()
+    assert [task["id"] for task in tasks] == [2, 3]
+    assert tasks[0]["status"] == "Выполнена"
+
+
+def test_journal_compaction(runner, journal_manager):
+    """Сжатие переносит журнал в снимок без потери изменений."""
+    storage = journal_manager.storage
+    add_tasks(runner, journal_manager, 4)
+    runner.invoke(
+        cli, ["delete-task", "--category", "Домашние"], obj=journal_manager
+    )
+    expected = storage.load_tasks()
+
+    storage.compact(wait=True)
+
+    with open(storage.file_path, encoding="utf-8") as file:
+        assert json.load(file) == expected
+    assert storage.load_tasks() == expected
+    assert storage._journal_records == 0
+
+
+def test_journal_recovers_interrupted_compaction(runner, journal_manager):
+    """Отложенный журнал прерванного сжатия сворачивается при открытии,
+    и сжатие после этого снова работает."""
+    storage = journal_manager.storage
+    add_tasks(runner, journal_manager, 2)
+    # Процесс завершился сразу после переименования журнала
+    os.replace(storage.journal_path, storage.compacting_path)
+    add_tasks(runner, journal_manager, 1)
+    expected = storage.load_tasks()
+
+    storage = JournalTaskStorage(storage.file_path)
+    assert not os.path.exists(storage.compacting_path)
+    with open(storage.file_path, encoding="utf-8") as file:
+        assert [task["id"] for task in json.load(file)] == [1, 2]
+    assert storage.load_tasks() == expected
+
+    storage.compact(wait=True)
+    assert not os.path.exists(storage.journal_path)
+    with open(storage.file_path, encoding="utf-8") as file:
+        assert json.load(file) == expected
+
+    # Отложенный журнал, оставленный другим процессом после открытия,
+    # сворачивает следующее сжатие
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 1)
+    os.replace(storage.journal_path, storage.compacting_path)
+    storage.compact(wait=True)
+    assert not os.path.exists(storage.compacting_path)
+    with open(storage.file_path, encoding="utf-8") as file:
+        assert len(json.load(file)) == 4
+
+
+def test_journal_compacts_by_threshold(tmp_path, runner):
+    """При превышении порога сжатие запускается автоматически."""
+    storage = JournalTaskStorage(
+        str(tmp_path / "tasks.json"), compact_bytes=1
+    )
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 2)
+    storage.wait_compaction()
+
+    # Снимок появился, а итоговый список не зависит от того,
+    # какая часть изменений успела попасть в снимок
+    with open(storage.file_path, encoding="utf-8") as file:
+        assert json.load(file)
+    assert len(storage.load_tasks()) == 2
+
+
+def test_journal_ignores_torn_last_record(tmp_path, runner):
+    """Оборванная последняя запись журнала пропускается при загрузке."""
+    storage = JournalTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 2)
+    with open(storage.journal_path, "a", encoding="utf-8") as file:
+        file.write('{"op": "delete", "i')
+
+    assert len(storage.load_tasks()) == 2
+
+
+def test_journal_append_after_torn_record(tmp_path, runner):
+    """Запись после оборванной строки не сливается с ней: после сбоя,
+    двух дописываний и перезагрузки все новые задачи на месте."""
+    storage = JournalTaskStorage(str(tmp_path / "tasks.json"))
+    add_tasks(runner, FileTaskManager(storage, FileTask), 2)
+    with open(storage.journal_path, "a", encoding="utf-8") as file:
+        file.write('{"op": "put", "task": {"id": 9, "tit')
+
+    storage = JournalTaskStorage(storage.file_path)
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 2)
+
+    tasks = JournalTaskStorage(storage.file_path).load_tasks()
+    assert [task["id"] for task in tasks] == [1, 2, 3, 4]
+    with open(storage.journal_path, encoding="utf-8") as file:
+        assert len([json.loads(line) for line in file]) == 4
+
+
+@pytest.fixture
+def sqlite_manager(tmp_path):
+    """Менеджер задач, работающий через SQLite."""
+    storage = SqliteTaskStorage(str(tmp_path / "tasks.db"))
+    yield FileTaskManager(storage, FileTask)
+    storage.close()
+
+
+def test_sqlite_commands(runner, sqlite_manager):
+    """Команды работают поверх SQLite так же, как поверх JSON-файла."""
+    add_tasks(runner, sqlite_manager, 4)
+    runner.invoke(cli, ["update-status-task", "--id", "3"], obj=sqlite_manager)
+    runner.invoke(
+        cli, ["edit-task", "--id", "4", "--title", "Новая"],
+        obj=sqlite_manager
+    )
+    result = runner.invoke(
+        cli, ["delete-task", "--category", "Работа"], obj=sqlite_manager
+    )
+    assert result.exit_code == 0
+
+    tasks = sqlite_manager.storage.load_tasks()
+    assert [(t["id"], t["title"]) for t in tasks] == [
+        (2, "Задача 2"), (4, "Новая")
+    ]
+
+    result = runner.invoke(
+        cli, ["search-task", "--category", "Дом"], obj=sqlite_manager
+    )
+    assert result.exit_code == 0
+    assert result.output.count("Категория: Домашние") == 2
+
+    result = runner.invoke(
+        cli, ["delete-task", "--id", "3"], obj=sqlite_manager
+    )
+    assert result.exit_code == 1
+
+
+def test_sqlite_filters_use_indexes(sqlite_manager):
+    """Фильтры по категории и статусу выполняются по индексам."""
+    connection = sqlite_manager.storage.connection
+    for column in ("category", "status"):
+        plan = connection.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE {column} = ?",
+            ("x",),
+        ).fetchall()
+        assert f"tasks_{column}" in str([tuple(row) for row in plan])
+
+
+def test_storage_option(tmp_path, runner):
+    """Хранилище выбирается опцией --storage."""
+    path = tmp_path / "tasks.db"
+    command = [
+        "--storage", f"sqlite:{path}",
+        "add-task",
+        "--title", "Задача",
+        "--description", "Описание",
+        "--category", "Работа",
+        "--due_date", "2099-12-12",
+        "--priority", "средний",
+    ]
+    result = runner.invoke(cli, command)
+    assert result.exit_code == 0
+    assert len(SqliteTaskStorage(str(path)).load_tasks()) == 1
+
+    result = runner.invoke(cli, ["--storage", "mongo:tasks", "view-tasks"])
+    assert result.exit_code == 2
+
+
+def test_task_collection_indexes(tmp_path, runner):
+    """Индексы коллекции остаются согласованными после изменений,
+    а задачи загружаются из хранилища только один раз."""
+    storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 5)
+    runner.invoke(cli, ["update-status-task", "--id", "1"], obj=manager)
+    runner.invoke(
+        cli, ["edit-task", "--id", "2", "--category", "Работа"], obj=manager
+    )
+    runner.invoke(cli, ["delete-task", "--id", "3"], obj=manager)
+
+    collection = manager.query_storage()
+    assert collection is manager.query_storage()
+
+    def ids(**filters):
+        return [task["id"] for task in collection.find_tasks(**filters)]
+
+    assert ids(category="Работа") == [1, 2, 5]
+    assert ids(category="Домашние") == [4]
+    assert ids(status="Выполнена") == [1]
+    assert ids(category="Работа", status="Не выполнена") == [2, 5]
+    assert ids(category_contains="Дом") == [4]
+    assert collection.last_id() == 5
+
+    assert collection.delete_tasks(category="Работа") == 3
+    assert ids() == [4]
+    assert ids(status="Выполнена") == []
+    assert storage.load_tasks() == collection.find_tasks()
+
+
+def test_file_storage_cache(tmp_path, runner, monkeypatch):
+    """Неизмененный файл читается из кеша, измененный разбирается заново."""
+    path = tmp_path / "tasks.json"
+    storage = FileTaskStorage(str(path))
+    add_tasks(runner, FileTaskManager(storage, FileTask), 3)
+    expected = storage.load_tasks()
+    assert (tmp_path / "tasks.json.cache").exists()
+
+    # Пока файл не менялся, JSON не разбирается
+    def fail(*args, **kwargs):
+        raise AssertionError("JSON не должен разбираться")
+
+    monkeypatch.setattr(json, "load", fail)
+    tasks, index = storage.load_indexed_tasks()
+    assert tasks == expected
+    assert index["ids"] == [1, 2, 3]
+    assert index["category"] == {"Работа": {1, 3}, "Домашние": {2}}
+    monkeypatch.undo()
+
+    # Изменение файла в обход хранилища сбрасывает кеш
+    path.write_text(json.dumps(expected[:1]), encoding="utf-8")
+    assert storage.load_tasks() == expected[:1]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_file_storage_iter_tasks(tmp_path, runner, monkeypatch, chunk_size):
+    """Потоковое чтение возвращает те же задачи, что и полная загрузка,
+    при любом размере блока чтения."""
+    storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    add_tasks(runner, FileTaskManager(storage, FileTask), 3)
+
+    monkeypatch.setattr(classes, "STREAM_CHUNK_SIZE", chunk_size)
+    assert list(storage.iter_tasks()) == storage.load_tasks()
+
+    (tmp_path / "tasks.json").write_text("[]", encoding="utf-8")
+    assert list(storage.iter_tasks()) == []
+
+    (tmp_path / "tasks.json").write_text('[{"id": 1}, {"id"', encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(storage.iter_tasks())
+
+
+def test_view_tasks_streams_without_loading(tmp_path, runner, monkeypatch):
+    """Без кеша view-tasks читает задачи потоком, не загружая
+    весь список."""
+    path = str(tmp_path / "tasks.json")
+    add_tasks(runner, FileTaskManager(FileTaskStorage(path), FileTask), 3)
+
+    storage = FileTaskStorage(path, cache=False)
+    manager = FileTaskManager(storage, FileTask)
+    monkeypatch.setattr(storage, "load_indexed_tasks", None)
+    result = runner.invoke(
+        cli, ["view-tasks", "--category", "Работа"], obj=manager
+    )
+    assert result.exit_code == 0
+    assert result.output.count("Категория: Работа") == 2
+    assert manager._collection is None
+
+
+def test_view_tasks_reads_cache(tmp_path, runner, monkeypatch):
+    """При актуальном кеше выборки читают его без разбора JSON,
+    а большой файл без актуального кеша читается потоком."""
+    path = tmp_path / "tasks.json"
+    storage = FileTaskStorage(str(path))
+    add_tasks(runner, FileTaskManager(storage, FileTask), 3)
+    # Читающие команды тоже создают кеш для следующих запусков
+    (tmp_path / "tasks.json.cache").unlink()
+    manager = FileTaskManager(storage, FileTask)
+    assert runner.invoke(cli, ["view-tasks"], obj=manager).exit_code == 0
+    assert (tmp_path / "tasks.json.cache").exists()
+
+    # Файл считается большим, но кеш совпадает с ним
+    monkeypatch.setattr(classes, "PARALLEL_SCAN_BYTES", 0)
+    monkeypatch.setattr(storage, "_iter_records", None)
+    manager = FileTaskManager(storage, FileTask)
+    command = ["search-task", "--category", "Работа"]
+    result = runner.invoke(cli, command, obj=manager)
+    assert result.exit_code == 0
+    assert result.output.count("Категория: Работа") == 2
+    assert manager._collection is not None
+    monkeypatch.undo()
+
+    monkeypatch.setattr(classes, "PARALLEL_SCAN_BYTES", 0)
+    monkeypatch.setattr(storage, "load_indexed_tasks", None)
+    path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    manager = FileTaskManager(storage, FileTask)
+    result = runner.invoke(cli, command, obj=manager)
+    assert result.exit_code == 0
+    assert result.output.count("Категория: Работа") == 2
+    assert manager._collection is None
+
+
+@pytest.mark.parametrize(
+    "backend", ["stream", "memory", "sqlite", "sharded"]
+)
+def test_view_tasks_sort_and_page(tmp_path, runner, backend):
+    """Сортировка и постраничный вывод одинаковы для всех путей чтения."""
+    if backend == "sqlite":
+        storage = SqliteTaskStorage(str(tmp_path / "tasks.db"))
+    elif backend == "sharded":
+        storage = ShardedTaskStorage(str(tmp_path / "tasks"))
+    else:
+        storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    rows = [
+        ("2099-03-01", "низкий"),
+        ("2099-01-01", "высокий"),
+        ("2099-02-01", "средний"),
+        ("2099-01-15", "высокий"),
+    ]
+    for due_date, priority in rows:
+        command = [
+            "add-task", "--title", "Задача", "--description", "Описание",
+            "--category", "Работа", "--due_date", due_date,
+            "--priority", priority,
+        ]
+        assert runner.invoke(cli, command, obj=manager).exit_code == 0
+    runner.invoke(cli, ["update-status-task", "--id", "2"], obj=manager)
+    if backend == "stream":
+        # Без кеша задачи читаются потоком
+        storage = FileTaskStorage(storage.file_path, cache=False)
+        manager = FileTaskManager(storage, FileTask)
+
+    def ids(*options):
+        result = runner.invoke(cli, ["view-tasks", *options], obj=manager)
+        assert result.exit_code == 0
+        return [
+            int(line.split()[1]) for line in result.output.splitlines()
+            if line.startswith("ID:")
+        ]
+
+    assert ids("--limit", "2") == [1, 2]
+    assert ids("--offset", "3") == [4]
+    assert ids("--reverse", "--limit", "1") == [4]
+    assert ids("--sort", "due_date") == [2, 4, 3, 1]
+    assert ids("--sort", "due_date", "--limit", "2", "--offset", "1") == [4, 3]
+    assert ids("--sort", "priority", "--limit", "3") == [2, 4, 3]
+    assert ids("--sort", "priority", "--reverse", "--limit", "1") == [1]
+    assert ids("--sort", "status") == [1, 3, 4, 2]
+    assert ids("--offset", "10") == []
+    if backend == "stream":
+        assert manager._collection is None
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_bulk_commands(tmp_path, runner, monkeypatch, backend):
+    """Массовые изменения по списку ID и условиям отбора
+    сохраняются одной записью и сообщают число задач."""
+    if backend == "sqlite":
+        storage = SqliteTaskStorage(str(tmp_path / "tasks.db"))
+    else:
+        storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 8)
+
+    saves = []
+    save_changes = storage.save_changes
+    monkeypatch.setattr(
+        storage, "save_changes",
+        lambda *args, **kwargs: saves.append(1) or save_changes(
+            *args, **kwargs
+        ),
+    )
+
+    def invoke(*command):
+        result = runner.invoke(cli, list(command), obj=manager)
+        assert result.exit_code == 0, result.output
+        return result.output.splitlines()[-1]
+
+    assert invoke(
+        "update-status-task", "--id", "1-3", "--id", "5"
+    ) == "Найдено задач: 4. Изменено: 4."
+    assert invoke(
+        "update-status-task", "--id", "1,4", "--filter-category", "Работа"
+    ) == "Найдено задач: 1. Изменено: 0."
+    assert invoke(
+        "edit-task", "--filter-status", "Не выполнена",
+        "--filter-category", "Домашние", "--priority", "высокий"
+    ) == "Найдено задач: 3. Изменено: 3."
+    assert invoke(
+        "delete-task", "--filter-priority", "высокий",
+        "--due-from", "2099-01-01", "--due-to", "2099-12-31"
+    ) == "Найдено задач: 3. Удалено: 3."
+    if backend == "file":
+        assert len(saves) == 3
+
+    tasks = storage.load_tasks()
+    assert [(t["id"], t["status"]) for t in tasks] == [
+        (1, "Выполнена"), (2, "Выполнена"), (3, "Выполнена"),
+        (5, "Выполнена"), (7, "Не выполнена"),
+    ]
+
+    result = runner.invoke(
+        cli, ["delete-task", "--due-to", "2000-01-01"], obj=manager
+    )
+    assert result.exit_code == 1
+    assert "не найдены" in result.output
+    result = runner.invoke(cli, ["update-status-task"], obj=manager)
+    assert result.exit_code == 1
+    result = runner.invoke(cli, ["delete-task", "--id", "5-3"], obj=manager)
+    assert result.exit_code == 2
+    if backend == "sqlite":
+        storage.close()
+
+
+def test_batch_commands(tmp_path, runner, monkeypatch, journal_manager):
+    """Пакетный режим выполняет команды над одним набором задач
+    и записывает изменения один раз в конце."""
+    storage = journal_manager.storage
+    add_tasks(runner, journal_manager, 2)
+    script = tmp_path / "script.txt"
+    script.write_text(
+        "# комментарий\n"
+        "\n"
+        'add-task --title "Новая задача" --description Описание '
+        "--category Работа --due_date 2099-12-12 --priority высокий\n"
+        "add-task --title Временная --description Описание "
+        "--category Работа --due_date 2099-12-12 --priority низкий\n"
+        "delete-task --id 4\n"
+        "update-status-task --id 7\n"
+        "update-status-task --id 1-3\n"
+        "batch --file script.txt\n",
+        encoding="utf-8",
+    )
+    writes = []
+    save_changes = storage.save_changes
+    monkeypatch.setattr(
+        storage, "save_changes",
+        lambda *args, **kwargs: writes.append(kwargs) or save_changes(
+            *args, **kwargs
+        ),
+    )
+
+    result = runner.invoke(
+        cli, ["batch", "--file", str(script)], obj=journal_manager
+    )
+    assert result.exit_code == 1
+    assert "Строка 6: Задача с ID 7 не найдена." in result.output
+    assert "Строка 8: Команду 'batch' нельзя" in result.output
+    assert "Error: Команд с ошибками: 2." in result.output
+
+    # Временная задача добавлена и удалена внутри пакета
+    # и в хранилище не попадает
+    assert len(writes) == 1
+    assert [task["id"] for task in writes[0]["added"]] == [3]
+    assert [task["id"] for task in writes[0]["updated"]] == [1, 2]
+    assert writes[0]["deleted"] == []
+
+    tasks = JournalTaskStorage(storage.file_path).load_tasks()
+    assert [(t["id"], t["status"]) for t in tasks] == [
+        (1, "Выполнена"), (2, "Выполнена"), (3, "Выполнена")
+    ]
+
+
+def test_batch_flush_every(tmp_path, runner, monkeypatch):
+    """С --flush-every изменения записываются каждые N команд,
+    а --stop-on-error прерывает выполнение."""
+    storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 3)
+    lines = [f"update-status-task --id {task_id}" for task_id in (1, 2, 1, 3)]
+    saves = []
+    save_tasks = storage.save_tasks
+    monkeypatch.setattr(
+        storage, "save_tasks",
+        lambda tasks: saves.append(
+            [task["status"] for task in tasks]
+        ) or save_tasks(tasks),
+    )
+
+    result = runner.invoke(
+        cli, ["batch", "--flush-every", "2", "--stop-on-error"],
+        obj=manager, input="\n".join(lines),
+    )
+    assert result.exit_code == 1
+    assert saves == [
+        ["Выполнена", "Выполнена", "Не выполнена"],
+    ]
+
+    result = runner.invoke(
+        cli, ["shell"], obj=manager, input="update-status-task --id 3\nexit\n"
+    )
+    assert result.exit_code == 0
+    assert len(saves) == 2
+    assert storage.load_tasks()[2]["status"] == "Выполнена"
+
+
+def test_encoded_storage(tmp_path, runner):
+    """Перевод файла в словарный формат: задачи не меняются,
+    файл становится меньше, фильтры работают по кодам."""
+    path = tmp_path / "tasks.json"
+    manager = FileTaskManager(FileTaskStorage(str(path)), FileTask)
+    add_tasks(runner, manager, 6)
+    runner.invoke(cli, ["update-status-task", "--id", "2"], obj=manager)
+    expected = manager.storage.load_tasks()
+    plain_size = path.stat().st_size
+
+    result = runner.invoke(
+        cli, ["convert-storage", "--target", f"encoded:{path}"], obj=manager
+    )
+    assert result.output == "Перенесено задач: 6.\n"
+    assert path.stat().st_size < plain_size
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["dictionary"]["category"] == ["Работа", "Домашние"]
+
+    storage = EncodedTaskStorage(str(path), cache=False)
+    assert storage.load_tasks() == expected
+
+    def ids(**filters):
+        return [task["id"] for task in storage.iter_tasks(**filters)]
+
+    assert ids(category="Домашние") == [2, 4, 6]
+    assert ids(category_contains="Дом", status="Выполнена") == [2]
+    assert ids(priority="средний", ids=[1, 5, 9]) == [1, 5]
+    assert ids(due_from="2099-12-12", due_to="2099-12-12") == [1, 2, 3, 4, 5, 6]
+    assert ids(category="Учеба") == []
+    assert ids(priority="высокий") == []
+
+
+def test_encoded_storage_reads_plain_file(tmp_path, runner):
+    """Файл в прежнем формате читается и переписывается
+    в словарном формате при первом изменении."""
+    path = tmp_path / "tasks.json"
+    add_tasks(
+        runner, FileTaskManager(FileTaskStorage(str(path)), FileTask), 2
+    )
+    manager = FileTaskManager(EncodedTaskStorage(str(path)), FileTask)
+    assert [task["id"] for task in manager.storage.iter_tasks()] == [1, 2]
+
+    runner.invoke(cli, ["delete-task", "--id", "1"], obj=manager)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["format"] == "encoded"
+    assert [row[0] for row in data["tasks"]] == [2]
+
+
+@pytest.mark.parametrize(
+    "kind", ["file", "journal", "encoded", "sqlite", "sharded"]
+)
+def test_ids_are_not_reused(tmp_path, runner, monkeypatch, kind):
+    """ID выдаются по возрастанию без чтения задач и не повторяются
+    после удаления последней задачи."""
+    spec = f"{kind}:{tmp_path / 'tasks.json'}"
+    add_tasks(runner, FileTaskManager(make_storage(spec), FileTask), 3)
+    manager = FileTaskManager(make_storage(spec), FileTask)
+    runner.invoke(cli, ["delete-task", "--id", "3"], obj=manager)
+
+    manager = FileTaskManager(make_storage(spec), FileTask)
+    if kind != "encoded":
+        # Новая задача дописывается в хранилище, не загружая остальные
+        monkeypatch.setattr(
+            manager.storage, "load_tasks", lambda: pytest.fail("load_tasks")
+        )
+    add_tasks(runner, manager, 1)
+    monkeypatch.undo()
+
+    import_file = tmp_path / "import.jsonl"
+    import_file.write_text(
+        '{"title": "А", "description": "Б", "category": "В", '
+        '"due_date": "2099-01-01", "priority": "низкий"}\n' * 2,
+        encoding="utf-8",
+    )
+    command = ["import-tasks", "--file", str(import_file)]
+    runner.invoke(cli, command, obj=manager)
+
+    # Пакетный режим резервирует ID блоком и возвращает остаток
+    with manager.deferred_saves():
+        add_tasks(runner, manager, 1)
+
+    tasks = make_storage(spec).load_tasks()
+    assert [task["id"] for task in tasks] == [1, 2, 4, 5, 6, 7]
+    assert make_storage(spec).allocate_ids(2) == range(8, 10)
+
+
+def test_file_storage_append_keeps_format(tmp_path):
+    """Дописанные задачи оформлены так же, как при полной записи."""
+    path = tmp_path / "tasks.json"
+    storage = FileTaskStorage(str(path))
+    tasks = [
+        {
+            "id": task_id, "title": "Задача", "description": "Описание",
+            "category": "Работа", "due_date": "2099-12-12",
+            "priority": "средний", "status": "Не выполнена",
+        }
+        for task_id in range(1, 4)
+    ]
+    storage.save_tasks([])
+    storage.append_tasks([])
+    storage.append_tasks(tasks[:1])
+    storage.append_tasks(tasks[1:])
+    storage.append_tasks([])
+    assert path.read_text(encoding="utf-8") == json.dumps(
+        tasks, indent=4, ensure_ascii=False
+    )
+    assert storage.load_tasks() == tasks
+
+
+def allocate_many(path):
+    storage = FileTaskStorage(path)
+    return [storage.allocate_ids(1)[0] for _ in range(50)]
+
+
+def test_concurrent_id_allocation(tmp_path):
+    """Процессы, одновременно выделяющие ID, не получают одинаковых."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    path = str(tmp_path / "tasks.json")
+    with ProcessPoolExecutor(4) as executor:
+        ids = sum(executor.map(allocate_many, [path] * 4), [])
+    assert sorted(ids) == list(range(1, 201))
+
+
+def test_sharded_storage(tmp_path, runner, monkeypatch):
+    """Выборка по категории читает только ее файл, удаление категории
+    удаляет файл, а смена категории переносит задачу между файлами."""
+    storage = ShardedTaskStorage(str(tmp_path / "tasks"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 4)
+    catalog = json.loads((tmp_path / "tasks" / "catalog.json").read_text(
+        encoding="utf-8"
+    ))
+    files = {
+        category: entry["file"]
+        for category, entry in catalog["shards"].items()
+    }
+    assert {category: entry["count"] for category, entry in (
+        catalog["shards"].items()
+    )} == {"Работа": 2, "Домашние": 2}
+
+    read = []
+    load_tasks = ShardFile.load_tasks
+    monkeypatch.setattr(
+        ShardFile, "load_tasks",
+        lambda shard: read.append(shard.file_path) or load_tasks(shard),
+    )
+    result = runner.invoke(
+        cli, ["view-tasks", "--category", "Работа", "--format", "json"],
+        obj=manager,
+    )
+    assert [task["id"] for task in json.loads(result.output)] == [1, 3]
+    assert read == [str(tmp_path / "tasks" / files["Работа"])]
+
+    command = ["edit-task", "--id", "1", "--category", "Домашние"]
+    assert runner.invoke(cli, command, obj=manager).exit_code == 0
+    assert [task["id"] for task in storage.find_tasks()] == [1, 2, 3, 4]
+    assert [
+        task["id"] for task in storage.find_tasks(category="Домашние")
+    ] == [1, 2, 4]
+
+    read.clear()
+    command = ["delete-task", "--category", "Домашние"]
+    assert runner.invoke(cli, command, obj=manager).exit_code == 0
+    assert read == []
+    assert not (tmp_path / "tasks" / files["Домашние"]).exists()
+    assert [task["id"] for task in storage.find_tasks()] == [3]
+
+
+def test_sharded_storage_recovers_commit(tmp_path, monkeypatch):
+    """Замена, прерванная после записи каталога, доводится до конца
+    при следующем чтении, и задача не теряется и не дублируется."""
+    storage = ShardedTaskStorage(str(tmp_path / "tasks"))
+    storage.insert_tasks([
+        {
+            "id": 1, "title": "А", "description": "Б", "category": "Работа",
+            "due_date": "2099-01-01", "priority": "низкий",
+            "status": "Не выполнена",
+        },
+    ])
+
+    def crash(self):
+        raise OSError("сбой")
+
+    monkeypatch.setattr(ShardFile, "finish", crash)
+    with pytest.raises(OSError):
+        storage.update_task(1, {"category": "Дом"})
+    monkeypatch.undo()
+
+    tasks = ShardedTaskStorage(str(tmp_path / "tasks")).find_tasks()
+    assert [(task["id"], task["category"]) for task in tasks] == [(1, "Дом")]
+    assert list((tmp_path / "tasks").glob("*.new")) == []
+
+
+@pytest.mark.parametrize("storage_type", ["file", "sqlite", "sharded"])
+def test_archive_completed_tasks(tmp_path, runner, storage_type):
+    """Давно выполненные задачи переносятся в архив, не выводятся
+    без --include-archived и выводятся с ней."""
+    storage = make_storage(f"{storage_type}:{tmp_path / 'tasks'}")
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 4)
+    # Срок в прошлом нельзя задать командами из-за проверки даты
+    manager.query_storage().update_tasks([1, 2], {"due_date": "2000-01-01"})
+    command = ["update-status-task", "--id", "1", "--id", "3"]
+    assert runner.invoke(cli, command, obj=manager).exit_code == 0
+    today = date.today().isoformat()
+    assert manager.query_storage().get_task(1)["completed_at"] == today
+    # Возраст считается от даты выполнения, а не от срока: задача 1
+    # с прошедшим сроком выполнена сегодня и остается
+    manager.query_storage().update_tasks([3], {"completed_at": "2000-01-01"})
+
+    command = ["archive-tasks", "--older-than", "30"]
+    result = runner.invoke(cli, command, obj=manager)
+    assert "Перенесено в архив задач: 1." in result.output
+    assert (tmp_path / "tasks.archive.jsonl.gz").exists()
+
+    def view_ids(*options):
+        command = ["view-tasks", "--format", "json", *options]
+        result = runner.invoke(cli, command, obj=manager)
+        return [task["id"] for task in json.loads(result.output)]
+
+    assert view_ids() == [1, 2, 4]
+    assert view_ids("--include-archived") == [1, 2, 3, 4]
+    assert view_ids("--include-archived", "--sort", "due_date") == [
+        1, 2, 3, 4
+    ]
+    command = [
+        "search-task", "--status", "Выполнена", "--format", "json",
+        "--include-archived",
+    ]
+    result = runner.invoke(cli, command, obj=manager)
+    assert [task["id"] for task in json.loads(result.output)] == [1, 3]
+
+    # Автоматический перенос после изменения статуса: у задачи 2,
+    # выполненной без даты выполнения, возраст считается от срока
+    manager.query_storage().update_tasks([2], {"status": "Выполнена"})
+    command = ["update-status-task", "--id", "4", "--archive-after", "30"]
+    result = runner.invoke(cli, command, obj=manager)
+    assert "Перенесено в архив задач: 1." in result.output
+    assert view_ids() == [1, 4]
+    assert view_ids("--include-archived") == [1, 2, 3, 4]
+
+
+def test_completed_at_in_legacy_formats(tmp_path):
+    """Файлы словарного формата версии 1 и базы SQLite без колонки
+    даты выполнения читаются, а дата записывается после обновления."""
+    path = tmp_path / "tasks.json"
+    path.write_text(json.dumps({
+        "format": "encoded", "version": 1,
+        "dictionary": {
+            "category": ["Работа"], "priority": ["высокий"],
+            "status": ["Не выполнена"],
+        },
+        "fields": list(EncodedTaskStorage.FIELDS[:-1]),
+        "tasks": [[1, "Задача", "Описание", 0, "2099-12-12", 0, 0]],
+    }), encoding="utf-8")
+    storage = EncodedTaskStorage(str(path), cache=False)
+    task = storage.load_tasks()[0]
+    assert "completed_at" not in task
+    task.update(status="Выполнена", completed_at="2099-01-01")
+    storage.save_tasks([task])
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 2
+    assert storage.load_tasks() == [task]
+
+    import sqlite3
+
+    database = tmp_path / "tasks.db"
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT NOT NULL, "
+            "description TEXT NOT NULL, category TEXT NOT NULL, "
+            "due_date TEXT NOT NULL, priority TEXT NOT NULL, "
+            "status TEXT NOT NULL)"
+        )
+        connection.execute(
+            "INSERT INTO tasks VALUES (1, 'Задача', 'Описание', 'Работа', "
+            "'2099-12-12', 'высокий', 'Не выполнена')"
+        )
+    connection.close()
+    storage = SqliteTaskStorage(str(database))
+    assert "completed_at" not in storage.get_task(1)
+    storage.update_tasks([1], {"completed_at": "2099-01-01"})
+    assert storage.get_task(1)["completed_at"] == "2099-01-01"
+    storage.close()
+
+
+def test_file_storage_parallel_scan(tmp_path, runner, monkeypatch):
+    """Большой файл разбирается по диапазонам в нескольких процессах
+    с тем же результатом, что и при последовательном чтении."""
+    import parallel
+
+    manager = FileTaskManager(
+        FileTaskStorage(str(tmp_path / "tasks.json")), FileTask
+    )
+    add_tasks(runner, manager, 7)
+    storage = FileTaskStorage(manager.storage.file_path, cache=False)
+    expected = list(storage.iter_tasks(category="Работа"))
+
+    monkeypatch.setenv(parallel.WORKERS_ENVVAR, "2")
+    monkeypatch.setattr(parallel, "PARALLEL_SCAN_BYTES", 1)
+    monkeypatch.setattr(parallel, "PARALLEL_CHUNK_BYTES", 200)
+    ranges = parallel.split(storage.file_path)
+    assert len(ranges) > 2
+
+    assert list(storage.iter_tasks(category="Работа")) == expected
+    assert storage.load_tasks() == manager.storage.load_tasks()
+
+
+@pytest.mark.parametrize("storage_type", ["file", "journal", "sqlite", "sharded"])
+def test_due_and_overdue(tmp_path, runner, storage_type):
+    """due выводит задачи со сроком в интервале, overdue - просроченные
+    невыполненные, обе команды по возрастанию срока."""
+    storage = make_storage(f"{storage_type}:{tmp_path / 'tasks'}")
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 6)
+    today = date.today()
+    shifts = {1: 3, 2: -2, 3: 0, 4: -10, 5: 30, 6: 6}
+    for task_id, shift in shifts.items():
+        manager.query_storage().update_tasks(
+            [task_id],
+            {"due_date": (today + timedelta(days=shift)).isoformat()},
+        )
+    manager.query_storage().update_tasks(
+        [2], {"status": "Выполнена"}
+    )
+    manager = FileTaskManager(storage, FileTask)
+
+    def ids(*command):
+        result = runner.invoke(
+            cli, [*command, "--format", "json"], obj=manager
+        )
+        assert result.exit_code == 0, result.output
+        return [task["id"] for task in json.loads(result.output)]
+
+    assert ids("due") == [3, 1, 6]
+    assert ids("due", "--days", "4", "--limit", "1") == [3]
+    start = (today - timedelta(days=2)).isoformat()
+    assert ids("due", "--from", start, "--days", "3") == [3]
+    assert ids("due", "--from", start, "--days", "3", "--all") == [2, 3]
+    assert ids("overdue") == [4]
+    result = runner.invoke(
+        cli, ["due", "--from", "2099-01-01", "--to", "2099-02-01"],
+        obj=manager,
+    )
+    assert "Нет задач со сроком в указанном интервале." in result.output
+
+
+def test_due_index_is_maintained(tmp_path, runner):
+    """Индекс сроков обновляется при изменениях и сохраняется в кеше."""
+    storage = FileTaskStorage(str(tmp_path / "tasks.json"))
+    manager = FileTaskManager(storage, FileTask)
+    add_tasks(runner, manager, 5)
+    collection = manager.query_storage()
+    collection.update_tasks([2, 4], {"due_date": "2099-01-01"})
+    collection.delete_tasks([3])
+    expected = sorted(
+        (task["due_date"], task["id"]) for task in collection.tasks
+    )
+    assert collection._by_due == expected
+    assert [task["id"] for task in collection.iter_tasks(
+        order_by="due_date", due_to="2099-06-01"
+    )] == [2, 4]
+
+    _, index = FileTaskStorage(storage.file_path).load_indexed_tasks()
+    assert index["due"] == expected
@@ -1,31 +1,168 @@
 from datetime import date, datetime
+from typing import Dict, List, Tuple, Union
 
 import click
 
+from constants import DEFAULT_STATUS_TASK, PRIORITY_TYPE, TASK_STATUS
+from errors import InvalidTaskError
 
-def validate_not_blank(ctx, param, value: str) -> str:
+# Текстовые поля задачи, которые не могут быть пустыми
+TEXT_FIELDS = ("title", "description", "category")
+
+
+def check_not_blank(name: str, value: str) -> str:
     """
-    Проверяет вводимые поля на:
+    Проверяет значение поля name на:
+    - Поле должно быть строкой
     - Поле не может состоять только из пробелов
     - Поле не может быть пустым
+
+    Raises:
+        InvalidTaskError: если значение не прошло проверку
     """
+    if value is not None and not isinstance(value, str):
+        raise InvalidTaskError(f"Поле '{name}' должно быть строкой.")
     if value == "":
-        raise click.BadParameter(
-            f"Параметр '{param.name}' не может быть пустым."
+        raise InvalidTaskError(
+            f"Параметр '{name}' не может быть пустым."
         )
     if value is not None and value.isspace():
-        raise click.BadParameter(
-            f"Поле '{param.name}' не может состоять только из пробелов."
+        raise InvalidTaskError(
+            f"Поле '{name}' не может состоять только из пробелов."
         )
     return value
 
 
-def validate_date(ctx, param, value: datetime) -> datetime:
+def check_date(value: datetime) -> datetime:
     """
-    Проверяет вводимую дату на то, что указанное
+    Проверяет дату на то, что указанное
     значение не раньше текущей даты.
+
+    Raises:
+        InvalidTaskError: если дата раньше текущей
     """
-    print(type(param))
     if value is not None and value.date() < date.today():
-        raise click.BadParameter("Дата не может быть раньше текущей.")
+        raise InvalidTaskError("Дата не может быть раньше текущей.")
     return value
+
+
+def validate_not_blank(ctx, param, value: str) -> str:
+    """
+    Проверяет вводимые поля на:
+    - Поле не может состоять только из пробелов
+    - Поле не может быть пустым
+    """
+    try:
+        return check_not_blank(param.name, value)
+    except InvalidTaskError as error:
+        raise click.BadParameter(str(error)) from error
+
+
+def validate_date(ctx, param, value: datetime) -> datetime:
+    """
+    Проверяет вводимую дату на то, что указанное
+    значение не раньше текущей даты.
+    """
+    try:
+        return check_date(value)
+    except InvalidTaskError as error:
+        raise click.BadParameter(str(error)) from error
+
+
+def split_spec(spec: str) -> Tuple[str, str]:
+    """
+    Разбирает строку хранилища '<тип>:<путь>' на тип и путь.
+    Если тип не указан, используется обычный JSON-файл.
+    """
+    kind, separator, path = spec.partition(":")
+    if not separator:
+        return "file", spec
+    return kind, path
+
+
+def validate_task_row(row: Dict[str, str]) -> Dict[str, Union[int, str]]:
+    """
+    Проверяет строку импортируемого файла по тем же правилам,
+    что и опции команды add-task, и приводит ее к формату задачи.
+    Статус необязателен, по умолчанию задача не выполнена.
+
+    Raises:
+        InvalidTaskError: если поле строки не прошло проверку
+    """
+    task = {}
+    for field in TEXT_FIELDS:
+        if row.get(field) is None:
+            raise InvalidTaskError(f"Не указано поле '{field}'.")
+        task[field] = check_not_blank(field, row[field])
+
+    try:
+        due_date = datetime.strptime(str(row.get("due_date")), "%Y-%m-%d")
+    except ValueError:
+        raise InvalidTaskError(
+            "Поле 'due_date' должно быть датой в формате YYYY-MM-DD."
+        )
+    task["due_date"] = check_date(due_date).date().isoformat()
+
+    if row.get("priority") not in PRIORITY_TYPE:
+        raise InvalidTaskError(
+            "Поле 'priority' должно быть одним из: "
+            f"{', '.join(PRIORITY_TYPE)}."
+        )
+    task["priority"] = row["priority"]
+
+    status = row.get("status") or DEFAULT_STATUS_TASK
+    if status not in TASK_STATUS:
+        raise InvalidTaskError(
+            "Поле 'status' должно быть одним из: "
+            f"{', '.join(TASK_STATUS)}."
+        )
+    task["status"] = status
+    return task
+
+
+class QueryType(click.ParamType):
+    """
+    Тип опции для условия отбора задач на языке модуля queries,
+    например "status = 'Выполнена' and due_date < 2026-12-01".
+    """
+    name = "условие"
+
+    def convert(self, value, param, ctx):
+        from queries import Query, QueryError
+
+        if isinstance(value, Query):
+            return value
+        try:
+            return Query(value)
+        except QueryError as error:
+            self.fail(str(error), param, ctx)
+
+
+class IdRange(click.ParamType):
+    """
+    Тип опции для ID задач: одно число, диапазон вида 3-10
+    или перечисление через запятую, например 1,4,7-9.
+    """
+    name = "id"
+
+    def convert(self, value, param, ctx) -> List[range]:
+        if isinstance(value, list):
+            return value
+        ranges = []
+        for part in str(value).split(","):
+            start, separator, end = part.strip().partition("-")
+            try:
+                start = int(start)
+                end = int(end) if separator else start
+            except ValueError:
+                self.fail(
+                    f"'{part}' не является ID или диапазоном вида 1-10.",
+                    param,
+                    ctx,
+                )
+            if start > end:
+                self.fail(
+                    f"Начало диапазона '{part}' больше его конца.", param, ctx
+                )
+            ranges.append(range(start, end + 1))
+        return ranges